@@ -6,8 +6,24 @@ Reorganizes formulas and column references when adding new columns to XML table
 
 import re
 import sys
+from pathlib import Path
 from typing import List, Dict, Tuple, Optional
 
+from xml_patch_engine import (COLUMN_COMMENT_PATTERN, EditPlan, SpanEdit, XMLOffsetIndex,
+                              apply_edits, apply_plan, apply_plans, atomic_write, file_digest,
+                              load_plans, save_plans)
+
+# Where `preview` saves its plan when no path is given
+DEFAULT_PLAN_DIR = '.emaku_cache/plans'
+
+FORMULA_ATTRIBUTES = ('beanshell', 'formula')
+
+# Column references in formulas: single letters (a-z) and double letters (aa-zz)
+# that are not part of longer words, including the operands of beanshell
+# ternaries (b>c?b:c); entities such as &gt; are skipped because ';' never
+# follows a column
+COLUMN_REFERENCE_PATTERN = re.compile(r'\b([a-z]{1,2})(?=\s*[=<>!+\-*/()&|,?:]|\s*$|\s)')
+
 class ColumnReorganizer:
     def __init__(self, xml_file_path: str):
         self.xml_file_path = xml_file_path
@@ -34,35 +50,38 @@ class ColumnReorganizer:
         except ValueError:
             return -1
     
-    def _shift_column_letters(self, text: str, insert_position: int, shift_amount: int = 1) -> str:
-        """Shift column letters in formulas after the insertion point."""
+    def _shift_column_letters(self, text: str, insert_position: int, shift_amount: int = 1,
+                              column_count: Optional[int] = None) -> str:
+        """
+        Shift column letters in formulas after the insertion point. Letters at
+        or past ``column_count`` are variables (importTotalCol, externalValue),
+        not columns, and are left alone.
+        """
         
         def replace_column_ref(match):
             column_letter = match.group(0)
             col_index = self._get_column_index(column_letter)
             
             # Only shift columns that are at or after the insertion position
-            if col_index >= insert_position:
+            limit = column_count if column_count is not None else len(self.column_letters)
+            if insert_position <= col_index < limit:
                 new_index = col_index + shift_amount
                 if new_index < len(self.column_letters):
                     return self.column_letters[new_index]
             return column_letter
         
-        # Enhanced pattern to match column letters more precisely
-        # This pattern matches single letters (a-z) and double letters (aa-zz)
-        # but avoids matching parts of longer words
-        pattern = r'\b([a-z]{1,2})(?=\s*[=<>!+\-*/()&|,]|\s*$|\s)'
-        
-        return re.sub(pattern, replace_column_ref, text)
+        return COLUMN_REFERENCE_PATTERN.sub(replace_column_ref, text)
     
-    def _update_totales_attribute(self, totales_text: str, insert_position: int) -> str:
+    def _update_totales_attribute(self, totales_text: str, insert_position: int,
+                                  column_count: Optional[int] = None) -> str:
         """Update the totales attribute with shifted column references."""
         columns = [col.strip() for col in totales_text.split(',')]
         updated_columns = []
+        limit = column_count if column_count is not None else len(self.column_letters)
         
         for col in columns:
             col_index = self._get_column_index(col)
-            if col_index >= insert_position:
+            if insert_position <= col_index < limit:
                 new_index = col_index + 1
                 if new_index < len(self.column_letters):
                     updated_columns.append(self.column_letters[new_index])
@@ -73,13 +92,15 @@ class ColumnReorganizer:
         
         return ','.join(updated_columns)
     
-    def _update_export_total_col(self, export_text: str, insert_position: int) -> str:
+    def _update_export_total_col(self, export_text: str, insert_position: int,
+                                 column_count: Optional[int] = None) -> str:
         """Update exportTotalCol attributes."""
         parts = export_text.split(',', 1)
+        limit = column_count if column_count is not None else len(self.column_letters)
         if len(parts) == 2:
             col_letter, value_name = parts
             col_index = self._get_column_index(col_letter)
-            if col_index >= insert_position:
+            if insert_position <= col_index < limit:
                 new_index = col_index + 1
                 if new_index < len(self.column_letters):
                     return f"{self.column_letters[new_index]},{value_name}"
@@ -87,9 +108,6 @@ class ColumnReorganizer:
     
     def _update_column_comments(self, comment_text: str, insert_position: int) -> str:
         """Update column comments with shifted position numbers."""
-        # Pattern to match comments like "<!-- 15 (o) -->" or "<!-- 15 (o) description -->"
-        pattern = r'<!-- (\d+) \(([a-z]{1,2})\)(.*?) -->'
-        
         def replace_comment(match):
             num_str = match.group(1)
             letter = match.group(2)
@@ -104,9 +122,107 @@ class ColumnReorganizer:
                     return f"<!-- {new_num} ({new_letter}){description} -->"
             return match.group(0)
         
-        return re.sub(pattern, replace_comment, comment_text)
+        return COLUMN_COMMENT_PATTERN.sub(replace_comment, comment_text)
     
-    def update_formulas_after_manual_insertion(self, inserted_position: int) -> bool:
+    def _load_index(self) -> XMLOffsetIndex:
+        return XMLOffsetIndex.from_file(self.xml_file_path)
+
+    def _table_number(self, index: XMLOffsetIndex, table_id: Optional[str]) -> Optional[int]:
+        """Index of the table component with driver id ``table_id`` (None = whole document)."""
+        if table_id is None:
+            return None
+        for number, table in enumerate(index.tables):
+            if table.driver_id == table_id:
+                return number
+        raise ValueError(f"Table '{table_id}' not found in {self.xml_file_path}")
+
+    def _variable_letters(self, index: XMLOffsetIndex, table: int) -> set:
+        """Letters a table declares as variables or uses in its formulas."""
+        letters = set()
+        for arg in index.args_with('importTotalCol', 'externalValue', *FORMULA_ATTRIBUTES, table=table):
+            text = index.text(arg.value)
+            if arg.attribute == 'importTotalCol':
+                letters.add(text.split(',')[0].strip())
+            elif arg.attribute == 'externalValue':
+                letters.add(text.split(',')[-1].strip())
+            else:
+                letters.update(COLUMN_REFERENCE_PATTERN.findall(text))
+        return letters
+
+    def _plan_shift_edits(self, index: XMLOffsetIndex, insert_position: int,
+                          table_id: Optional[str] = None) -> Tuple[List[SpanEdit], Dict]:
+        """
+        Compute the span edits that shift every column reference at or after
+        ``insert_position`` by one, together with a report of what changes.
+
+        Only letters of the table's columns move: letters past the last column
+        are importTotalCol / externalValue variables and keep their name, in
+        their declarations and in the formulas using them. If the last column
+        would take the letter of a variable, nothing is planned.
+
+        Only the arg values and column comments are touched; everything else in
+        the file (whitespace, other comments, escaping) is preserved byte for byte.
+        """
+        table = self._table_number(index, table_id)
+        counts = {number: len(columns.columns) for number, columns in enumerate(index.tables)}
+        for number in ([table] if table is not None else counts):
+            letter = self.column_letters[counts[number]]
+            if counts[number] >= insert_position and letter in self._variable_letters(index, number):
+                raise ValueError(f"Table '{index.tables[number].driver_id}': the last column would become "
+                                 f"'{letter}', which is already a variable; rename the variable first")
+        edits = []
+        report = {
+            'affected_formulas': [],
+            'affected_totales': [],
+            'affected_exports': [],
+            'affected_comments': []
+        }
+
+        updaters = {
+            'totales': ('affected_totales', self._update_totales_attribute),
+            'exportTotalCol': ('affected_exports', self._update_export_total_col),
+        }
+        for attribute in FORMULA_ATTRIBUTES:
+            updaters[attribute] = ('affected_formulas', self._shift_column_letters)
+
+        for arg in index.args_with(*updaters, table=table):
+            key, update = updaters[arg.attribute]
+            original = index.text(arg.value)
+            updated = update(original, insert_position, column_count=counts.get(arg.table))
+            if original != updated:
+                edits.append(index.replace_value(arg, updated))
+                report[key].append({
+                    'attribute': arg.attribute,
+                    'original': original,
+                    'updated': updated
+                })
+
+        bounds = index.tables[table].element if table is not None else None
+        for comment in index.column_comments():
+            if bounds and not (bounds.start <= comment.span.start < bounds.end):
+                continue
+            original = index.text(comment.span)
+            updated = self._update_column_comments(original, insert_position)
+            if original != updated:
+                edits.append(SpanEdit(comment.span.start, comment.span.end, updated.encode('utf-8')))
+                report['affected_comments'].append({'original': original, 'updated': updated})
+
+        return edits, report
+
+    def plan_shift(self, insert_position: int, table_id: Optional[str] = None) -> Tuple[EditPlan, Dict]:
+        """
+        Serializable plan of the edits that shift references for an insertion
+        at ``insert_position``, tied to the current sha256 of the file.
+        """
+        index = self._load_index()
+        edits, report = self._plan_shift_edits(index, insert_position, table_id)
+        description = f"shift references from position {insert_position} ({self.column_letters[insert_position]})"
+        if table_id:
+            description += f" of table '{table_id}'"
+        return EditPlan(str(Path(self.xml_file_path).resolve()), file_digest(index.data), edits, description), report
+
+    def update_formulas_after_manual_insertion(self, inserted_position: int,
+                                               table_id: Optional[str] = None) -> bool:
         """
         Update all formulas and references after a column has been manually inserted.
         
@@ -117,11 +233,11 @@ class ColumnReorganizer:
         Args:
             inserted_position: Index where the new column was inserted (0-based)
                               All columns at this position and after will be shifted
+            table_id: Driver id of the table to update (default: every table in the file)
         """
         
         try:
-            with open(self.xml_file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
+            index = self._load_index()
             
             print(f"🔄 Updating formulas after manual insertion at position {inserted_position}")
             print(f"📍 New column is at position {inserted_position} (letter: {self.column_letters[inserted_position]})")
@@ -134,71 +250,32 @@ class ColumnReorganizer:
                 new_letter = self.column_letters[i]    # What it should reference after shift
                 print(f"   Formulas using '{old_letter}' -> will be updated to '{new_letter}'")
             
-            # 1. Update totales attribute
+            edits, report = self._plan_shift_edits(index, inserted_position, table_id)
+            
+            # 1. totales attribute
             print(f"\n🔧 Updating totales attribute...")
-            totales_pattern = r'<arg attribute="totales">([^<]+)</arg>'
-            original_totales = re.search(totales_pattern, content)
-            if original_totales:
-                new_totales = self._update_totales_attribute(original_totales.group(1), inserted_position)
-                content = re.sub(totales_pattern, 
-                               f'<arg attribute="totales">{new_totales}</arg>',
-                               content)
-                print(f"   ✓ Updated: {original_totales.group(1)} -> {new_totales}")
+            for change in report['affected_totales']:
+                print(f"   ✓ Updated: {change['original']} -> {change['updated']}")
             
-            # 2. Update exportTotalCol attributes
+            # 2. exportTotalCol attributes
             print(f"\n🔧 Updating exportTotalCol attributes...")
-            export_pattern = r'<arg attribute="exportTotalCol">([^<]+)</arg>'
-            for match in re.finditer(export_pattern, content):
-                original = match.group(1)
-                updated = self._update_export_total_col(original, inserted_position)
-                if original != updated:
-                    print(f"   ✓ Updated: {original} -> {updated}")
-            
-            content = re.sub(export_pattern,
-                           lambda m: f'<arg attribute="exportTotalCol">{self._update_export_total_col(m.group(1), inserted_position)}</arg>',
-                           content)
-            
-            # 3. Update beanshell formulas
-            print(f"\n🔧 Updating beanshell formulas...")
-            beanshell_pattern = r'<arg attribute="beanshell">([^<]+)</arg>'
-            beanshell_count = 0
-            for match in re.finditer(beanshell_pattern, content):
-                original = match.group(1)
-                updated = self._shift_column_letters(original, inserted_position)
-                if original != updated:
-                    beanshell_count += 1
-                    print(f"   ✓ Formula {beanshell_count}: {original[:50]}{'...' if len(original) > 50 else ''}")
-                    print(f"      -> {updated[:50]}{'...' if len(updated) > 50 else ''}")
-            
-            content = re.sub(beanshell_pattern,
-                           lambda m: f'<arg attribute="beanshell">{self._shift_column_letters(m.group(1), inserted_position)}</arg>',
-                           content)
+            for change in report['affected_exports']:
+                print(f"   ✓ Updated: {change['original']} -> {change['updated']}")
             
-            # 4. Update formula attributes
-            print(f"\n🔧 Updating formula attributes...")
-            formula_pattern = r'<arg attribute="formula">([^<]+)</arg>'
-            formula_count = 0
-            for match in re.finditer(formula_pattern, content):
-                original = match.group(1)
-                updated = self._shift_column_letters(original, inserted_position)
-                if original != updated:
-                    formula_count += 1
-                    print(f"   ✓ Formula {formula_count}: {original} -> {updated}")
+            # 3. beanshell and formula attributes
+            print(f"\n🔧 Updating beanshell and formula attributes...")
+            for count, change in enumerate(report['affected_formulas'], 1):
+                original, updated = change['original'], change['updated']
+                print(f"   ✓ Formula {count}: {original[:50]}{'...' if len(original) > 50 else ''}")
+                print(f"      -> {updated[:50]}{'...' if len(updated) > 50 else ''}")
             
-            content = re.sub(formula_pattern,
-                           lambda m: f'<arg attribute="formula">{self._shift_column_letters(m.group(1), inserted_position)}</arg>',
-                           content)
-            
-            # 5. Update column comments
+            # 4. column comments
             print(f"\n🔧 Updating column comments...")
-            original_content = content
-            content = self._update_column_comments(content, inserted_position)
-            if content != original_content:
-                print(f"   ✓ Column comments updated")
+            if report['affected_comments']:
+                print(f"   ✓ {len(report['affected_comments'])} column comments updated")
             
-            # Write updated content back to file
-            with open(self.xml_file_path, 'w', encoding='utf-8') as file:
-                file.write(content)
+            # Apply every edit in a single rebuild of the original buffer
+            atomic_write(Path(self.xml_file_path), apply_edits(index.data, edits))
             
             print(f"\n✅ Successfully updated all formulas and references!")
             print(f"📁 File updated: {self.xml_file_path}")
@@ -209,99 +286,128 @@ class ColumnReorganizer:
             print(f"❌ Error updating XML file: {e}")
             return False
     
-    def _generate_new_subarg(self, position: int, config: Dict) -> str:
+    def _generate_new_subarg(self, position: int, config: Dict, indent: str = '            ') -> str:
         """Generate XML for new column subarg."""
         letter = self.column_letters[position]
         column_num = position + 1
         
-        subarg = f"""            <!-- {column_num} ({letter}) -->
-            <subarg>
-            <arg attribute="name">{config.get('name', 'NEW_COLUMN')}</arg>
-            <arg attribute="length">{config.get('length', '80')}</arg>
-            <arg attribute="type">{config.get('type', 'STRING')}</arg>"""
-        
-        if config.get('enabled'):
-            subarg += f'\n            <arg attribute="enabled">{config["enabled"]}</arg>'
+        lines = [
+            f"<!-- {column_num} ({letter}) -->",
+            "<subarg>",
+            f'<arg attribute="name">{config.get("name", "NEW_COLUMN")}</arg>',
+            f'<arg attribute="length">{config.get("length", "80")}</arg>',
+            f'<arg attribute="type">{config.get("type", "STRING")}</arg>'
+        ]
         
-        if config.get('roundDecimal'):
-            subarg += f'\n            <arg attribute="roundDecimal">{config["roundDecimal"]}</arg>'
-            
-        if config.get('queryCol'):
-            subarg += f'\n            <arg attribute="queryCol">{config["queryCol"]}</arg>'
-            
-        if config.get('returnCol'):
-            subarg += f'\n            <arg attribute="returnCol">{config["returnCol"]}</arg>'
-            
-        if config.get('printable'):
-            subarg += f'\n            <arg attribute="printable">{config["printable"]}</arg>'
+        for attribute in ('enabled', 'roundDecimal', 'queryCol', 'returnCol', 'printable',
+                          'defaultValue', 'minValue'):
+            if config.get(attribute):
+                lines.append(f'<arg attribute="{attribute}">{config[attribute]}</arg>')
         
-        subarg += "\n            </subarg>"
+        lines.append("</subarg>")
         
-        return subarg
+        return '\n'.join(indent + line for line in lines)
+    
+    def _insertion_edit(self, index: XMLOffsetIndex, position: int, config: Dict,
+                        table_id: Optional[str] = None) -> SpanEdit:
+        """Edit that inserts a new column subarg before the column now at ``position``."""
+        table = index.find_table(table_id)
+        if table is None:
+            raise ValueError(f"Table '{table_id}' not found in {self.xml_file_path}")
+        
+        columns = table.columns
+        if not 0 <= position <= len(columns):
+            raise ValueError(f"Position {position} is out of range (0-{len(columns)})")
+        
+        if position < len(columns):
+            target = columns[position]
+            indent = target.indent.decode('utf-8')
+            text = self._generate_new_subarg(position, config, indent) + '\n'
+            return SpanEdit(target.insert_at, target.insert_at, text.encode('utf-8'))
+        
+        # Append after the last column
+        last = columns[-1]
+        indent = last.indent.decode('utf-8')
+        text = '\n' + self._generate_new_subarg(position, config, indent)
+        return SpanEdit(last.element.end, last.element.end, text.encode('utf-8'))
     
     def _insert_subarg_at_position(self, content: str, position: int, new_subarg: str) -> str:
-        """Insert new subarg at the specified column position."""
-        lines = content.split('\n')
-        
-        # Find the subarg that corresponds to the insertion position
-        subarg_count = 0
-        insert_line = -1
-        
-        for i, line in enumerate(lines):
-            if '<!-- ' in line and ' (' in line and ') -->' in line:
-                if subarg_count == position:
-                    insert_line = i
-                    break
-                subarg_count += 1
-        
-        if insert_line >= 0:
-            # Insert before the found position
-            lines.insert(insert_line, new_subarg)
+        """Insert new subarg at the specified column position of the first table."""
+        index = XMLOffsetIndex(content.encode('utf-8'))
+        table = index.find_table()
+        if table is None:
+            raise ValueError("No table columns found in content")
+        
+        if position < len(table.columns):
+            offset = table.columns[position].insert_at
+            text = new_subarg + '\n'
         else:
-            # If position not found, insert at the end of subargs
-            # Find the last </subarg> line
-            for i in range(len(lines) - 1, -1, -1):
-                if '</subarg>' in lines[i]:
-                    lines.insert(i + 1, new_subarg)
-                    break
-        
-        return '\n'.join(lines)
+            offset = table.columns[-1].element.end
+            text = '\n' + new_subarg
+        
+        return apply_edits(index.data, [SpanEdit(offset, offset, text.encode('utf-8'))]).decode('utf-8')
     
-    def preview_changes(self, insert_position: int) -> Dict:
-        """Preview what changes would be made without actually modifying the file."""
+    def plan_insertion(self, index: XMLOffsetIndex, position: int, config: Dict,
+                       table_id: Optional[str] = None,
+                       shift_references: bool = True) -> Tuple[List[SpanEdit], Dict]:
+        """
+        Span edits that insert a new column at ``position`` of a table, plus
+        the shift report. Callers can add their own edits before applying them.
         
+        With ``shift_references=False`` only the column itself is added; this is
+        meant for appending after the last column, where letters past the end
+        are variables (importTotalCol, externalValue) rather than columns.
+        """
+        edits, report = [], {'affected_formulas': [], 'affected_totales': [],
+                             'affected_exports': [], 'affected_comments': []}
+        if shift_references:
+            edits, report = self._plan_shift_edits(index, position, table_id)
+        edits.append(self._insertion_edit(index, position, config, table_id))
+        return edits, report
+    
+    def insert_column(self, position: int, config: Dict, table_id: Optional[str] = None) -> bool:
+        """
+        Insert a new column and update every reference in one pass.
+        
+        Args:
+            position: 0-based position of the new column; existing columns from
+                      this position onwards shift one letter to the right
+            config: Column definition (name, length, type, enabled, ...)
+            table_id: Driver id of the table (default: first table in the file)
+        """
         try:
-            with open(self.xml_file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
+            index = self._load_index()
+            table = index.find_table(table_id)
+            if table is None:
+                print(f"❌ No table found in {self.xml_file_path}")
+                return False
             
-            preview = {
-                'affected_formulas': [],
-                'affected_totales': [],
-                'affected_exports': [],
-                'shifted_columns': []
-            }
+            edits, report = self.plan_insertion(index, position, config, table.driver_id)
             
-            # Find affected formulas
-            beanshell_pattern = r'<arg attribute="beanshell">([^<]+)</arg>'
-            for match in re.finditer(beanshell_pattern, content):
-                original = match.group(1)
-                updated = self._shift_column_letters(original, insert_position)
-                if original != updated:
-                    preview['affected_formulas'].append({
-                        'original': original,
-                        'updated': updated
-                    })
+            atomic_write(Path(self.xml_file_path), apply_edits(index.data, edits))
             
-            # Find affected totales
-            totales_pattern = r'<arg attribute="totales">([^<]+)</arg>'
-            for match in re.finditer(totales_pattern, content):
-                original = match.group(1)
-                updated = self._update_totales_attribute(original, insert_position)
-                if original != updated:
-                    preview['affected_totales'].append({
-                        'original': original,
-                        'updated': updated
-                    })
+            print(f"➕ Inserted column '{config.get('name', 'NEW_COLUMN')}' at position "
+                  f"{position} ({self.column_letters[position]}) of table '{table.driver_id}'")
+            print(f"🔧 {len(report['affected_formulas'])} formulas, "
+                  f"{len(report['affected_totales'])} totales, "
+                  f"{len(report['affected_exports'])} exportTotalCol and "
+                  f"{len(report['affected_comments'])} column comments updated")
+            return True
+            
+        except Exception as e:
+            print(f"❌ Error inserting column: {e}")
+            return False
+    
+    def preview_changes(self, insert_position: int, table_id: Optional[str] = None) -> Dict:
+        """
+        Preview what changes would be made without actually modifying the file.
+        The ``plan`` entry holds the exact edits, ready for ``apply_plan``.
+        """
+        
+        try:
+            plan, preview = self.plan_shift(insert_position, table_id)
+            preview['plan'] = plan
+            preview['shifted_columns'] = []
             
             # Show which columns will be shifted
             for i in range(insert_position, min(len(self.column_letters), insert_position + 20)):
@@ -318,13 +424,39 @@ class ColumnReorganizer:
             return {'error': str(e)}
 
 
+def apply_main(plan_files: List[str]):
+    """Apply saved plans, all files in parallel."""
+    if not plan_files:
+        print("❌ Usage: python column_reorganizer.py apply <plan.json> [plan.json ...]")
+        sys.exit(1)
+    plans = []
+    for plan_file in plan_files:
+        try:
+            plans.extend(load_plans(plan_file))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"❌ Cannot read plan {plan_file}: {e}")
+            sys.exit(1)
+    
+    errors = apply_plans(plans)
+    for plan, error in zip(plans, errors):
+        if error:
+            print(f"❌ {plan.path}: {error}")
+        else:
+            print(f"✅ {plan.path}: {len(plan.edits)} edits applied ({plan.description})")
+    failed = sum(1 for error in errors if error)
+    print(f"\n📊 {len(plans) - failed} of {len(plans)} plans applied")
+    if failed:
+        sys.exit(1)
+
+
 def main():
     """Main function for command line usage."""
     
     if len(sys.argv) < 2:
         print("XML Table Column Reorganizer")
         print("============================")
-        print("Usage: python column_reorganizer.py <xml_file_path> <inserted_position> [preview_only]")
+        print("Usage: python column_reorganizer.py <xml_file_path> <inserted_position> [preview [plan.json]]")
+        print("       python column_reorganizer.py apply <plan.json> [plan.json ...]")
         print("")
         print("This script updates formulas after you manually add a new column to your XML.")
         print("")
@@ -336,11 +468,17 @@ def main():
         print("Examples:")
         print("  python column_reorganizer.py file.xml 3 preview    # Preview changes for insertion at position 3")
         print("  python column_reorganizer.py file.xml 3            # Update formulas for insertion at position 3")
+        print("  python column_reorganizer.py file.xml 3 preview plan.json  # Save the exact edits")
+        print("  python column_reorganizer.py apply plan.json       # Apply saved edits (refused if the file changed)")
         print("")
         print("Position Examples:")
         print("  0 = column 'a', 1 = column 'b', 2 = column 'c', etc.")
         return
     
+    if sys.argv[1] == 'apply':
+        apply_main(sys.argv[2:])
+        return
+    
     xml_file = sys.argv[1]
     
     if not sys.argv[1].endswith('.xml'):
@@ -413,12 +551,19 @@ def main():
             for total in preview['affected_totales']:
                 print(f"   {total['original']} -> {total['updated']}")
         
-        print(f"\n💡 To apply these changes, run without 'preview':")
-        print(f"   python column_reorganizer.py {xml_file} {insert_pos}")
+        plan_path = Path(sys.argv[4]) if len(sys.argv) >= 5 else Path(DEFAULT_PLAN_DIR) / f"{Path(xml_file).name}.json"
+        plan_path.parent.mkdir(parents=True, exist_ok=True)
+        save_plans([preview['plan']], plan_path)
+        print(f"\n💾 Plan with {len(preview['plan'].edits)} edits saved to {plan_path}")
+        print(f"💡 To apply exactly these changes:")
+        print(f"   python column_reorganizer.py apply {plan_path}")
     
     else:
-        # Show a brief preview first
+        # Show a brief preview first; its plan is what gets applied
         preview = reorganizer.preview_changes(insert_pos)
+        if 'error' in preview:
+            print(f"❌ Error: {preview['error']}")
+            return
         affected_count = len(preview.get('affected_formulas', []))
         
         print(f"\n📊 Changes to be made:")
@@ -431,13 +576,13 @@ def main():
         
         if confirm.lower() in ['y', 'yes']:
             print(f"\n🚀 Starting formula updates...")
-            success = reorganizer.update_formulas_after_manual_insertion(insert_pos)
+            error = apply_plan(preview['plan'])
             
-            if success:
+            if not error:
                 print(f"\n🎉 All done! Your XML formulas have been updated.")
                 print(f"💡 Remember to test your application to ensure everything works correctly.")
             else:
-                print(f"\n❌ Update failed. Please check the error messages above.")
+                print(f"\n❌ Update failed: {error}")
         else:
             print(f"\n⏹️  Operation cancelled.")
 
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Export/Import Data-Flow Checker
+Joins the values a form exports (exportValue, exportTotalCol, ...) with the
+values its printer templates import (importValue="true") and reports typos:
+template fields that nothing produces and exports that nothing reads.
+"""
+
+import argparse
+import re
+import sys
+import xml.parsers.expat
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from repo_artifacts import PERFIL, find_template, iter_artifacts
+
+# Values the Emaku client publishes on its own, without a producer in the form
+# (detime: print date and time, filled in when the template is printed)
+BUILTIN_VALUES = {'userLogin', 'detime'}
+
+# <preferences> children whose text names a value loaded by loadMultiBranch
+BRANCH_ELEMENTS = {
+    'mainPackageStore', 'minorPackageStore', 'costCenter', 'documentPrefix',
+    'branchName', 'branchAddress', 'branchPhone', 'branchEmail', 'branchCity',
+}
+
+# Arg attributes whose text is a list of value names read by the form itself
+CONSUMER_ATTRIBUTES = {'idAutoDocument', 'importTypeDocument', 'keyExternalValue'}
+
+# Arg attributes whose text is an expression over value names
+EXPRESSION_ATTRIBUTES = {'calculateExportValue', 'calculateBSExportValue', 'conditional'}
+
+_NAME = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+_STRING_LITERAL = re.compile(r'"[^"]*"')
+
+
+class Location(NamedTuple):
+    path: str
+    line: int
+    via: str
+
+
+class _Element(NamedTuple):
+    tag: str
+    attrs: Dict[str, str]
+    text: str
+    line: int
+
+
+def iter_elements(path: Path) -> List[_Element]:
+    """Every element with its text and line, from one expat pass (comments skipped)."""
+    parser = xml.parsers.expat.ParserCreate()
+    stack: List[list] = []
+    elements: List[_Element] = []
+
+    def start(tag, attrs):
+        stack.append([tag, attrs, [], parser.CurrentLineNumber])
+
+    def end(tag):
+        tag, attrs, chunks, line = stack.pop()
+        elements.append(_Element(tag, attrs, ''.join(chunks).strip(), line))
+
+    def text(data):
+        if stack:
+            stack[-1][2].append(data)
+
+    parser.StartElementHandler = start
+    parser.EndElementHandler = end
+    parser.CharacterDataHandler = text
+    with open(path, 'rb') as f:
+        parser.ParseFile(f)
+    return elements
+
+
+def expression_names(expression: str) -> List[str]:
+    return _NAME.findall(_STRING_LITERAL.sub('', expression))
+
+
+class FormFlow:
+    """Producers, consumers and printer templates of a single form."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.producers: Dict[str, List[Location]] = {}
+        self.consumers: Dict[str, List[Location]] = {}
+        self.templates: List[Tuple[str, int]] = []
+        self._collect()
+
+    def _add(self, table: Dict[str, List[Location]], name: str, line: int, via: str):
+        name = name.strip()
+        if name:
+            table.setdefault(name, []).append(Location(str(self.path), line, via))
+
+    def _collect(self):
+        for element in iter_elements(self.path):
+            tag, attrs, text, line = element
+            if tag == 'arg' and 'attribute' in attrs:
+                attribute = attrs['attribute']
+                if attribute == 'exportTotalCol':
+                    parts = text.split(',', 1)
+                    if len(parts) == 2:
+                        self._add(self.producers, parts[1], line, attribute)
+                elif attribute.startswith('exportValue'):
+                    self._add(self.producers, text, line, attribute)
+                elif attribute == 'importTotalCol':
+                    parts = text.split(',', 1)
+                    if len(parts) == 2:
+                        self._add(self.consumers, parts[1], line, attribute)
+                elif attribute.startswith('importValue') or attribute in CONSUMER_ATTRIBUTES:
+                    self._add(self.consumers, text, line, attribute)
+                elif attribute in EXPRESSION_ATTRIBUTES:
+                    for name in expression_names(text):
+                        self._add(self.consumers, name, line, attribute)
+            elif tag == 'exportValue':
+                self._add(self.producers, text.split(',', 1)[0], line, tag)
+            elif tag in BRANCH_ELEMENTS:
+                self._add(self.producers, text, line, tag)
+            elif tag == 'printerTemplate' and text:
+                self.templates.append((text, line))
+
+
+class TemplateFlow:
+    """Values a printer template reads by name."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.imports: Dict[str, List[Location]] = {}
+        for tag, attrs, text, line in iter_elements(path):
+            if attrs.get('importValue') == 'true' and text:
+                self.imports.setdefault(text, []).append(Location(str(path), line, tag))
+
+
+class PairReport(NamedTuple):
+    template_reference: str
+    template_path: Optional[Path]
+    unresolved_imports: Dict[str, List[Location]]
+
+
+class FormReport(NamedTuple):
+    form: Path
+    pairs: List[PairReport]
+    unconsumed_exports: Dict[str, List[Location]]
+
+    @property
+    def has_problems(self) -> bool:
+        return any(p.template_path is None or p.unresolved_imports for p in self.pairs)
+
+
+class DataFlowChecker:
+    """
+    Checks every form against its printer templates.
+
+    Each file is parsed once and reduced to name -> locations hash maps, so a
+    whole-repository run is a single linear pass plus dictionary lookups.
+    """
+
+    def __init__(self, root='.'):
+        self.root = Path(root)
+        self._templates: Dict[Path, TemplateFlow] = {}
+
+    def _template(self, path: Path) -> TemplateFlow:
+        if path not in self._templates:
+            self._templates[path] = TemplateFlow(path)
+        return self._templates[path]
+
+    def check_form(self, form_path) -> FormReport:
+        form = FormFlow(Path(form_path))
+        produced = set(form.producers) | BUILTIN_VALUES
+        consumed = set(form.consumers)
+
+        pairs = []
+        seen = set()
+        for reference, _ in form.templates:
+            if reference in seen:
+                continue
+            seen.add(reference)
+            path = find_template(reference, self.root, near=form.path)
+            if path is None:
+                pairs.append(PairReport(reference, None, {}))
+                continue
+            template = self._template(path)
+            consumed.update(template.imports)
+            unresolved = {name: locations for name, locations in template.imports.items()
+                          if name not in produced}
+            pairs.append(PairReport(reference, path, unresolved))
+
+        unconsumed = {name: locations for name, locations in form.producers.items()
+                      if name not in consumed}
+        return FormReport(form.path, pairs, unconsumed)
+
+    def check_repository(self) -> List[FormReport]:
+        return [self.check_form(artifact.path)
+                for artifact in iter_artifacts(self.root, kinds=(PERFIL,))]
+
+
+def print_report(report: FormReport, show_unconsumed: bool = True):
+    """Print the findings of one form."""
+    print(f"📄 {report.form}")
+    if not report.pairs:
+        print("   (no printer templates)")
+
+    for pair in report.pairs:
+        if pair.template_path is None:
+            print(f"   ❌ {pair.template_reference}: template not found in repository")
+            continue
+        if pair.unresolved_imports:
+            print(f"   ❌ {pair.template_path}: {len(pair.unresolved_imports)} unresolved imports")
+            for name, locations in sorted(pair.unresolved_imports.items()):
+                lines = ', '.join(str(location.line) for location in locations)
+                print(f"      • {name} (line {lines})")
+        else:
+            print(f"   ✅ {pair.template_path}: all imports resolved")
+
+    if show_unconsumed and report.unconsumed_exports:
+        print(f"   ⚠️  {len(report.unconsumed_exports)} exports never read by the form or its templates:")
+        for name, locations in sorted(report.unconsumed_exports.items()):
+            location = locations[0]
+            print(f"      • {name} ({location.via}, line {location.line})")
+
+
+def main():
+    """Main function for command line usage."""
+    parser = argparse.ArgumentParser(
+        description="Check exported values of forms against printer template imports")
+    parser.add_argument('forms', nargs='*', help='Perfil files to check (default: every perfil)')
+    parser.add_argument('--root', default='.', help='Repository root (default: .)')
+    parser.add_argument('--no-unconsumed', action='store_true',
+                        help='Only report unresolved imports and missing templates')
+    args = parser.parse_args()
+
+    checker = DataFlowChecker(args.root)
+    if args.forms:
+        reports = [checker.check_form(form) for form in args.forms]
+    else:
+        reports = checker.check_repository()
+
+    for report in reports:
+        print_report(report, show_unconsumed=not args.no_unconsumed)
+
+    problems = sum(1 for report in reports if report.has_problems)
+    print(f"\n📊 {len(reports)} forms checked, {problems} with unresolved imports or missing templates")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+EMAKU Command Line Entry Point
+Single ``emaku`` command that dispatches subcommands to the repository tools.
+
+Only this module is imported at startup: each tool (and psycopg2, lxml or any
+renderer it needs) is imported when its subcommand runs, so ``emaku`` and
+``emaku --help`` stay fast.
+"""
+
+import sys
+
+# Built-in subcommands: name -> (module, function, leading argv, help). They are
+# kept here rather than in the entry point group: listing entry points scans
+# every installed distribution, which alone costs more than the startup budget of
+# ``emaku --help``, and an entry point cannot carry the leading argv.
+COMMANDS = {
+    'sync': ('xml_db_sync', 'main', ['sync'], 'Sync a perfil XML file to the database'),
+    'pull': ('xml_db_sync', 'main', ['pull'], 'Download a perfil from the database'),
+    'validate': ('xml_db_sync', 'main', ['validate'], 'Validate XML files without a database'),
+    'provision': ('xml_db_sync', 'main', ['provision'], 'Bulk load the repository into a fresh database'),
+    'test': ('xml_db_sync', 'main', ['test'], 'Test the database connection'),
+    'list': ('xml_db_sync', 'main', ['list'], 'List records stored in the database'),
+    'stats': ('xml_db_sync', 'main', ['stats'], 'Row estimate, table/TOAST size and largest stored perfiles'),
+    'config': ('xml_db_sync', 'main', ['config'], 'Show the database configuration'),
+    'reorganize': ('column_reorganizer', 'main', [], 'Update formulas after a column insertion'),
+    'rename': ('identifier_renamer', 'main', [], 'Rename SQL codes and exported names tree-wide'),
+    'dataflow': ('dataflow_checker', 'main', [], 'Check form exports against template imports'),
+    'formulas': ('formula_analyzer', 'main', [], 'Report repeated subexpressions in table formulas'),
+    'totals': ('totals_pruner', 'main', [], 'Find and prune totales columns nobody reads'),
+    'batch': ('query_batcher', 'main', [], 'Combine the lookups a component fires together into one query'),
+    'escpos': ('escpos_compiler', 'main', [], 'Compile receipt templates to ESC/POS and compare with PostScript'),
+    'replay': ('save_replay_bench', 'main', [], 'Benchmark the save pipeline of an args_driver against N lines'),
+    'logos': ('logo_cache', 'main', [], 'Pre-render template images as dithered printer bitmaps'),
+    'diff': ('perfil_semantic_diff', 'main', [], 'Semantic diff of a perfil against a file, git revision or the database'),
+    'minify': ('perfil_minifier', 'main', [], 'Report the bytes saved by uploading minified perfiles'),
+    'sql-fingerprint': ('sql_fingerprint', 'main', [], 'Group SQL sentences that are the same query after normalization'),
+    'open-cost': ('form_open_cost', 'main', [], 'Estimate the queries a form fires on open and rank lazy-loading candidates'),
+}
+
+# Entry point group where other packages can register extra subcommands
+PLUGIN_GROUP = 'emaku.commands'
+
+
+def print_help():
+    print("usage: emaku <command> [options]")
+    print("")
+    print("Commands:")
+    width = max(len(name) for name in COMMANDS)
+    for name, (_, _, _, help_text) in COMMANDS.items():
+        print(f"  {name.ljust(width)}  {help_text}")
+    print("")
+    print("Run 'emaku <command> --help' for the options of a command.")
+
+
+def _find_plugin(name):
+    """Entry point registered under ``emaku.commands`` for ``name``, if any."""
+    from importlib import metadata
+
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, 'select'):
+        matches = entry_points.select(group=PLUGIN_GROUP, name=name)
+    else:
+        matches = [ep for ep in entry_points.get(PLUGIN_GROUP, []) if ep.name == name]
+    for entry_point in matches:
+        return entry_point
+    return None
+
+
+def _load(name):
+    """Resolve a subcommand to (callable, leading argv) without importing the others."""
+    if name in COMMANDS:
+        module_name, function_name, prefix, _ = COMMANDS[name]
+        from importlib import import_module
+        return getattr(import_module(module_name), function_name), prefix
+
+    entry_point = _find_plugin(name)
+    if entry_point is not None:
+        return entry_point.load(), []
+    return None, None
+
+
+def main(argv=None):
+    """Main function for command line usage."""
+    argv = sys.argv[1:] if argv is None else list(argv)
+
+    if not argv or argv[0] in ('-h', '--help', 'help'):
+        print_help()
+        return 0
+
+    name, rest = argv[0], argv[1:]
+    function, prefix = _load(name)
+    if function is None:
+        print(f"❌ Unknown command: {name}")
+        print_help()
+        return 2
+
+    # Tools parse sys.argv themselves, so present them their usual command line
+    saved_argv = sys.argv
+    sys.argv = [f"emaku {name}"] + prefix + rest
+    try:
+        result = function()
+    except SystemExit as e:
+        result = e.code
+    finally:
+        sys.argv = saved_argv
+
+    if result is None or result is True:
+        return 0
+    if result is False:
+        return 1
+    return result
+
+
+if __name__ == "__main__":
+    sys.exit(main())
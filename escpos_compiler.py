@@ -0,0 +1,672 @@
+#!/usr/bin/env python3
+"""
+ESC/POS Template Compiler
+Compiles a thermal ``emaku_template`` once into a reusable layout and renders
+package data straight to an ESC/POS byte stream, instead of going through the
+PostScript raster path for printers that speak ESC/POS natively.
+"""
+
+import argparse
+import hashlib
+import re
+import sys
+import time
+import xml.etree.ElementTree as ET
+from collections import Counter
+from datetime import datetime
+from itertools import groupby
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from logo_cache import (DEFAULT_CACHE_DIR, DEFAULT_DPI, DEFAULT_MAX_DOTS, Bitmap, LogoCache, paper_dots,
+                        print_size, resolve_source)
+from repo_artifacts import TEMPLATE, iter_artifacts
+
+# Templates wider than this (in points) are page layouts, not receipts
+MAX_RECEIPT_WIDTH = 300
+
+ESC_INIT = b'\x1b@\x1bt\x10'       # initialize, code page WPC1252
+ESC_CUT = b'\x1bd\x04\x1dVB\x00'    # feed 4 lines, partial cut
+BARCODE_HEIGHT = 50                 # dots, plus the human readable line below
+LINE_THICKNESS = 2                  # dots
+
+# Font A is 12x24 dots, font B 9x17; ESC ! bit 0 selects font B
+_FONT_B, _BOLD, _DOUBLE_HEIGHT, _DOUBLE_WIDTH = 0x01, 0x08, 0x10, 0x20
+
+_DAYS = ['lunes', 'martes', 'miércoles', 'jueves', 'viernes', 'sábado', 'domingo']
+_MONTHS = ['enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 'julio', 'agosto',
+           'septiembre', 'octubre', 'noviembre', 'diciembre']
+_DATE_TOKEN = re.compile(r"'[^']*'|([A-Za-z])\1*|[^A-Za-z']+")
+
+# Elements only meaningful on paginated page templates, or drawn shapes
+_IGNORED = {'newpage', 'endofpage', 'nextpage', 'pagenumber', 'roundedRectangle',
+            'froundedRectangle', 'dbimage'}
+
+
+class Font(NamedTuple):
+    size: int
+    bold: bool
+
+    @property
+    def mode(self) -> int:
+        """ESC ! print mode closest to this font."""
+        mode = _BOLD if self.bold else 0
+        if self.size < 7:
+            mode |= _FONT_B
+        elif self.size >= 14:
+            mode |= _DOUBLE_HEIGHT | _DOUBLE_WIDTH
+        elif self.size >= 11:
+            mode |= _DOUBLE_HEIGHT
+        return mode
+
+    @property
+    def char_width(self) -> int:
+        width = 9 if self.mode & _FONT_B else 12
+        return width * 2 if self.mode & _DOUBLE_WIDTH else width
+
+    @property
+    def line_height(self) -> int:
+        height = 17 if self.mode & _FONT_B else 24
+        return height * 2 if self.mode & _DOUBLE_HEIGHT else height
+
+
+DEFAULT_FONT = Font(8, False)
+
+
+class Item(NamedTuple):
+    """Something printed at a vertical position (points) and horizontal offset (dots)."""
+    row: float
+    col: int
+    kind: str                # text, raster, barcode or qr
+    font: Font
+    text: str
+    data: bytes              # ESC/POS command bytes (raster/barcode/qr)
+    height: int              # dots, for everything but text
+    bitmap: Optional[Bitmap] = None
+
+
+class Slot(NamedTuple):
+    """A compiled template element; ``value`` tells whether it consumes package data."""
+    tag: str
+    row: Optional[int]       # None -> "last"
+    row_acum: int
+    col: int                 # dots
+    font: Font
+    type: str
+    mask: str
+    width: Optional[int]     # characters
+    text: str
+    label: str               # textLine printed at label_col
+    label_col: int
+    align: str               # left, right or center
+    value: bool
+    increment_row: bool
+    item: Optional[Item]     # prebuilt output for constant elements (lines, images)
+
+
+class CompiledPackage(NamedTuple):
+    slots: List[Slot]
+    subpackage: Optional[Tuple[int, int, List[Slot]]]   # rowInit, rowAcum, fields
+    validate: bool
+
+
+# ---------------------------------------------------------------- formatting
+
+def format_number(value, mask: str) -> str:
+    """Subset of java.text.DecimalFormat used by the templates (#, 0, grouping, decimals)."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    integer_mask, _, decimal_mask = mask.partition('.')
+    grouping = len(integer_mask) - integer_mask.rfind(',') - 1 if ',' in integer_mask else 0
+    min_integer = integer_mask.count('0')
+    min_decimals, max_decimals = decimal_mask.count('0'), len(decimal_mask)
+
+    text = f"{abs(number):.{max_decimals}f}"
+    integer, _, decimals = text.partition('.')
+    decimals = decimals.rstrip('0').ljust(min_decimals, '0')
+    integer = integer.lstrip('0').rjust(min_integer, '0')
+    if grouping:
+        groups = []
+        while len(integer) > grouping:
+            integer, groups = integer[:-grouping], [integer[-grouping:]] + groups
+        integer = ','.join(([integer] if integer else []) + groups)
+    sign = '-' if number < 0 and (integer.strip('0,') or decimals.strip('0')) else ''
+    return sign + integer + ('.' + decimals if decimals else '')
+
+
+def format_date(value, mask: str) -> str:
+    """Subset of java.text.SimpleDateFormat with Spanish day and month names."""
+    if isinstance(value, datetime):
+        moment = value
+    else:
+        try:
+            moment = datetime.fromisoformat(str(value).strip())
+        except ValueError:
+            return str(value)
+    parts = []
+    for match in _DATE_TOKEN.finditer(mask):
+        token, letter = match.group(0), match.group(1)
+        if letter is None:
+            parts.append(token[1:-1] or "'" if token.startswith("'") else token)
+        elif letter == 'y':
+            parts.append(str(moment.year)[-2:] if len(token) == 2 else str(moment.year))
+        elif letter == 'M':
+            name = _MONTHS[moment.month - 1]
+            parts.append(name if len(token) >= 4 else name[:3] if len(token) == 3
+                         else str(moment.month).zfill(len(token)))
+        elif letter == 'E':
+            name = _DAYS[moment.weekday()]
+            parts.append(name if len(token) >= 4 else name[:3])
+        elif letter in 'dHhms':
+            number = {'d': moment.day, 'H': moment.hour, 'h': moment.hour % 12 or 12,
+                      'm': moment.minute, 's': moment.second}[letter]
+            parts.append(str(number).zfill(len(token)))
+        elif letter == 'a':
+            parts.append('AM' if moment.hour < 12 else 'PM')
+        else:
+            parts.append(token)
+    return ''.join(parts)
+
+
+def format_value(value, slot: Slot) -> str:
+    if value is None:
+        return ''
+    if slot.type == 'NUMERIC' and slot.mask:
+        return format_number(value, slot.mask)
+    if slot.type == 'DATE':
+        return format_date(value, slot.mask or 'yyyy-MM-dd')
+    text = str(value)
+    return text[:slot.width] if slot.type == 'STRING' and slot.width else text
+
+
+# ------------------------------------------------------------------ commands
+
+def _u16(value: int) -> bytes:
+    return bytes((value & 0xff, value >> 8))
+
+
+def _feed(dots: int) -> bytes:
+    """ESC J: print the line buffer and feed exactly ``dots``."""
+    out = b''
+    while dots > 0:
+        step = min(dots, 255)
+        out += b'\x1bJ' + bytes((step,))
+        dots -= step
+    return out
+
+
+def _place(bitmap: Bitmap, offset: int, paper: int) -> Bitmap:
+    """The bitmap shifted ``offset`` dots to the right on a paper-wide raster."""
+    width = min(paper, offset + bitmap.width)
+    row_bytes = (width + 7) // 8
+    rows = []
+    for y in range(bitmap.height):
+        row = int.from_bytes(bitmap.data[y * bitmap.row_bytes:(y + 1) * bitmap.row_bytes], 'big')
+        shift = row_bytes * 8 - bitmap.row_bytes * 8 - offset
+        row = row << shift if shift >= 0 else row >> -shift
+        rows.append((row & ((1 << row_bytes * 8) - 1)).to_bytes(row_bytes, 'big'))
+    return Bitmap(width, bitmap.height, b''.join(rows))
+
+
+def _bar(start: int, end: int, paper: int) -> Bitmap:
+    start, end = max(0, min(start, end)), min(paper, max(start, end))
+    row_bytes = (end + 7) // 8
+    bits = ((1 << (end - start)) - 1) << (row_bytes * 8 - end)
+    return Bitmap(end, LINE_THICKNESS, bits.to_bytes(row_bytes, 'big') * LINE_THICKNESS)
+
+
+def barcode_command(value: str) -> bytes:
+    """CODE128 barcode (code set B) with the human readable text below."""
+    data = b'{B' + value.encode('ascii', 'replace')[:253]
+    return (b'\x1dh' + bytes((BARCODE_HEIGHT,)) + b'\x1dw\x02\x1dH\x02'
+            + b'\x1dkI' + bytes((len(data),)) + data)
+
+
+# CODE128 symbols as bar/space widths in modules, by symbol value (104 is start B, 106 stop)
+_CODE128 = (
+    '212222 222122 222221 121223 121322 131222 122213 122312 132212 221213 221312 231212 112232 '
+    '122132 122231 113222 123122 123221 223211 221132 221231 213212 223112 312131 311222 321122 '
+    '321221 312212 322112 322211 212123 212321 232121 111323 131123 131321 112313 132113 132311 '
+    '211313 231113 231311 112133 112331 132131 113123 113321 133121 313121 211331 231131 213113 '
+    '213311 213131 311123 311321 331121 312113 312311 332111 314111 221411 431111 111224 111422 '
+    '121124 121421 141122 141221 112214 112412 122114 122411 142112 142211 241211 221114 413111 '
+    '241112 134111 111242 121142 121241 114212 124112 124211 411212 421112 421211 212141 214121 '
+    '412121 111143 111341 131141 114113 114311 411113 411311 113141 114131 311141 411131 211412 '
+    '211214 211232 2331112').split()
+BARCODE_MODULE = 2                  # dots per module, as set with GS w
+
+
+def code128_widths(value: str) -> List[int]:
+    """Bar and space widths (in modules, starting with a bar) of the CODE128 set B symbol."""
+    data = value.encode('ascii', 'replace')[:251]
+    symbols = [104] + [byte - 32 if 32 <= byte < 128 else 31 for byte in data]
+    symbols.append((symbols[0] + sum(position * symbol for position, symbol in enumerate(symbols[1:], 1))) % 103)
+    return [int(width) for symbol in symbols + [106] for width in _CODE128[symbol]]
+
+
+def _qr_modules(value: str) -> int:
+    """Approximate QR size (modules per side) for byte-mode data at level L."""
+    capacity = [17, 32, 53, 78, 106, 134, 154, 192, 230, 271]
+    version = next((i + 1 for i, limit in enumerate(capacity) if len(value.encode('utf-8')) <= limit), 10)
+    return 17 + 4 * version
+
+
+def qr_command(value: str, module: int) -> bytes:
+    data = value.encode('utf-8')
+    return (b'\x1d(k\x04\x001A2\x00'                      # model 2
+            + b'\x1d(k\x03\x001C' + bytes((module,))       # module size
+            + b'\x1d(k\x03\x001E0'                         # error correction L
+            + b'\x1d(k' + _u16(len(data) + 3) + b'1P0' + data
+            + b'\x1d(k\x03\x001Q0')                        # print
+
+
+def _ps_string(text: str) -> str:
+    return '(' + text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') + ')'
+
+
+# ------------------------------------------------------------------- layout
+
+class CompiledLayout:
+    """Everything about a template that does not depend on the data being printed."""
+
+    def __init__(self, path, root='.', units: str = 'percent', dpi: int = DEFAULT_DPI,
+                 max_dots: int = DEFAULT_MAX_DOTS, cache: Optional[LogoCache] = None):
+        self.path = Path(path)
+        self.root = Path(root)
+        self.units = units
+        self.dpi = dpi
+        self.cache = cache or LogoCache(self.root / DEFAULT_CACHE_DIR)
+        data = self.path.read_bytes()
+        self.digest = hashlib.sha256(data).hexdigest()
+        tree = ET.fromstring(data)
+
+        settings = tree.find('settings')
+        settings_width = settings.get('width') if settings is not None else None
+        self.settings_width = int(settings_width) if settings_width and settings_width.isdigit() else 220
+        self.paper = paper_dots(settings_width, dpi, max_dots)
+        self.x_scale = self.paper / self.settings_width
+        self.y_scale = dpi / 72
+        self.ignored: Counter = Counter()
+        self.missing_images: List[str] = []
+        self.unreadable_images: Dict[str, str] = {}     # reference -> decoding error
+        self.font = DEFAULT_FONT
+
+        self.static: List[Slot] = []
+        for element in tree.findall('metadata'):
+            self.static.extend(self._compile_elements(element))
+        self.packages: List[CompiledPackage] = []
+        for element in tree.findall('package'):
+            slots, subpackage = [], None
+            for child in element:
+                if child.tag == 'subpackage':
+                    fields = self._compile_elements(child)
+                    subpackage = (int(child.get('rowInit', '0')), int(child.get('rowAcum', '10')), fields)
+                else:
+                    slots.extend(self._compile_elements([child]))
+            self.packages.append(CompiledPackage(slots, subpackage, element.get('validate') == 'true'))
+        for child in tree:
+            if child.tag in _IGNORED:
+                self.ignored[child.tag] += 1
+
+    # ------------------------------------------------------------- compile
+
+    def _dots(self, value: Optional[str]) -> int:
+        return round(int(value or 0) * self.x_scale)
+
+    def _font_of(self, element) -> Font:
+        size = element.get('fontSize') or element.get('fontsize')
+        style = element.get('fontStyle') or element.get('fontStyl')
+        if size is None and style is None:
+            return self.font
+        return Font(int(size) if size and size.isdigit() else self.font.size,
+                    style in ('1', '3') if style is not None else self.font.bold)
+
+    def _compile_elements(self, elements) -> List[Slot]:
+        slots = []
+        for element in elements:
+            tag = element.tag
+            if tag == 'font':
+                self.font = Font(int(element.get('size', '8')), element.get('fontStyle') in ('1', '3'))
+                continue
+            if tag in _IGNORED or tag == 'metadata':
+                self.ignored[tag] += 1
+                continue
+
+            row = element.get('row')
+            row = int(row) if row and row.isdigit() else None
+            text = (element.text or '').strip()
+            center = element.get('center')
+            align = 'center' if center in ('true', '1') else 'right' if element.get('type') == 'NUMERIC' else 'left'
+            width = element.get('width')
+            item = None
+            value = tag in ('field', 'generateBarCodeImage') and not text
+            value = value or (tag == 'text' and element.get('importValue') == 'true')
+
+            if tag == 'line':
+                if element.get('row') != element.get('row2') and element.get('row2') != 'last':
+                    self.ignored['vertical line'] += 1
+                    continue
+                bar = _bar(self._dots(element.get('col')), self._dots(element.get('col2')), self.paper)
+                item = Item(0, 0, 'raster', DEFAULT_FONT, '', bar.escpos(), LINE_THICKNESS, bar)
+            elif tag == 'image':
+                item = self._image_item(element, text)
+                if item is None:
+                    continue
+            elif tag not in ('field', 'text', 'time', 'date', 'ndocument', 'vndocument', 'cufe',
+                             'barcodeImage', 'generateBarCodeImage', 'qr'):
+                self.ignored[tag] += 1
+                continue
+
+            slots.append(Slot(
+                tag, row, int(element.get('rowAcum', '0')), self._dots(element.get('col')),
+                self._font_of(element), element.get('type', 'STRING'), element.get('mask', ''),
+                int(width) if width and width.isdigit() and tag in ('field', 'text') else None,
+                text, element.get('textLine', ''), self._dots(element.get('textCol')), align,
+                value, element.get('incrementRow') == 'true', item))
+        return slots
+
+    def _image_item(self, element, reference) -> Optional[Item]:
+        source = resolve_source(reference, self.root)
+        if source is None:
+            self.missing_images.append(reference)
+            return None
+        try:
+            width, height = print_size(int(element.get('width', '100')), int(element.get('height', '100')),
+                                       source, self.units, self.dpi, self.paper)
+            bitmap, _ = self.cache.get(source, width, height)
+        except (OSError, ValueError) as e:
+            self.unreadable_images[reference] = str(e)
+            return None
+        offset = min(self._dots(element.get('col')), max(0, self.paper - bitmap.width))
+        placed = _place(bitmap, offset, self.paper)
+        return Item(0, 0, 'raster', DEFAULT_FONT, '', placed.escpos(), placed.height, placed)
+
+    # -------------------------------------------------------------- render
+
+    def _items(self, slot: Slot, row: float, value, document: Dict[str, str]) -> List[Item]:
+        if slot.item is not None:
+            return [slot.item._replace(row=row)]
+        if slot.tag in ('barcodeImage', 'generateBarCodeImage'):
+            code = str(value if slot.value else document.get('ndocument', ''))
+            if slot.mask and code.isdigit():
+                code = code.zfill(len(slot.mask))
+            return [Item(row, slot.col, 'barcode', slot.font, code, barcode_command(code),
+                         BARCODE_HEIGHT + 24)] if code else []
+        if slot.tag == 'qr':
+            content = document.get('qr') or document.get('cufe', '')
+            if not content:
+                return []
+            modules = _qr_modules(content)
+            module = max(1, min(16, round(int(slot.width or 115) * self.y_scale) // modules))
+            return [Item(row, slot.col, 'qr', slot.font, content, qr_command(content, module),
+                         module * modules)]
+
+        if slot.value:
+            text = format_value(value, slot)
+        elif slot.tag in ('time', 'date'):
+            moment = document.get('date') or datetime.now()
+            text = format_date(moment, slot.mask or ('HH:mm:ss' if slot.tag == 'time' else 'yyyy-MM-dd'))
+        elif slot.tag in ('ndocument', 'vndocument', 'cufe'):
+            text = str(document.get('cufe' if slot.tag == 'cufe' else 'ndocument', ''))
+        else:
+            text = slot.text
+
+        items = []
+        if slot.label:
+            items.append(Item(row, slot.label_col, 'text', slot.font, slot.label, b'', 0))
+        if text:
+            width = len(text) * slot.font.char_width
+            if slot.align == 'center':
+                col = (self.paper - width) // 2
+            elif slot.align == 'right':
+                col = slot.col - width
+            else:
+                col = slot.col
+            items.append(Item(row, max(0, min(col, self.paper - width)), 'text', slot.font, text, b'', 0))
+        return items
+
+    def render(self, packages: List, document: Optional[Dict[str, str]] = None) -> List[Item]:
+        """
+        Position every element for one document.
+
+        ``packages`` holds one entry per ``<package>``: the list of its values,
+        or for a package with a subpackage the list of its rows.
+        """
+        document = document or {}
+        items: List[Item] = []
+        for slot in self.static:
+            items.extend(self._items(slot, slot.row or 0, None, document))
+
+        last = 0
+        for package, data in zip(self.packages, list(packages) + [[]] * len(self.packages)):
+            values = list(data or [])
+            if package.validate and not any(value not in (None, '') for value in values):
+                continue
+            if package.subpackage:
+                row_init, row_acum, fields = package.subpackage
+                row = row_init
+                for values_row in values:
+                    remaining = iter(values_row)
+                    for slot in fields:
+                        items.extend(self._items(slot, row, next(remaining, None) if slot.value else None,
+                                                 document))
+                        if slot.increment_row:
+                            row += row_acum
+                    last = row
+                    row += row_acum
+                continue
+
+            remaining = iter(values)
+            for slot in package.slots:
+                if slot.row is not None and not slot.row_acum:
+                    row = slot.row
+                else:
+                    row = last + slot.row_acum
+                last = row
+                items.extend(self._items(slot, row, next(remaining, None) if slot.value else None, document))
+
+        items.sort(key=lambda item: (item.row, item.kind != 'text', item.col))
+        return items
+
+    def escpos(self, packages: List, document: Optional[Dict[str, str]] = None) -> bytes:
+        out = bytearray(ESC_INIT)
+        position = 0
+        for row, group in groupby(self.render(packages, document), key=lambda item: item.row):
+            target = round(row * self.y_scale)
+            if target > position:
+                out += _feed(target - position)
+                position = target
+            line_height = 0
+            for item in group:
+                if item.kind == 'text':
+                    out += (b'\x1b$' + _u16(item.col) + b'\x1b!' + bytes((item.font.mode,))
+                            + item.text.encode('cp1252', 'replace'))
+                    line_height = max(line_height, item.font.line_height)
+                    continue
+                if line_height:
+                    out += _feed(line_height)
+                    position += line_height
+                    line_height = 0
+                if item.kind in ('barcode', 'qr'):
+                    out += b'\x1b$' + _u16(item.col)
+                out += item.data
+                position += item.height
+            if line_height:
+                out += _feed(line_height)
+                position += line_height
+        return bytes(out + ESC_CUT)
+
+    def postscript(self, packages: List, document: Optional[Dict[str, str]] = None) -> bytes:
+        """
+        The same document as minimal PostScript (text, strokes, 1-bit image masks
+        and CODE128 bars), standing in for the client's PostScript print path.
+        QR codes are masks of the right number of modules, not a valid symbol.
+        """
+        items = self.render(packages, document)
+        height = (items[-1].row + 50) if items else 100
+        out = [f"%!PS-Adobe-3.0\n%%BoundingBox: 0 0 {self.settings_width} {int(height)}\n"]
+        current = None
+        for item in items:
+            x = item.col / self.x_scale
+            y = height - item.row
+            if item.kind == 'text':
+                font = ('/Helvetica-Bold' if item.font.bold else '/Helvetica', item.font.size)
+                if font != current:
+                    out.append(f"{font[0]} {font[1]} selectfont\n")
+                    current = font
+                out.append(f"{x:.1f} {y:.1f} moveto {_ps_string(item.text)} show\n")
+            elif item.kind == 'raster' and item.height == LINE_THICKNESS:
+                bits = int.from_bytes(item.bitmap.data[:item.bitmap.row_bytes], 'big')
+                start = item.bitmap.row_bytes * 8 - bits.bit_length()
+                out.append(f"{start / self.x_scale:.1f} {y:.1f} moveto "
+                           f"{item.bitmap.width / self.x_scale:.1f} {y:.1f} lineto stroke\n")
+            elif item.kind == 'raster':
+                out.append(_ps_imagemask(item.bitmap, x, y, self.x_scale, self.y_scale))
+            elif item.kind == 'barcode':
+                bar_height = BARCODE_HEIGHT / self.y_scale
+                left = x
+                for number, width in enumerate(code128_widths(item.text)):
+                    width = width * BARCODE_MODULE / self.x_scale
+                    if number % 2 == 0:
+                        out.append(f"{left:.1f} {y - bar_height:.1f} {width:.1f} {bar_height:.1f} rectfill\n")
+                    left += width
+            else:
+                modules = _qr_modules(item.text)
+                row_bytes = (modules + 7) // 8
+                pattern = hashlib.sha256(item.text.encode('utf-8')).digest()
+                data = (pattern * (row_bytes * modules // len(pattern) + 1))[:row_bytes * modules]
+                scale = item.height / modules
+                out.append(_ps_imagemask(Bitmap(modules, modules, data), x, y,
+                                         self.x_scale / scale, self.y_scale / scale))
+        out.append("showpage\n")
+        return ''.join(out).encode('latin-1', 'replace')
+
+
+def _ps_imagemask(bitmap: Bitmap, x: float, y: float, x_scale: float, y_scale: float) -> str:
+    """A 1-bit bitmap painted with ``imagemask``, two hex digits per 8 dots."""
+    w, h = bitmap.width, bitmap.height
+    rows = (bitmap.data[row * bitmap.row_bytes:(row + 1) * bitmap.row_bytes].hex() for row in range(h))
+    return (f"gsave {x:.1f} {y - h / y_scale:.1f} translate {w / x_scale:.1f} {h / y_scale:.1f} scale\n"
+            f"{w} {h} true [{w} 0 0 -{h} 0 {h}] currentfile /ASCIIHexDecode filter imagemask\n"
+            + '\n'.join(rows) + ">\ngrestore\n")
+
+
+# Compiled layouts by template content, reused for every document printed with it
+_LAYOUTS: Dict[tuple, CompiledLayout] = {}
+
+
+def compile_template(path, root='.', units: str = 'percent', dpi: int = DEFAULT_DPI,
+                     max_dots: int = DEFAULT_MAX_DOTS, cache: Optional[LogoCache] = None) -> CompiledLayout:
+    """Compiled layout of a template, compiled again only when the file or the options change."""
+    digest = hashlib.sha256(Path(path).read_bytes()).hexdigest()
+    key = (digest, str(Path(root).resolve()), units, dpi, max_dots)
+    if key not in _LAYOUTS:
+        _LAYOUTS[key] = CompiledLayout(path, root, units, dpi, max_dots, cache)
+    return _LAYOUTS[key]
+
+
+def is_receipt(path) -> bool:
+    """True for templates printed on a thermal printer (narrow, nativeprinter)."""
+    root = ET.parse(path).getroot()
+    settings = root.find('settings')
+    width = settings.get('width', '') if settings is not None else ''
+    return root.get('nativeprinter') == 'true' and width.isdigit() and int(width) <= MAX_RECEIPT_WIDTH
+
+
+def sample_data(layout: CompiledLayout, lines: int = 10) -> Tuple[List, Dict[str, str]]:
+    """Synthetic packages for a layout: one value per data slot and ``lines`` item rows."""
+    samples = {'NUMERIC': '12345.67', 'DATE': '2024-05-17', 'STRING': 'PRODUCTO DE PRUEBA'}
+    packages = []
+    for package in layout.packages:
+        if package.subpackage:
+            row = [samples.get(slot.type, 'X') for slot in package.subpackage[2] if slot.value]
+            packages.append([row] * lines)
+        else:
+            packages.append([samples.get(slot.type, 'X') for slot in package.slots if slot.value])
+    document = {'ndocument': '4447-50001', 'date': '2024-05-17 10:30:00',
+                'cufe': 'https://catalogo-vpfe.dian.gov.co/document/searchqr?documentkey=' + 'a1' * 48}
+    return packages, document
+
+
+def _positive(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def main():
+    """Main function for command line usage."""
+    parser = argparse.ArgumentParser(
+        description="Compile thermal printer templates to ESC/POS and compare with PostScript")
+    parser.add_argument('templates', nargs='*', help='Template files (default: every receipt template)')
+    parser.add_argument('--root', default='.', help='Repository root (default: .)')
+    parser.add_argument('--data', help='JSON file with {"packages": [...], "document": {...}}')
+    parser.add_argument('--lines', type=int, default=10,
+                        help='Item lines of the synthetic document when --data is not given (default: 10)')
+    parser.add_argument('--repeat', type=_positive, default=20, help='Renders timed per template (default: 20)')
+    parser.add_argument('--output', '-o', help='Write the ESC/POS stream of a single template here')
+    parser.add_argument('--units', choices=['percent', 'points'], default='percent',
+                        help='Meaning of image width/height (default: percent of the source)')
+    args = parser.parse_args()
+
+    if args.output and len(args.templates) != 1:
+        print("❌ --output needs exactly one template")
+        sys.exit(1)
+    data = None
+    if args.data:
+        import json
+        with open(args.data, encoding='utf-8') as f:
+            data = json.load(f)
+
+    templates = args.templates or [artifact.path for artifact in iter_artifacts(args.root, kinds=(TEMPLATE,))
+                                   if is_receipt(artifact.path)]
+    success = True
+    total_escpos = total_postscript = 0
+    for template in templates:
+        try:
+            started = time.perf_counter()
+            layout = compile_template(template, args.root, units=args.units)
+            compile_ms = (time.perf_counter() - started) * 1000
+        except (ET.ParseError, ValueError, OSError) as e:
+            print(f"❌ {template}: {e}")
+            success = False
+            continue
+        packages, document = (data.get('packages', []), data.get('document', {})) if data \
+            else sample_data(layout, args.lines)
+
+        timings = {}
+        for name, render in (('escpos', layout.escpos), ('postscript', layout.postscript)):
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                output = render(packages, document)
+            timings[name] = ((time.perf_counter() - started) * 1000 / args.repeat, output)
+        (escpos_ms, escpos), (ps_ms, postscript) = timings['escpos'], timings['postscript']
+        total_escpos += len(escpos)
+        total_postscript += len(postscript)
+
+        print(f"📄 {template} (compiled in {compile_ms:.1f} ms)")
+        print(f"   📊 ESC/POS {len(escpos) / 1024:.1f} KB in {escpos_ms:.2f} ms, "
+              f"PostScript {len(postscript) / 1024:.1f} KB in {ps_ms:.2f} ms")
+        for reference in sorted(set(layout.missing_images)):
+            print(f"   ⚠️  {reference}: no source image, not printed")
+        for reference, error in sorted(layout.unreadable_images.items()):
+            print(f"   ⚠️  {reference}: {error}, not printed")
+        if layout.ignored:
+            print(f"   💡 Not rendered: " + ', '.join(f"{tag} ({count})" for tag, count in sorted(layout.ignored.items())))
+        if args.output:
+            Path(args.output).write_bytes(escpos)
+            print(f"✅ Wrote {args.output}")
+
+    if total_postscript:
+        print(f"📊 {len(templates)} templates: PostScript {total_postscript / 1024:.1f} KB → "
+              f"ESC/POS {total_escpos / 1024:.1f} KB per document")
+        print("   💡 The PostScript side is a minimal stand-in generated here (1-bit masks, CODE128 bars), "
+              "not the client's output: measure the real print job before quoting a saving")
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
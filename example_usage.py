@@ -4,6 +4,7 @@ Example usage of the Column Reorganizer tool
 """
 
 from column_reorganizer import ColumnReorganizer
+from xml_patch_engine import apply_plan, save_plans
 
 def example_usage():
     """Example of how to use the column reorganizer."""
@@ -29,6 +30,13 @@ def example_usage():
     for formula in preview['affected_formulas'][:3]:
         print(f"  {formula['original']} -> {formula['updated']}")
     
+    # The preview carries the exact edits; save them to apply later
+    # (python column_reorganizer.py apply plan.json) or apply them directly
+    plan = preview['plan']
+    print(f"\nPlan: {len(plan.edits)} edits against sha256 {plan.sha256[:12]}...")
+    # save_plans([plan], 'plan.json')
+    # error = apply_plan(plan)  # None on success, refused if the file changed
+    
     # Example 2: Actually insert a column (commented out for safety)
     """
     new_column_config = {
@@ -84,6 +92,14 @@ def interactive_mode():
                 print("Column shifts:")
                 for s in preview['shifted_columns'][:10]:
                     print(f"  {s['old_letter']} -> {s['new_letter']}")
+                
+                if input("Apply these edits now? (y/N): ").lower() == 'y':
+                    error = apply_plan(preview['plan'])
+                    print(f"Error: {error}" if error else "Edits applied")
+                elif input("Save them as a plan? (y/N): ").lower() == 'y':
+                    plan_file = input("Plan file (default plan.json): ").strip() or "plan.json"
+                    save_plans([preview['plan']], plan_file)
+                    print(f"Apply later with: python column_reorganizer.py apply {plan_file}")
             
             elif choice == '2':
                 pos = int(input("Enter insertion position (0-based): "))
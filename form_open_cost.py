@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Form-Open Cost Model
+Walks the components of a perfil and lists the queries the client fires when
+the form opens (``sqlInit`` with ``queryOnInit``, ``sqlCombo``), estimates the
+rows and latency of each one (optionally with ``EXPLAIN`` against a local
+database) and ranks the components whose init queries can be deferred.
+"""
+
+import argparse
+import json
+import sys
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from dataflow_checker import FormFlow
+from repo_artifacts import PERFIL, iter_artifacts, read_sql_sentences
+from sql_utils import executable, sample_values
+
+# Assumed rows when a sentence is not explained: an init query fills one field,
+# a combo lists a catalog
+DEFAULT_ROWS = {'sqlInit': 1, 'sqlCombo': 25}
+DEFAULT_ROUND_TRIP_MS = 20.0
+DEFAULT_ROW_MS = 0.05
+
+
+class OpenQuery(NamedTuple):
+    code: str
+    attribute: str                  # sqlInit or sqlCombo
+    imports: List[str]              # importValue names: the query runs again when they change
+    exports: List[str]              # exportValue names filled with the result
+
+
+class ComponentCost(NamedTuple):
+    label: str
+    location: str
+    visible: bool                   # False inside a subform or a tab page that is not shown on open
+    queries: List[OpenQuery]
+
+
+class Estimate(NamedTuple):
+    rows: float
+    milliseconds: float
+    source: str                     # assumed, plan or measured
+
+
+def _args(group: ET.Element, attribute: str) -> List[str]:
+    return [(arg.text or '').strip() for arg in group.findall('arg')
+            if arg.get('attribute') == attribute and (arg.text or '').strip()]
+
+
+def _open_queries(parameters: ET.Element) -> List[OpenQuery]:
+    """Open-time queries of a component, from its parameters and their subargs."""
+    queries = []
+
+    def visit(group: ET.Element, on_init: bool):
+        on_init = on_init or 'true' in (value.lower() for value in _args(group, 'queryOnInit'))
+        imports, exports = _args(group, 'importValue'), _args(group, 'exportValue')
+        if on_init:
+            queries.extend(OpenQuery(code, 'sqlInit', imports, exports) for code in _args(group, 'sqlInit'))
+        queries.extend(OpenQuery(code, 'sqlCombo', imports, exports) for code in _args(group, 'sqlCombo'))
+        for subarg in group.findall('subarg'):
+            visit(subarg, on_init)
+
+    visit(parameters, False)
+    return queries
+
+
+def _label(component: ET.Element, number: int) -> str:
+    driver = component.find('driver')
+    if driver is None:
+        return f"component {number}"
+    return driver.get('id') or f"{(driver.text or '').strip().rsplit('.', 1)[-1]} #{number}"
+
+
+def read_components(path) -> List[ComponentCost]:
+    """Components of a perfil that fire queries on open, in document order."""
+    root = ET.parse(path).getroot()
+    components: List[ComponentCost] = []
+    counter = [0]
+
+    def walk(element: ET.Element, location: str, visible: bool):
+        for child in element:
+            if child.tag == 'component':
+                counter[0] += 1
+                parameters = child.find('parameters')
+                queries = _open_queries(parameters) if parameters is not None else []
+                if queries:
+                    components.append(ComponentCost(_label(child, counter[0]), location or 'form', visible, queries))
+            elif child.tag == 'panel':
+                name = child.get('name')
+                walk(child, f"{location} › {name}" if name and location else name or location, visible)
+            elif child.tag == 'tab':
+                for page, panel in enumerate(child.findall('panel')):
+                    name = panel.get('name') or f"page {page + 1}"
+                    walk(panel, f"{location} › tab {name}" if location else f"tab {name}", visible and page == 0)
+            elif child.tag == 'FORM':
+                # Nested forms (payment dialogs...) are built with the form but shown later
+                name = (child.findtext('preferences/name') or '').strip() or 'subform'
+                walk(child, f"{location} › subform {name}" if location else f"subform {name}", False)
+
+    walk(root, '', True)
+    return components
+
+
+class CostModel:
+    """Latency of a query: one round trip plus the transfer of its rows (plus execution when measured)."""
+
+    def __init__(self, round_trip_ms: float = DEFAULT_ROUND_TRIP_MS, row_ms: float = DEFAULT_ROW_MS,
+                 default_rows: Optional[Dict[str, float]] = None):
+        self.round_trip_ms = round_trip_ms
+        self.row_ms = row_ms
+        self.default_rows = dict(DEFAULT_ROWS, **(default_rows or {}))
+        self.explained: Dict[str, Estimate] = {}
+
+    def explain(self, cursor, code: str, sql: str, analyze: bool = False):
+        """Record the planner's (or, with ``analyze``, the actual) rows and time of a sentence."""
+        options = 'FORMAT JSON, ANALYZE' if analyze else 'FORMAT JSON'
+        cursor.execute(f"EXPLAIN ({options}) {executable(sql)}", sample_values(sql))
+        result = cursor.fetchone()[0]
+        plan = (json.loads(result) if isinstance(result, str) else result)[0]
+        if analyze:
+            rows = plan['Plan']['Actual Rows']
+            execution = plan.get('Planning Time', 0.0) + plan.get('Execution Time', 0.0)
+            self.explained[code] = Estimate(rows, self._latency(rows) + execution, 'measured')
+        else:
+            rows = plan['Plan']['Plan Rows']
+            self.explained[code] = Estimate(rows, self._latency(rows), 'plan')
+
+    def _latency(self, rows: float) -> float:
+        return self.round_trip_ms + rows * self.row_ms
+
+    def estimate(self, query: OpenQuery) -> Estimate:
+        if query.code in self.explained:
+            return self.explained[query.code]
+        rows = self.default_rows[query.attribute]
+        return Estimate(rows, self._latency(rows), 'assumed')
+
+    def component_ms(self, component: ComponentCost) -> float:
+        return sum(self.estimate(query).milliseconds for query in component.queries)
+
+
+class Candidate(NamedTuple):
+    component: ComponentCost
+    milliseconds: float
+    reason: str
+    feeds: List[str]                # exported names other components import
+
+
+def rank_candidates(components: List[ComponentCost], model: CostModel,
+                    consumed: Optional[set] = None) -> List[Candidate]:
+    """
+    Components worth loading lazily, most savings first. Components whose
+    exports other components import come last: deferring them defers those too.
+    """
+    consumed = consumed or set()
+    candidates = []
+    for component in components:
+        feeds = sorted({name for query in component.queries for name in query.exports if name in consumed})
+        if feeds:
+            reason = f"feeds {', '.join(feeds)}: defer together with its consumers"
+        elif not component.visible and 'subform ' in component.location:
+            reason = "subform: load when the subform is shown"
+        elif not component.visible:
+            reason = "hidden tab page: load when the tab is selected"
+        elif all(query.attribute == 'sqlCombo' for query in component.queries):
+            reason = "combo: load the list on first popup"
+        else:
+            reason = "no other component imports its values: load on first use"
+        candidates.append(Candidate(component, model.component_ms(component), reason, feeds))
+    return sorted(candidates, key=lambda candidate: (bool(candidate.feeds), -candidate.milliseconds,
+                                                     candidate.component.visible))
+
+
+def explain_queries(model: CostModel, codes: List[str], root='.', config_file: Optional[str] = None,
+                    analyze: bool = False) -> List[str]:
+    """EXPLAIN every sentence in ``codes`` against the configured database; returns the codes that failed."""
+    from xml_db_sync import XMLDatabaseSync
+    sync_tool = XMLDatabaseSync(config_file or "db_config.json")
+    sentences = read_sql_sentences(codes, root)
+    missing = [code for code in codes if code not in sentences]
+    if missing:
+        sentences.update(sync_tool.fetch_sql_sentences(missing))
+
+    conn = sync_tool._get_connection()
+    if not conn:
+        return list(codes)
+    failed = [code for code in codes if code not in sentences]
+    try:
+        cursor = conn.cursor()
+        for code in codes:
+            if code not in sentences:
+                continue
+            try:
+                model.explain(cursor, code, sentences[code], analyze)
+            except Exception as e:
+                print(f"⚠️  {code}: {e}")
+                failed.append(code)
+            conn.rollback()
+    finally:
+        conn.rollback()
+        conn.close()
+    return failed
+
+
+def print_form(path, components: List[ComponentCost], model: CostModel, consumed: set, top: int):
+    queries = [query for component in components for query in component.queries]
+    total = sum(model.component_ms(component) for component in components)
+    hidden = sum(model.component_ms(component) for component in components if not component.visible)
+    print(f"📋 {path}: {len(queries)} queries on open in {len(components)} components, ~{total:.0f} ms")
+    print(f"   {'ms':>7} {'rows':>7}  component")
+    for component in sorted(components, key=model.component_ms, reverse=True):
+        estimates = [model.estimate(query) for query in component.queries]
+        print(f"   {model.component_ms(component):>7.1f} {sum(e.rows for e in estimates):>7.0f}  "
+              f"{component.label} ({component.location})")
+        for query, estimate in zip(component.queries, estimates):
+            print(f"   {'':>7} {estimate.rows:>7.0f}    {query.attribute} {query.code} [{estimate.source}]")
+
+    print("🐢 Lazy-loading candidates:")
+    for number, candidate in enumerate(rank_candidates(components, model, consumed)[:top], 1):
+        print(f"   {number}. {candidate.component.label}: {candidate.milliseconds:.1f} ms, {candidate.reason}")
+    if hidden:
+        print(f"📊 {hidden:.0f} ms of {total:.0f} ms are spent on tab pages and subforms not visible on open")
+
+
+def main():
+    """Main function for command line usage."""
+    parser = argparse.ArgumentParser(
+        description="Estimate the queries and latency a form spends on open and rank lazy-loading candidates")
+    parser.add_argument('files', nargs='*', help='Perfil XML files (default: rank every perfil in --root)')
+    parser.add_argument('--root', default='.', help='Repository root (default: .)')
+    parser.add_argument('--explain', action='store_true', help='Take the rows from EXPLAIN on the database')
+    parser.add_argument('--analyze', action='store_true', help='Use EXPLAIN ANALYZE (runs the queries)')
+    parser.add_argument('--config', help='Config file path (default: db_config.json)')
+    parser.add_argument('--round-trip', type=float, default=DEFAULT_ROUND_TRIP_MS,
+                        help=f'Client-server round trip per query in ms (default: {DEFAULT_ROUND_TRIP_MS})')
+    parser.add_argument('--row-ms', type=float, default=DEFAULT_ROW_MS,
+                        help=f'Transfer and decoding time per row in ms (default: {DEFAULT_ROW_MS})')
+    parser.add_argument('--top', type=int, default=10, help='Candidates or forms shown (default: 10)')
+    args = parser.parse_args()
+
+    model = CostModel(args.round_trip, args.row_ms)
+    if not args.files:
+        forms = []
+        for artifact in iter_artifacts(args.root, kinds=(PERFIL,)):
+            try:
+                components = read_components(artifact.path)
+            except ET.ParseError as e:
+                print(f"⚠️  {artifact.path}: {e}")
+                continue
+            queries = sum(len(component.queries) for component in components)
+            forms.append((sum(map(model.component_ms, components)), queries, artifact.path))
+        forms.sort(reverse=True)
+        print(f"📊 Forms by estimated open cost (assumed rows, {args.round_trip:g} ms per round trip):")
+        for total, queries, path in forms[:args.top]:
+            print(f"   {total:>7.0f} ms  {queries:>3} queries  {path}")
+        return
+
+    forms = []
+    for name in args.files:
+        try:
+            forms.append((name, read_components(name)))
+        except (OSError, ET.ParseError) as e:
+            print(f"❌ {name}: {e}")
+            sys.exit(1)
+
+    if args.explain or args.analyze:
+        codes = sorted({query.code for _, components in forms for component in components
+                        for query in component.queries})
+        failed = explain_queries(model, codes, args.root, args.config, args.analyze)
+        if failed:
+            print(f"⚠️  {len(failed)} sentences could not be explained, their rows are assumed: "
+                  f"{', '.join(failed)}")
+
+    for name, components in forms:
+        print_form(name, components, model, set(FormFlow(Path(name)).consumers), args.top)
+
+
+if __name__ == "__main__":
+    main()
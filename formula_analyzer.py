@@ -0,0 +1,552 @@
+#!/usr/bin/env python3
+"""
+Formula Common-Subexpression Analyzer
+Parses the beanshell/formula args of each table, hashes normalized subtrees
+and reports subexpressions that are evaluated more than once per row edit.
+Shared numeric values can be moved into a hidden helper column.
+"""
+
+import argparse
+import re
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from column_reorganizer import FORMULA_ATTRIBUTES, ColumnReorganizer
+from repo_artifacts import PERFIL, iter_artifacts
+from xml_patch_engine import ArgSpan, SpanEdit, XMLOffsetIndex, apply_edits, atomic_write
+
+# Approximate interpreter work per operator, in "simple operation" units
+OPERATION_COST = {
+    '+': 1, '-': 1, '*': 1, '/': 4, '%': 4,
+    '==': 1, '!=': 1, '<': 1, '>': 1, '<=': 1, '>=': 1,
+    '&&': 1, '||': 1, '!': 1, 'neg': 1, '?': 1,
+    'call': 8,
+}
+
+COMMUTATIVE = {'+', '*', '==', '!=', '&&', '||'}
+ASSOCIATIVE = {'+', '*', '&&', '||'}
+ARITHMETIC = {'+', '-', '*', '/', '%', 'neg'}
+
+# Binding power of infix operators (higher binds tighter)
+BINDING_POWER = {
+    '?': 3, '||': 4, '&&': 5,
+    '==': 7, '!=': 7, '<': 8, '>': 8, '<=': 8, '>=': 8,
+    '+': 10, '-': 10, '*': 11, '/': 11, '%': 11,
+    '.': 15,
+}
+UNARY_POWER = 13
+
+# Hidden helper columns follow the repo convention for invisible columns
+HELPER_COLUMN = {'length': '0', 'type': 'DECIMAL', 'enabled': 'false'}
+
+# Column types whose values a DECIMAL helper can hold
+NUMERIC_TYPES = {'DECIMAL', 'INTEGER'}
+
+# Formulas are stored entity-escaped; the lexer reads the raw text so spans
+# can be patched without re-escaping anything
+_TOKEN = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<string>"[^"]*"|&quot;.*?&quot;)
+  | (?P<name>[A-Za-z_]\w*)
+  | (?P<op>&amp;&amp;|&&|\|\||&gt;=|&lt;=|&gt;|&lt;|>=|<=|==|!=|[-+*/%<>!?:().,=])
+''', re.X)
+
+_ENTITIES = {'&amp;&amp;': '&&', '&gt;=': '>=', '&lt;=': '<=', '&gt;': '>', '&lt;': '<'}
+
+
+class Token(NamedTuple):
+    kind: str
+    value: str
+    start: int
+    end: int
+
+
+class Node(NamedTuple):
+    """Expression tree node; ``start``/``end`` index the raw formula text."""
+    kind: str            # num, str, var, binary, unary, cond, call
+    value: str           # literal, variable name, operator or method name
+    children: Tuple['Node', ...]
+    start: int
+    end: int
+
+
+class Formula(NamedTuple):
+    arg: ArgSpan
+    text: str                # raw (entity-escaped) text of the arg
+    target: Optional[str]    # column assigned by "x=...", if any
+    tree: Node               # right-hand side
+
+
+class Occurrence(NamedTuple):
+    formula: int             # index into TableAnalysis.formulas
+    node: Node
+
+
+class Candidate(NamedTuple):
+    key: str
+    text: str
+    cost: int
+    occurrences: List[Occurrence]
+    numeric: bool
+    safe: bool
+    attribute: Optional[str]        # formula or beanshell when every use has that kind, None if mixed
+
+    @property
+    def savings(self) -> int:
+        """Operations saved per row edit if the value is computed once."""
+        return (len(self.occurrences) - 1) * self.cost
+
+
+def tokenize(text: str) -> List[Token]:
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if not match:
+            raise SyntaxError(f"Unexpected character {text[position]!r} at {position} in {text!r}")
+        kind = match.lastgroup
+        if kind != 'space':
+            value = match.group()
+            if kind == 'op':
+                value = _ENTITIES.get(value, value)
+            elif kind == 'string' and value.startswith('&quot;'):
+                value = '"' + value[6:-6] + '"'
+            tokens.append(Token(kind, value, match.start(), match.end()))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """Pratt parser for the beanshell subset used by EMAKU table formulas."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = tokenize(text)
+        self.position = 0
+
+    def peek(self) -> Optional[Token]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def advance(self) -> Token:
+        token = self.peek()
+        if token is None:
+            raise SyntaxError(f"Unexpected end of formula {self.text!r}")
+        self.position += 1
+        return token
+
+    def expect(self, value: str) -> Token:
+        token = self.advance()
+        if token.value != value:
+            raise SyntaxError(f"Expected {value!r} at {token.start} in {self.text!r}")
+        return token
+
+    def parse_formula(self) -> Tuple[Optional[str], Node]:
+        target = None
+        if (len(self.tokens) > 2 and self.tokens[0].kind == 'name'
+                and self.tokens[1].value == '='):
+            target = self.tokens[0].value
+            self.position = 2
+        tree = self.expression(0)
+        if self.peek() is not None:
+            token = self.peek()
+            raise SyntaxError(f"Unexpected {token.value!r} at {token.start} in {self.text!r}")
+        return target, tree
+
+    def expression(self, min_power: int) -> Node:
+        left = self.prefix()
+        while True:
+            token = self.peek()
+            if token is None or token.kind != 'op':
+                return left
+            power = BINDING_POWER.get(token.value)
+            if power is None or power <= min_power:
+                return left
+            self.advance()
+            if token.value == '?':
+                then = self.expression(0)
+                self.expect(':')
+                otherwise = self.expression(power - 1)  # right associative
+                left = Node('cond', '?', (left, then, otherwise), left.start, otherwise.end)
+            elif token.value == '.':
+                name = self.advance()
+                self.expect('(')
+                arguments = []
+                while self.peek() is not None and self.peek().value != ')':
+                    arguments.append(self.expression(0))
+                    if self.peek() is not None and self.peek().value == ',':
+                        self.advance()
+                end = self.expect(')').end
+                left = Node('call', name.value, (left, *arguments), left.start, end)
+            else:
+                right = self.expression(power)
+                left = Node('binary', token.value, (left, right), left.start, right.end)
+
+    def prefix(self) -> Node:
+        token = self.advance()
+        if token.kind == 'number':
+            return Node('num', token.value, (), token.start, token.end)
+        if token.kind == 'string':
+            return Node('str', token.value, (), token.start, token.end)
+        if token.kind == 'name':
+            return Node('var', token.value, (), token.start, token.end)
+        if token.value == '(':
+            inner = self.expression(0)
+            end = self.expect(')').end
+            return inner._replace(start=token.start, end=end)
+        if token.value in ('!', '-'):
+            operand = self.expression(UNARY_POWER)
+            operator = 'neg' if token.value == '-' else '!'
+            return Node('unary', operator, (operand,), token.start, operand.end)
+        raise SyntaxError(f"Unexpected {token.value!r} at {token.start} in {self.text!r}")
+
+
+def parse_formula(text: str) -> Tuple[Optional[str], Node]:
+    """Parse ``x=expr`` (or a bare expression) from raw formula text."""
+    return _Parser(text).parse_formula()
+
+
+def _number_key(value: str) -> str:
+    # 100 and 100.0 differ under integer division, so only trailing zeros are folded
+    if '.' in value:
+        return repr(float(value))
+    return str(int(value))
+
+
+def canonical_keys(tree: Node, keys: Dict[int, str]) -> str:
+    """
+    Fill ``keys`` (id(node) -> normalized form) for every subtree of ``tree``.
+
+    Parentheses vanish in the tree, numbers are normalized and the operands of
+    commutative operators are sorted (associative chains are flattened), so
+    ``(c*d)``, ``d*c`` and ``c * d`` share one key.
+    """
+    if tree.kind == 'num':
+        key = _number_key(tree.value)
+    elif tree.kind in ('str', 'var'):
+        key = tree.value
+    else:
+        children = [canonical_keys(child, keys) for child in tree.children]
+        if tree.kind == 'binary' and tree.value in COMMUTATIVE:
+            operands = []
+            for child, child_key in zip(tree.children, children):
+                if tree.value in ASSOCIATIVE and child.kind == 'binary' and child.value == tree.value:
+                    operands.extend(_flatten(child, tree.value, keys))
+                else:
+                    operands.append((child, child_key))
+            # '+' on a string literal is concatenation: keep its order
+            if not (tree.value == '+' and any(child.kind == 'str' for child, _ in operands)):
+                operands.sort(key=lambda operand: operand[1])
+            children = [child_key for _, child_key in operands]
+        key = f"({tree.value} {' '.join(children)})"
+    keys[id(tree)] = key
+    return key
+
+
+def _flatten(tree: Node, operator: str, keys: Dict[int, str]) -> List[Tuple[Node, str]]:
+    operands = []
+    for child in tree.children:
+        if child.kind == 'binary' and child.value == operator:
+            operands.extend(_flatten(child, operator, keys))
+        else:
+            operands.append((child, keys[id(child)]))
+    return operands
+
+
+def tree_cost(tree: Node) -> int:
+    own = OPERATION_COST.get('call' if tree.kind == 'call' else tree.value, 0) if tree.children else 0
+    return own + sum(tree_cost(child) for child in tree.children)
+
+
+def _variables(tree: Node) -> set:
+    if tree.kind == 'var':
+        return {tree.value}
+    names = set()
+    for child in tree.children:
+        names |= _variables(child)
+    return names
+
+
+def _is_numeric(tree: Node, non_numeric: set = frozenset()) -> bool:
+    """
+    Pure arithmetic over numbers and columns: a value a DECIMAL column can hold.
+    Variables in ``non_numeric`` (columns of another type) make it non-numeric;
+    variables past the last column are values such as externalValue targets,
+    taken as numeric.
+    """
+    if tree.kind == 'num':
+        return True
+    if tree.kind == 'var':
+        return tree.value not in non_numeric
+    if tree.kind in ('binary', 'unary') and tree.value in ARITHMETIC:
+        return all(_is_numeric(child, non_numeric) for child in tree.children)
+    return False
+
+
+def _column_letter(position: int) -> str:
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return letters[position] if position < 26 else letters[position // 26 - 1] + letters[position % 26]
+
+
+def _walk(tree: Node, parent: Optional[Node] = None):
+    yield tree, parent
+    for child in tree.children:
+        yield from _walk(child, tree)
+
+
+class TableAnalysis:
+    """Formulas of one table (or of the form outside tables) and their shared subtrees."""
+
+    def __init__(self, index: XMLOffsetIndex, table: Optional[int]):
+        self.index = index
+        self.table = table
+        self.formulas: List[Formula] = []
+        self.errors: List[str] = []
+        self.candidates: List[Candidate] = []
+        self._collect()
+        self._analyze()
+
+    @property
+    def name(self) -> str:
+        if self.table is None:
+            return 'form'
+        return self.index.tables[self.table].driver_id or f'table {self.table + 1}'
+
+    @property
+    def column_count(self) -> int:
+        return len(self.index.tables[self.table].columns) if self.table is not None else 0
+
+    @property
+    def cost_per_row(self) -> int:
+        return sum(tree_cost(formula.tree) for formula in self.formulas)
+
+    def _collect(self):
+        for arg in self.index.args_with(*FORMULA_ATTRIBUTES):
+            if arg.table != self.table:
+                continue
+            text = self.index.text(arg.value)
+            try:
+                target, tree = parse_formula(text)
+            except SyntaxError as e:
+                self.errors.append(str(e))
+                continue
+            self.formulas.append(Formula(arg, text, target, tree))
+
+    def _non_numeric_columns(self) -> set:
+        if self.table is None:
+            return set()
+        return {_column_letter(arg.column) for arg in self.index.args_with('type', table=self.table)
+                if arg.column is not None and self.index.text(arg.value).strip() not in NUMERIC_TYPES}
+
+    def _analyze(self):
+        non_numeric = self._non_numeric_columns()
+        occurrences: Dict[str, List[Occurrence]] = {}
+        parents: Dict[str, set] = {}
+        for number, formula in enumerate(self.formulas):
+            keys: Dict[int, str] = {}
+            canonical_keys(formula.tree, keys)
+            for node, parent in _walk(formula.tree):
+                if not node.children:
+                    continue
+                key = keys[id(node)]
+                occurrences.setdefault(key, []).append(Occurrence(number, node))
+                parents.setdefault(key, set()).add(keys[id(parent)] if parent else None)
+
+        repeated = {key for key, found in occurrences.items() if len(found) > 1}
+        for key in repeated:
+            found = occurrences[key]
+            # Skip subtrees that only ever appear inside one larger repeated subtree
+            outer = parents[key]
+            if len(outer) == 1 and next(iter(outer)) in repeated \
+                    and len(occurrences[next(iter(outer))]) == len(found):
+                continue
+            first = found[0]
+            kinds = {self.formulas[occurrence.formula].arg.attribute for occurrence in found}
+            self.candidates.append(Candidate(
+                key=key,
+                text=self.formulas[first.formula].text[first.node.start:first.node.end],
+                cost=tree_cost(first.node),
+                occurrences=found,
+                numeric=_is_numeric(first.node, non_numeric),
+                safe=self._is_safe(found),
+                attribute=kinds.pop() if len(kinds) == 1 else None,
+            ))
+        self.candidates.sort(key=lambda candidate: (-candidate.savings, candidate.key))
+
+    def _is_safe(self, found: List[Occurrence]) -> bool:
+        """
+        True when computing the value once gives the same result everywhere.
+
+        Formulas of one kind run in document order, so no formula between the
+        first and the last use may assign a column the subexpression reads.
+        Candidates whose uses mix formula and beanshell args get no helper (see
+        ``Candidate.attribute``): nothing guarantees one pass over both kinds.
+        """
+        reads = _variables(found[0].node)
+        first = min(occurrence.formula for occurrence in found)
+        last = max(occurrence.formula for occurrence in found)
+        return not any(self.formulas[number].target in reads for number in range(first, last))
+
+    def referenced_letters(self) -> set:
+        """Letters read or written by the formulas, totals and variables of this table."""
+        letters = set()
+        for formula in self.formulas:
+            letters |= _variables(formula.tree)
+            if formula.target:
+                letters.add(formula.target)
+        for arg in self.index.args_with('totales', 'exportTotalCol', 'importTotalCol', 'externalValue',
+                                        table=self.table):
+            parts = [part.strip() for part in self.index.text(arg.value).split(',')]
+            if arg.attribute == 'totales':
+                letters.update(parts)
+            elif arg.attribute == 'externalValue':
+                letters.add(parts[-1])
+            else:
+                letters.add(parts[0])
+        return letters
+
+
+class FormulaAnalyzer:
+    def __init__(self, xml_file_path, min_cost: int = 2):
+        self.xml_file_path = Path(xml_file_path)
+        self.min_cost = min_cost
+        self.index = XMLOffsetIndex.from_file(self.xml_file_path)
+
+    def _scope(self, table: Optional[int]) -> TableAnalysis:
+        scope = TableAnalysis(self.index, table)
+        scope.candidates = [c for c in scope.candidates if c.cost >= self.min_cost]
+        return scope
+
+    def analyze(self) -> List[TableAnalysis]:
+        scopes = [self._scope(number) for number in range(len(self.index.tables))]
+        scopes.append(self._scope(None))
+        return [scope for scope in scopes if scope.formulas]
+
+    def plan_helper(self, scope: TableAnalysis) -> Tuple[List[SpanEdit], Optional[Tuple[str, Candidate]]]:
+        """
+        Edits that move the best safe numeric candidate of a table into a
+        hidden helper column appended after the last column, and rewrite its
+        uses. Only candidates whose uses share one attribute kind qualify.
+        """
+        if scope.table is None:
+            return [], None
+
+        table_id = scope.index.tables[scope.table].driver_id
+        if table_id is None and scope.table != 0:
+            return [], None  # unnamed tables can only be addressed when they come first
+
+        candidate = next((c for c in scope.candidates if c.numeric and c.safe and c.attribute), None)
+        if candidate is None:
+            return [], None
+
+        reorganizer = ColumnReorganizer(str(self.xml_file_path))
+        position = scope.column_count
+        letter = reorganizer.column_letters[position]
+        if letter in scope.referenced_letters():
+            return [], None  # the next column letter is already used as a variable
+
+        config = dict(HELPER_COLUMN, name=f'CSE_{letter.upper()}')
+        edits, _ = reorganizer.plan_insertion(self.index, position, config, table_id,
+                                              shift_references=False)
+        edits.append(self._helper_formula_edit(scope, letter, candidate))
+
+        # Rewrite each using formula once, innermost text first
+        spans: Dict[int, List[Node]] = {}
+        for occurrence in candidate.occurrences:
+            spans.setdefault(occurrence.formula, []).append(occurrence.node)
+        for number, nodes in spans.items():
+            formula = scope.formulas[number]
+            text = formula.text
+            for node in sorted(nodes, key=lambda node: node.start, reverse=True):
+                text = text[:node.start] + letter + text[node.end:]
+            edits.append(self.index.replace_value(formula.arg, text))
+
+        return edits, (letter, candidate)
+
+    def _helper_formula_edit(self, scope: TableAnalysis, letter: str, candidate: Candidate) -> SpanEdit:
+        """New ``<arg>`` computing the helper, placed before the first formula using it."""
+        first = scope.formulas[min(o.formula for o in candidate.occurrences)].arg
+        data = self.index.data
+        line_start = data.rfind(b'\n', 0, first.element.start) + 1
+        indent = data[line_start:first.element.start]
+        if indent.strip():
+            line_start, indent = first.element.start, b''
+        line = f'<arg attribute="{candidate.attribute}">{letter}={candidate.text}</arg>\n'.encode('utf-8')
+        return SpanEdit(line_start, line_start, indent + line)
+
+    def generate_helpers(self, dry_run: bool = False) -> int:
+        """
+        Add helper columns to every table of the file; returns how many were added.
+
+        Helpers are added one at a time and the file is re-indexed after each,
+        so a shared value that contains another one is found again in its
+        rewritten form (e.g. ``(f-(an*(am/100.0)))*d`` becomes ``(f-ap)*d``).
+        Nothing is written until every table is done.
+        """
+        original = self.index.data
+        added = 0
+        for table in range(len(self.index.tables)):
+            while True:
+                scope = self._scope(table)
+                edits, chosen = self.plan_helper(scope)
+                if chosen is None:
+                    break
+                letter, candidate = chosen
+                print(f"   ➕ {scope.name}: helper column '{letter}' = {candidate.text} "
+                      f"(replaces {len(candidate.occurrences)} evaluations, ~{candidate.savings} ops/row)")
+                self.index = XMLOffsetIndex(apply_edits(self.index.data, edits))
+                added += 1
+
+        if added and not dry_run:
+            atomic_write(self.xml_file_path, self.index.data)
+            print(f"✅ {added} helper columns added to {self.xml_file_path}")
+        elif dry_run:
+            self.index = XMLOffsetIndex(original)
+        return added
+
+
+def print_report(path, scopes: List[TableAnalysis]):
+    print(f"📄 {path}")
+    for scope in scopes:
+        saved = sum(c.savings for c in scope.candidates if c.numeric and c.safe and c.attribute)
+        print(f"   📋 {scope.name}: {len(scope.formulas)} formulas, ~{scope.cost_per_row} ops per row edit"
+              + (f", ~{saved} avoidable" if saved else ""))
+        for error in scope.errors:
+            print(f"      ⚠️  not parsed: {error}")
+        for candidate in scope.candidates:
+            formulas = len({o.formula for o in candidate.occurrences})
+            notes = []
+            if not candidate.numeric:
+                notes.append('not numeric')
+            if not candidate.safe:
+                notes.append('operand reassigned between uses')
+            if not candidate.attribute:
+                notes.append('mixed formula/beanshell uses')
+            print(f"      🔁 {candidate.text}  ×{len(candidate.occurrences)} in {formulas} formulas, "
+                  f"cost {candidate.cost}, saves ~{candidate.savings}/row"
+                  + (f"  [{', '.join(notes)}]" if notes else ""))
+
+
+def main():
+    """Main function for command line usage."""
+    parser = argparse.ArgumentParser(
+        description="Report repeated subexpressions in beanshell/formula columns")
+    parser.add_argument('forms', nargs='*', help='Perfil files to analyze (default: every perfil)')
+    parser.add_argument('--root', default='.', help='Repository root (default: .)')
+    parser.add_argument('--min-cost', type=int, default=2,
+                        help='Ignore subexpressions cheaper than this (default: 2)')
+    parser.add_argument('--generate', action='store_true',
+                        help='Add hidden helper columns for safe numeric subexpressions')
+    parser.add_argument('--dry-run', action='store_true', help='With --generate, only show the plan')
+    args = parser.parse_args()
+
+    forms = args.forms or [artifact.path for artifact in iter_artifacts(args.root, kinds=(PERFIL,))]
+    for form in forms:
+        analyzer = FormulaAnalyzer(form, min_cost=args.min_cost)
+        print_report(form, analyzer.analyze())
+        if args.generate:
+            analyzer.generate_helpers(dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
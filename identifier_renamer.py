@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Tree-wide Identifier Renamer
+Renames SQL codes and exported value names across perfiles, args_drivers and
+printer templates with a single Aho-Corasick scan per file.
+"""
+
+import argparse
+import os
+import re
+import sys
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from xml_patch_engine import atomic_write
+
+IDENTIFIER_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# <arg attribute="..."> values that are free text shown to the user, never identifiers
+DISPLAY_ATTRIBUTES = {
+    'text', 'label', 'noDataMessage', 'errorMessage', 'defaultText', 'font',
+    'mask', 'pattern', 'dateFormat', 'dateFormatString', 'icon', 'keyStroke',
+}
+
+# Elements (outside <arg>) whose text holds SQL codes or exported value names
+IDENTIFIER_ELEMENTS = {
+    'exportValue', 'notCleanExportValue', 'loadMultiBranch', 'idManualTransaction',
+    'mainPackageStore', 'minorPackageStore', 'costCenter', 'documentPrefix',
+    'branchName', 'branchAddress', 'branchPhone', 'branchEmail', 'branchCity',
+}
+
+_START_TAG = re.compile(r'<([A-Za-z_][\w.-]*)([^>]*)>$', re.S)
+_ATTRIBUTE = re.compile(r'attribute\s*=\s*"([^"]*)"')
+_IMPORT_VALUE = re.compile(r'importValue\s*=\s*"true"')
+
+
+class AhoCorasick:
+    """Multi-pattern string matcher: one pass over the text finds every keyword."""
+
+    def __init__(self, keywords):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[str]] = [[]]
+
+        for keyword in keywords:
+            state = 0
+            for ch in keyword:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append(keyword)
+
+        # Breadth-first construction of failure links
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """Yield (start, end, keyword) for every occurrence, overlaps included."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for keyword in out[state]:
+                yield i + 1 - len(keyword), i + 1, keyword
+
+
+class Replacement(NamedTuple):
+    line: int
+    old: str
+    new: str
+    context: str
+
+
+class FileResult(NamedTuple):
+    path: str
+    replacements: List[Replacement]
+    error: Optional[str] = None
+
+
+def load_mapping(mapping_file) -> Dict[str, str]:
+    """
+    Read a mapping file with one ``OLD NEW`` pair per line.
+
+    Blank lines and ``#`` comments are ignored.
+    """
+    mapping = {}
+    with open(mapping_file, 'r', encoding='utf-8') as f:
+        for number, raw in enumerate(f, 1):
+            line = raw.split('#', 1)[0].strip()
+            if not line:
+                continue
+            parts = line.split()
+            if len(parts) != 2:
+                raise ValueError(f"{mapping_file}:{number}: expected 'OLD NEW', got {raw.strip()!r}")
+            old, new = parts
+            for identifier in (old, new):
+                if not IDENTIFIER_PATTERN.match(identifier):
+                    raise ValueError(f"{mapping_file}:{number}: invalid identifier {identifier!r}")
+            if old in mapping and mapping[old] != new:
+                raise ValueError(f"{mapping_file}:{number}: {old} mapped twice")
+            mapping[old] = new
+    return mapping
+
+
+def _is_identifier_char(ch: str) -> bool:
+    return ch.isalnum() or ch == '_'
+
+
+class _MarkupOffsets:
+    """Offsets of the markup delimiters of a file, found once and searched by bisection."""
+
+    def __init__(self, text: str):
+        # None of the delimiters can overlap itself, so plain finditer finds every occurrence
+        self._offsets = {delimiter: [m.start() for m in re.finditer(re.escape(delimiter), text)]
+                         for delimiter in ('<', '>', '<!--', '-->')}
+
+    def last(self, delimiter: str, end: int) -> int:
+        """Same as ``text.rfind(delimiter, 0, end)``."""
+        offsets = self._offsets[delimiter]
+        i = bisect_right(offsets, end - len(delimiter))
+        return offsets[i - 1] if i else -1
+
+
+def _context_of(text: str, position: int, markup: _MarkupOffsets) -> Optional[str]:
+    """
+    Describe the text node holding ``position`` if identifiers may be renamed
+    there, or return None (inside a tag, a comment, or free text).
+    """
+    tag_open = markup.last('<', position)
+    tag_close = markup.last('>', position)
+    if tag_close < tag_open or tag_close < 0:
+        return None  # inside markup (tag name or attribute value)
+
+    if markup.last('<!--', position) > markup.last('-->', position):
+        return None  # inside a comment
+
+    start_tag = text[markup.last('<', tag_close):tag_close + 1]
+    match = _START_TAG.match(start_tag)
+    if not match or start_tag.endswith('/>'):
+        return None
+    tag, attributes = match.groups()
+
+    if tag == 'arg':
+        attribute = _ATTRIBUTE.search(attributes)
+        if attribute is None:
+            return 'arg'
+        if attribute.group(1) in DISPLAY_ATTRIBUTES:
+            return None
+        return f'arg[{attribute.group(1)}]'
+    if tag in IDENTIFIER_ELEMENTS:
+        return tag
+    if _IMPORT_VALUE.search(attributes):
+        return f'{tag}[importValue]'
+    return None
+
+
+def find_replacements(text: str, automaton: AhoCorasick,
+                      mapping: Dict[str, str]) -> List[Tuple[int, int, Replacement]]:
+    """Leftmost-longest, whole-identifier matches that sit in a renamable context."""
+    candidates = []
+    for start, end, keyword in automaton.iter_matches(text):
+        if start > 0 and _is_identifier_char(text[start - 1]):
+            continue
+        if end < len(text) and _is_identifier_char(text[end]):
+            continue
+        candidates.append((start, end, keyword))
+
+    candidates.sort(key=lambda c: (c[0], -(c[1] - c[0])))
+    selected = []
+    cursor = 0
+    line, line_checked = 1, 0
+    markup = _MarkupOffsets(text) if candidates else None
+    for start, end, keyword in candidates:
+        if start < cursor:
+            continue
+        context = _context_of(text, start, markup)
+        if context is None:
+            continue
+        line += text.count('\n', line_checked, start)
+        line_checked = start
+        selected.append((start, end, Replacement(line, keyword, mapping[keyword], context)))
+        cursor = end
+    return selected
+
+
+# Worker state, built once per process by _init_worker
+_worker_mapping: Dict[str, str] = {}
+_worker_automaton: Optional[AhoCorasick] = None
+
+
+def _init_worker(mapping: Dict[str, str]):
+    global _worker_mapping, _worker_automaton
+    _worker_mapping = mapping
+    _worker_automaton = AhoCorasick(mapping)
+
+
+def _process_file(path: str, dry_run: bool) -> FileResult:
+    try:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            text = f.read()
+        found = find_replacements(text, _worker_automaton, _worker_mapping)
+        if found and not dry_run:
+            parts = []
+            cursor = 0
+            for start, end, replacement in found:
+                parts.append(text[cursor:start])
+                parts.append(replacement.new)
+                cursor = end
+            parts.append(text[cursor:])
+            atomic_write(Path(path), ''.join(parts))
+        return FileResult(path, [r for _, _, r in found])
+    except Exception as e:
+        return FileResult(path, [], str(e))
+
+
+class IdentifierRenamer:
+    def __init__(self, mapping: Dict[str, str], root='.'):
+        self.mapping = mapping
+        self.root = Path(root)
+
+    def target_files(self) -> List[Path]:
+        """Every perfil, args_driver, fragment and printer template in the repo."""
+        files = sorted((self.root / 'transacciones').glob('**/*.xml'))
+        files += sorted((self.root / 'templates').glob('*.xml'))
+        return [path for path in files if path.is_file()]
+
+    def stale_sql_files(self) -> List[Path]:
+        """SQL sentence files still named after a renamed code."""
+        sql_dir = self.root / 'sentencias_sql'
+        return sorted(p for p in sql_dir.glob('**/*.sql') if p.stem in self.mapping)
+
+    def rename(self, dry_run: bool = False, workers: Optional[int] = None) -> List[FileResult]:
+        """
+        Scan (and unless ``dry_run``, rewrite) every target file.
+
+        Files are processed in parallel; each one is read, scanned once by the
+        shared automaton and, if it changed, replaced atomically.
+        """
+        files = [str(path) for path in self.target_files()]
+        workers = workers or os.cpu_count() or 1
+
+        if workers <= 1 or len(files) <= 1:
+            _init_worker(self.mapping)
+            return [_process_file(path, dry_run) for path in files]
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self.mapping,)) as executor:
+            return list(executor.map(_process_file, files, [dry_run] * len(files),
+                                     chunksize=max(1, len(files) // (workers * 4))))
+
+    def print_report(self, results: List[FileResult], dry_run: bool):
+        changed = [r for r in results if r.replacements]
+        total = sum(len(r.replacements) for r in results)
+        counts: Dict[str, int] = {}
+
+        verb = "Would rename" if dry_run else "Renamed"
+        for result in changed:
+            print(f"📄 {result.path}")
+            for replacement in result.replacements:
+                counts[replacement.old] = counts.get(replacement.old, 0) + 1
+                print(f"   {result.path}:{replacement.line}: {replacement.old} -> "
+                      f"{replacement.new}  [{replacement.context}]")
+
+        for result in results:
+            if result.error:
+                print(f"❌ {result.path}: {result.error}")
+
+        print(f"\n📊 {verb} {total} occurrences in {len(changed)} of {len(results)} files")
+        for old, new in self.mapping.items():
+            print(f"   {old} -> {new}: {counts.get(old, 0)}")
+
+        for path in self.stale_sql_files():
+            print(f"⚠️  {path} is still named after a renamed code")
+
+        if dry_run:
+            print("\n💡 Dry run: no files were modified")
+
+
+def main():
+    """Main function for command line usage."""
+    parser = argparse.ArgumentParser(
+        description="Rename SQL codes and exported value names across the repository")
+    parser.add_argument('mapping', help="Mapping file with one 'OLD NEW' pair per line")
+    parser.add_argument('--root', default='.', help='Repository root (default: .)')
+    parser.add_argument('--dry-run', action='store_true', help='Report changes without writing files')
+    parser.add_argument('--workers', type=int, help='Parallel worker processes (default: CPU count)')
+    args = parser.parse_args()
+
+    try:
+        mapping = load_mapping(args.mapping)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    if not mapping:
+        print("❌ Mapping file is empty")
+        sys.exit(1)
+
+    renamer = IdentifierRenamer(mapping, args.root)
+    results = renamer.rename(dry_run=args.dry_run, workers=args.workers)
+    renamer.print_report(results, args.dry_run)
+    sys.exit(1 if any(r.error for r in results) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+"""
+Thermal Printer Logo Cache
+Renders the images used by printer templates as 1-bit, Floyd-Steinberg
+dithered bitmaps of the exact size they print at, and caches them by source
+hash and size so the printer driver never rescales or dithers at checkout.
+"""
+
+import argparse
+import hashlib
+import struct
+import sys
+import xml.etree.ElementTree as ET
+import zlib
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from repo_artifacts import TEMPLATE, iter_artifacts
+
+# Resolution and printable width of an 80 mm ESC/POS printer such as the EPSON TM-T20
+DEFAULT_DPI = 203
+DEFAULT_MAX_DOTS = 576
+
+# Template image paths are resolved by the client; these are their repository sources
+DEFAULT_IMAGE_SOURCES = {
+    '/icons/logo_fac.png': 'resources/images/jbeLogo.png',
+}
+
+DEFAULT_CACHE_DIR = '.emaku_cache/logos'
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# Channels per PNG color type (8-bit samples)
+_PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+class Bitmap(NamedTuple):
+    """1-bit image, rows packed MSB first, 1 = black dot (ESC/POS and PBM order)."""
+    width: int
+    height: int
+    data: bytes
+
+    @property
+    def row_bytes(self) -> int:
+        return (self.width + 7) // 8
+
+    def escpos(self) -> bytes:
+        """GS v 0 raster bit image command printing this bitmap."""
+        return (b'\x1dv0\x00' + struct.pack('<HH', self.row_bytes, self.height) + self.data)
+
+    def png(self) -> bytes:
+        """1-bit grayscale PNG of this bitmap (PNG uses 0 = black, so bits are inverted)."""
+        rows = b''.join(b'\x00' + bytes(255 - byte for byte in self.data[y * self.row_bytes:(y + 1) * self.row_bytes])
+                        for y in range(self.height))
+        return _png_file(self.width, self.height, 1, 0, rows)
+
+
+class ImageUse(NamedTuple):
+    """An ``<image>`` element of a template and the size it prints at."""
+    template: Path
+    reference: str
+    source: Optional[Path]
+    width: int               # dots
+    height: int
+
+
+# ------------------------------------------------------------------------ PNG
+
+def _chunk(kind: bytes, payload: bytes) -> bytes:
+    return (struct.pack('>I', len(payload)) + kind + payload
+            + struct.pack('>I', zlib.crc32(kind + payload) & 0xffffffff))
+
+
+def _png_file(width: int, height: int, depth: int, color_type: int, rows: bytes) -> bytes:
+    header = struct.pack('>IIBBBBB', width, height, depth, color_type, 0, 0, 0)
+    return (_PNG_SIGNATURE + _chunk(b'IHDR', header)
+            + _chunk(b'IDAT', zlib.compress(rows, 9)) + _chunk(b'IEND', b''))
+
+
+def _paeth(a: int, b: int, c: int) -> int:
+    p = a + b - c
+    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    return b if pb <= pc else c
+
+
+def decode_png(data: bytes) -> Tuple[int, int, List[int]]:
+    """
+    Decode an 8-bit, non-interlaced PNG into (width, height, gray levels).
+
+    Transparent pixels are composited over white paper, so the result is what
+    the printer would see.
+    """
+    if not data.startswith(_PNG_SIGNATURE):
+        raise ValueError("not a PNG file")
+    offset = len(_PNG_SIGNATURE)
+    chunks: Dict[bytes, List[bytes]] = {}
+    while offset < len(data):
+        length, kind = struct.unpack('>I4s', data[offset:offset + 8])
+        chunks.setdefault(kind, []).append(data[offset + 8:offset + 8 + length])
+        offset += 12 + length
+
+    width, height, depth, color_type, _, _, interlace = struct.unpack('>IIBBBBB', chunks[b'IHDR'][0])
+    if depth != 8 or interlace or color_type not in _PNG_CHANNELS:
+        raise ValueError(f"unsupported PNG (bit depth {depth}, color type {color_type}, interlace {interlace})")
+    channels = _PNG_CHANNELS[color_type]
+    stride = width * channels
+    raw = zlib.decompress(b''.join(chunks[b'IDAT']))
+
+    # Undo the per-row filters
+    pixels = bytearray(stride * height)
+    previous = bytearray(stride)
+    for y in range(height):
+        start = y * (stride + 1)
+        kind, row = raw[start], bytearray(raw[start + 1:start + 1 + stride])
+        if kind == 1:
+            for i in range(channels, stride):
+                row[i] = (row[i] + row[i - channels]) & 0xff
+        elif kind == 2:
+            for i in range(stride):
+                row[i] = (row[i] + previous[i]) & 0xff
+        elif kind == 3:
+            for i in range(stride):
+                left = row[i - channels] if i >= channels else 0
+                row[i] = (row[i] + ((left + previous[i]) >> 1)) & 0xff
+        elif kind == 4:
+            for i in range(stride):
+                left = row[i - channels] if i >= channels else 0
+                up_left = previous[i - channels] if i >= channels else 0
+                row[i] = (row[i] + _paeth(left, previous[i], up_left)) & 0xff
+        pixels[y * stride:(y + 1) * stride] = row
+        previous = row
+
+    palette = chunks.get(b'PLTE', [b''])[0]
+    alphas = chunks.get(b'tRNS', [b''])[0]
+    gray = []
+    for i in range(0, len(pixels), channels):
+        if color_type == 3:
+            index = pixels[i]
+            r, g, b = palette[index * 3:index * 3 + 3]
+            a = alphas[index] if index < len(alphas) else 255
+        elif channels >= 3:
+            r, g, b = pixels[i:i + 3]
+            a = pixels[i + 3] if channels == 4 else 255
+        else:
+            r = g = b = pixels[i]
+            a = pixels[i + 1] if channels == 2 else 255
+        luma = (r * 299 + g * 587 + b * 114) // 1000
+        gray.append((luma * a + 255 * (255 - a)) // 255)
+    return width, height, gray
+
+
+def png_size(path) -> Tuple[int, int]:
+    """Width and height from the IHDR chunk, without decoding the image."""
+    with open(path, 'rb') as f:
+        header = f.read(24)
+    if not header.startswith(_PNG_SIGNATURE):
+        raise ValueError(f"{path} is not a PNG file")
+    return struct.unpack('>II', header[16:24])
+
+
+# ------------------------------------------------------------- resize/dither
+
+def resize(width: int, height: int, gray: List[int], new_width: int, new_height: int) -> List[int]:
+    """Area-average resize (nearest source pixel when enlarging)."""
+    columns = [(x * width // new_width, max((x + 1) * width // new_width, x * width // new_width + 1))
+               for x in range(new_width)]
+    result = []
+    for y in range(new_height):
+        y0 = y * height // new_height
+        y1 = max((y + 1) * height // new_height, y0 + 1)
+        rows = [gray[row * width:(row + 1) * width] for row in range(y0, y1)]
+        for x0, x1 in columns:
+            total = sum(sum(row[x0:x1]) for row in rows)
+            result.append(total // ((x1 - x0) * (y1 - y0)))
+    return result
+
+
+def dither(width: int, height: int, gray: List[int]) -> Bitmap:
+    """Floyd-Steinberg error diffusion to 1 bit."""
+    levels = [float(value) for value in gray]
+    row_bytes = (width + 7) // 8
+    data = bytearray(row_bytes * height)
+    for y in range(height):
+        base = y * width
+        for x in range(width):
+            old = levels[base + x]
+            black = old < 128
+            if black:
+                data[y * row_bytes + x // 8] |= 0x80 >> (x % 8)
+            error = old - (0.0 if black else 255.0)
+            if x + 1 < width:
+                levels[base + x + 1] += error * 7 / 16
+            if y + 1 < height:
+                below = base + width + x
+                if x > 0:
+                    levels[below - 1] += error * 3 / 16
+                levels[below] += error * 5 / 16
+                if x + 1 < width:
+                    levels[below + 1] += error * 1 / 16
+    return Bitmap(width, height, bytes(data))
+
+
+# ---------------------------------------------------------------------- cache
+
+def read_pbm(data: bytes) -> Bitmap:
+    """Parse a binary (P4) PBM as written by :meth:`LogoCache.get`."""
+    magic, size, bits = data.split(b'\n', 2)
+    if magic != b'P4':
+        raise ValueError("not a binary PBM file")
+    width, height = (int(value) for value in size.split())
+    return Bitmap(width, height, bits)
+
+
+class LogoCache:
+    """Dithered bitmaps stored as ``<sha256 of source>_<width>x<height>.pbm``."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self._decoded: Dict[str, Tuple[int, int, List[int]]] = {}
+
+    def path_for(self, digest: str, width: int, height: int) -> Path:
+        return self.cache_dir / f"{digest[:16]}_{width}x{height}.pbm"
+
+    def get(self, source, width: int, height: int) -> Tuple[Bitmap, bool]:
+        """Bitmap of ``source`` at width x height dots and whether it came from the cache."""
+        data = Path(source).read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest, width, height)
+        if path.is_file():
+            return read_pbm(path.read_bytes()), True
+
+        if digest not in self._decoded:
+            self._decoded[digest] = decode_png(data)
+        source_width, source_height, gray = self._decoded[digest]
+        bitmap = dither(width, height, resize(source_width, source_height, gray, width, height))
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_suffix('.tmp')
+        temporary.write_bytes(b'P4\n%d %d\n' % (width, height) + bitmap.data)
+        temporary.replace(path)
+        return bitmap, False
+
+
+# ------------------------------------------------------------------ templates
+
+def paper_dots(settings_width: Optional[str], dpi: int = DEFAULT_DPI, max_dots: int = DEFAULT_MAX_DOTS) -> int:
+    """Printable width in dots for a template ``<settings width>`` (in points)."""
+    if settings_width and settings_width.isdigit():
+        return min(max_dots, int(settings_width) * dpi // 72)
+    return max_dots
+
+
+def print_size(width: int, height: int, source: Optional[Path], units: str = 'percent',
+               dpi: int = DEFAULT_DPI, paper: int = DEFAULT_MAX_DOTS,
+               keep_aspect: bool = True) -> Tuple[int, int]:
+    """
+    Dots an ``<image>`` prints at.
+
+    With ``units='percent'`` width and height scale the source image; with
+    ``units='points'`` they are 1/72 inch, like the template coordinates.
+    With ``keep_aspect`` the source is fitted inside that box keeping its
+    proportions, otherwise it is stretched to fill it. Images wider than the
+    paper are scaled down keeping their proportions.
+    Returns (0, 0) when the size depends on a source that is not available.
+    """
+    if units == 'percent':
+        if source is None:
+            return 0, 0
+        source_width, source_height = png_size(source)
+        width, height = source_width * width // 100, source_height * height // 100
+    else:
+        width, height = width * dpi // 72, height * dpi // 72
+        source_width, source_height = png_size(source) if source is not None else (width, height)
+    if keep_aspect and source_width and source_height:
+        if width * source_height > height * source_width:
+            width = source_width * height // source_height
+        else:
+            height = source_height * width // source_width
+    if width > paper:
+        width, height = paper, height * paper // width
+    return max(width, 1), max(height, 1)
+
+
+def resolve_source(reference: str, root='.', sources: Optional[Dict[str, str]] = None) -> Optional[Path]:
+    """Repository file behind a template image reference such as ``/icons/logo_fac.png``."""
+    root = Path(root)
+    sources = DEFAULT_IMAGE_SOURCES if sources is None else sources
+    if reference in sources:
+        path = root / sources[reference]
+    else:
+        path = root / 'resources' / 'images' / reference.rsplit('/', 1)[-1]
+    return path if path.is_file() else None
+
+
+def image_uses(template_path, root='.', sources: Optional[Dict[str, str]] = None,
+               units: str = 'percent', dpi: int = DEFAULT_DPI,
+               max_dots: int = DEFAULT_MAX_DOTS, keep_aspect: bool = True) -> List[ImageUse]:
+    """Every ``<image>`` of a template with the size it prints at (see :func:`print_size`)."""
+    tree = ET.parse(template_path).getroot()
+    settings = tree.find('settings')
+    paper = paper_dots(settings.get('width') if settings is not None else None, dpi, max_dots)
+
+    uses = []
+    for element in tree.iter('image'):
+        reference = (element.text or '').strip()
+        if not reference:
+            continue
+        source = resolve_source(reference, root, sources)
+        width, height = print_size(int(element.get('width', '100')), int(element.get('height', '100')),
+                                   source, units, dpi, paper, keep_aspect)
+        uses.append(ImageUse(Path(template_path), reference, source, width, height))
+    return uses
+
+
+def main():
+    """Main function for command line usage."""
+    parser = argparse.ArgumentParser(
+        description="Pre-render template images as printer-sized, dithered 1-bit bitmaps")
+    parser.add_argument('templates', nargs='*', help='Template files (default: every template)')
+    parser.add_argument('--root', default='.', help='Repository root (default: .)')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                        help=f'Where bitmaps are cached (default: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--source', action='append', default=[], metavar='REFERENCE=FILE',
+                        help='Repository file for an image reference (repeatable), '
+                             'e.g. /icons/logo_fac.png=resources/images/jbeLogo50.png')
+    parser.add_argument('--units', choices=['percent', 'points'], default='percent',
+                        help='Meaning of the image width/height (default: percent of the source)')
+    parser.add_argument('--stretch', action='store_true',
+                        help='Stretch images to width x height instead of keeping their proportions')
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI, help=f'Printer resolution (default: {DEFAULT_DPI})')
+    parser.add_argument('--max-dots', type=int, default=DEFAULT_MAX_DOTS,
+                        help=f'Printable width in dots (default: {DEFAULT_MAX_DOTS})')
+    parser.add_argument('--png', action='store_true', help='Also write each bitmap as a 1-bit PNG next to the cache')
+    args = parser.parse_args()
+
+    sources = dict(DEFAULT_IMAGE_SOURCES)
+    for mapping in args.source:
+        reference, _, path = mapping.partition('=')
+        if not path:
+            print(f"❌ --source expects REFERENCE=FILE, got {mapping!r}")
+            sys.exit(1)
+        sources[reference] = path
+
+    templates = args.templates or [artifact.path for artifact in iter_artifacts(args.root, kinds=(TEMPLATE,))]
+    cache = LogoCache(args.cache_dir)
+    print(f"📐 Image width/height read as {'percent of the source' if args.units == 'percent' else 'points'}, "
+          f"{'stretched to that box' if args.stretch else 'fitted inside that box keeping the proportions'}")
+    success = True
+    jobs = before = after = 0
+    for template in templates:
+        try:
+            uses = image_uses(template, args.root, sources, args.units, args.dpi, args.max_dots,
+                              not args.stretch)
+        except (ET.ParseError, ValueError) as e:
+            print(f"❌ {template}: {e}")
+            success = False
+            continue
+        if not uses:
+            continue
+        print(f"📄 {template}")
+        for use in uses:
+            if use.source is None:
+                print(f"   ⚠️  {use.reference}: no source image (use --source)")
+                continue
+            try:
+                bitmap, cached = cache.get(use.source, use.width, use.height)
+            except (OSError, ValueError) as e:
+                print(f"   ❌ {use.reference} ({use.source}): {e}")
+                success = False
+                continue
+            source_bytes = use.source.stat().st_size
+            raster = len(bitmap.escpos())
+            jobs += 1
+            before += source_bytes
+            after += raster
+            print(f"   {'♻️ ' if cached else '✨'} {use.reference} → {bitmap.width}x{bitmap.height} dots: "
+                  f"{source_bytes / 1024:.1f} KB → {raster / 1024:.1f} KB per print job")
+            if args.png:
+                png_path = cache.path_for(hashlib.sha256(use.source.read_bytes()).hexdigest(),
+                                          bitmap.width, bitmap.height).with_suffix('.png')
+                png_path.write_bytes(bitmap.png())
+
+    if jobs:
+        print(f"📊 {jobs} images, one print each: {before / 1024:.1f} KB → {after / 1024:.1f} KB "
+              f"sent to the printer ({100 * (after - before) / before:+.0f}%)")
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Perfil Minifier
+Canonicalizes a perfil before upload: comments (headers, column comments,
+commented-out components) and the indentation between elements are dropped,
+while the text of every element is kept byte for byte because the client
+reads SQL codes, formulas and labels exactly as written. The result is
+checked to parse into the same element tree as the source.
+"""
+
+import argparse
+import sys
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import List, NamedTuple, Tuple
+
+from repo_artifacts import PERFIL, iter_artifacts
+
+
+class MinifyResult(NamedTuple):
+    content: str
+    original_bytes: int
+    minified_bytes: int
+
+    @property
+    def saved(self) -> int:
+        return self.original_bytes - self.minified_bytes
+
+    @property
+    def ratio(self) -> float:
+        return self.saved / self.original_bytes if self.original_bytes else 0.0
+
+
+def _strip(element: ET.Element):
+    """Drop whitespace-only text between elements; leaf text is left untouched."""
+    if len(element):
+        if element.text is not None and not element.text.strip():
+            element.text = None
+        for child in element:
+            _strip(child)
+            if child.tail is not None and not child.tail.strip():
+                child.tail = None
+
+
+def _signature(element: ET.Element) -> tuple:
+    """Element tree as the client sees it: whitespace between elements does not count."""
+    children = list(element)
+    text = element.text or ''
+    if children and not text.strip():
+        text = ''
+    tail = element.tail or ''
+    return (element.tag, tuple(element.attrib.items()), text,
+            tuple(_signature(child) for child in children), tail if tail.strip() else '')
+
+
+def same_tree(original, minified) -> bool:
+    """True when both documents parse into the same elements, attributes and text."""
+    return _signature(ET.fromstring(original)) == _signature(ET.fromstring(minified))
+
+
+def minify(content: str) -> MinifyResult:
+    """
+    Minified form of a perfil. Raises ``ValueError`` if the output would
+    not be equivalent to the input (it should never happen).
+    """
+    data = content.encode('utf-8')
+    root = ET.fromstring(data)  # comments and the prolog are not kept by the parser
+    _strip(root)
+    minified = ET.tostring(root, encoding='unicode').replace(' />', '/>')
+    if not same_tree(data, minified.encode('utf-8')):
+        raise ValueError("minified perfil differs from the source")
+    return MinifyResult(minified, len(data), len(minified.encode('utf-8')))
+
+
+def minify_repository(root='.', file_mappings=None) -> List[Tuple[Path, MinifyResult]]:
+    """Minify every perfil of the repository in memory (nothing is written)."""
+    results = []
+    for artifact in iter_artifacts(root, kinds=(PERFIL,), file_mappings=file_mappings):
+        try:
+            content = artifact.path.read_text(encoding='utf-8')
+            results.append((artifact.path, minify(content)))
+        except (OSError, ET.ParseError, ValueError) as e:
+            print(f"⚠️  {artifact.path}: {e}")
+    return results
+
+
+def print_report(results: List[Tuple[Path, MinifyResult]]):
+    for path, result in sorted(results, key=lambda item: item[1].saved, reverse=True):
+        print(f"   {path}: {result.original_bytes:,} → {result.minified_bytes:,} bytes "
+              f"(-{result.ratio:.1%})")
+    original = sum(result.original_bytes for _, result in results)
+    minified = sum(result.minified_bytes for _, result in results)
+    if original:
+        print(f"📊 {len(results)} perfiles: {original:,} → {minified:,} bytes "
+              f"(-{(original - minified) / original:.1%}) per full download")
+
+
+def main():
+    """Main function for command line usage."""
+    parser = argparse.ArgumentParser(
+        description="Report the bytes saved by uploading minified perfiles (see 'sync --minify')")
+    parser.add_argument('files', nargs='*', help='Perfil XML files (default: every perfil in --root)')
+    parser.add_argument('--root', default='.', help='Repository root (default: .)')
+    parser.add_argument('--output', '-o', help='Write the minified form of a single file here')
+    args = parser.parse_args()
+
+    if args.output and len(args.files) != 1:
+        parser.error("--output needs exactly one input file")
+
+    if not args.files:
+        results = minify_repository(args.root)
+    else:
+        results = []
+        for name in args.files:
+            try:
+                results.append((Path(name), minify(Path(name).read_text(encoding='utf-8'))))
+            except (OSError, ET.ParseError, ValueError) as e:
+                print(f"❌ {name}: {e}")
+                sys.exit(1)
+
+    print_report(results)
+    if args.output:
+        Path(args.output).write_text(results[0][1].content, encoding='utf-8')
+        print(f"💾 Minified perfil written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""
+Semantic Perfil Diff
+Compares two versions of a perfil by meaning instead of by line. Components
+are matched by driver id (then by driver), table columns are aligned by their
+``name`` arg and column letters in formulas are resolved to column names, so
+inserting a column reads as one added column instead of hundreds of shifted
+letters and renumbered comments.
+"""
+
+import argparse
+import bisect
+import difflib
+import hashlib
+import re
+import subprocess
+import sys
+import xml.etree.ElementTree as ET
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from column_reorganizer import COLUMN_REFERENCE_PATTERN, FORMULA_ATTRIBUTES
+
+# Args whose values refer to table columns by letter
+LETTER_ATTRIBUTES = FORMULA_ATTRIBUTES + ('totales', 'exportTotalCol', 'importTotalCol', 'externalValue')
+
+# Letters are resolved to "\x01Name\x02" (or "\x01+k\x02" for the k-th variable past the last column)
+_REFERENCE = re.compile('\x01([^\x02]*)\x02')
+_LETTER = re.compile(r'^[a-z]{1,2}$')
+_ATTRIBUTE = re.compile(r'\[(\w+)\]$')
+
+Entry = Tuple[str, str]  # (path, normalized value)
+
+
+def letter_index(letter: str) -> int:
+    """Position of a column letter: a=0 ... z=25, aa=26 ... zz=701."""
+    if len(letter) == 1:
+        return ord(letter) - ord('a')
+    return 26 + (ord(letter[0]) - ord('a')) * 26 + ord(letter[1]) - ord('a')
+
+
+def column_letter(position: int) -> str:
+    if position < 26:
+        return chr(ord('a') + position)
+    first, second = divmod(position - 26, 26)
+    return chr(ord('a') + first) + chr(ord('a') + second)
+
+
+def column_names(columns: List[ET.Element]) -> List[str]:
+    """``name`` arg of each column subarg; repeated names get a "#2", "#3"... suffix."""
+    names, seen = [], Counter()
+    for column in columns:
+        name = next(((arg.text or '').strip() for arg in column.findall('arg')
+                     if arg.get('attribute') == 'name'), '')
+        seen[name] += 1
+        names.append(name if seen[name] == 1 else f"{name}#{seen[name]}")
+    return names
+
+
+def normalize_value(attribute: Optional[str], text: str, names: Optional[List[str]] = None) -> str:
+    """
+    Whitespace-insensitive value of an arg. With the column ``names`` of the
+    owning table, the column letters of letter-bearing args are replaced by
+    the names they point to, so they compare equal across column shifts.
+    """
+    text = ' '.join(text.split())
+    if names is None or attribute not in LETTER_ATTRIBUTES:
+        return text
+
+    def resolve(letter: str) -> str:
+        position = letter_index(letter)
+        if position < len(names):
+            return f"\x01{names[position]}\x02"
+        return f"\x01+{position - len(names)}\x02"
+
+    if attribute in FORMULA_ATTRIBUTES:
+        return COLUMN_REFERENCE_PATTERN.sub(lambda match: resolve(match.group(1)), text)
+    parts = text.split(',')
+    if attribute == 'totales':
+        positions = range(len(parts))
+    elif attribute == 'externalValue':
+        positions = [len(parts) - 1]
+    else:
+        positions = [0]
+    for position in positions:
+        if _LETTER.match(parts[position].strip()):
+            parts[position] = resolve(parts[position].strip())
+    return ','.join(parts)
+
+
+def render_value(value: str, names: List[str]) -> str:
+    """Normalized value written back with the letters of ``names`` ({Name} if it has no column)."""
+    positions = {name: position for position, name in enumerate(names)}
+
+    def letter(match):
+        name = match.group(1)
+        if name.startswith('+') and name[1:].isdigit():
+            return column_letter(len(names) + int(name[1:]))
+        if name in positions:
+            return column_letter(positions[name])
+        return '{' + name + '}'
+
+    return _REFERENCE.sub(letter, value)
+
+
+def _entries(element: ET.Element, names: Optional[List[str]], prefix: str = '',
+             skip: Tuple[ET.Element, ...] = ()) -> Iterator[Entry]:
+    """Flatten the children of ``element`` into (path, value) pairs in document order."""
+    for child in element:
+        if child in skip:
+            continue
+        attribute = child.get('attribute') if child.tag == 'arg' else None
+        step = f"{child.tag}[{attribute}]" if attribute else child.tag
+        path = f"{prefix}/{step}" if prefix else step
+        for key, value in sorted(child.attrib.items()):
+            if not (attribute and key == 'attribute'):
+                yield f"{path}@{key}", value
+        text = normalize_value(attribute, child.text or '', names)
+        if text:
+            yield path, text
+        yield from _entries(child, names, path, skip)
+
+
+def _digest(entries: List[Entry]) -> str:
+    return hashlib.sha1('\n'.join(f"{path}\x00{value}" for path, value in entries).encode('utf-8')).hexdigest()
+
+
+class Component(NamedTuple):
+    """A top-level ``<component>`` of the form (components inside events are part of it)."""
+    driver_id: Optional[str]
+    driver: str
+    location: str                 # panels and tabs containing the component
+    names: List[str]              # column names, empty for non-table components
+    columns: Dict[str, List[Entry]]
+    entries: List[Entry]          # everything but the columns
+    digest: str                   # hash of entries, column order and columns
+
+    @property
+    def is_table(self) -> bool:
+        return bool(self.names)
+
+
+class Change(NamedTuple):
+    kind: str                     # added, removed, moved or changed
+    level: str                    # component, column, arg or setting
+    component: str                # label of the component ('' for form settings)
+    subject: str
+    old: Optional[str] = None
+    new: Optional[str] = None
+
+    @property
+    def formula(self) -> bool:
+        """True when a letter-bearing arg changed meaning."""
+        match = _ATTRIBUTE.search(self.subject) if self.level == 'arg' else None
+        return bool(match) and match.group(1) in LETTER_ATTRIBUTES
+
+
+class PerfilVersion:
+    """One version of a perfil, indexed as keyed, hashed components."""
+
+    def __init__(self, data):
+        root = ET.fromstring(data)
+        self.components: List[Component] = []
+        self.settings: List[Entry] = []
+        self._walk(root, [])
+
+    @classmethod
+    def from_file(cls, path) -> 'PerfilVersion':
+        with open(path, 'rb') as f:
+            return cls(f.read())
+
+    def _walk(self, element: ET.Element, location: List[str]):
+        for child in element:
+            if child.tag == 'component':
+                self.components.append(self._component(child, ' > '.join(location)))
+                continue
+            step = child.tag
+            if child.attrib:
+                step += '(' + ','.join(f"{key}={value}" for key, value in sorted(child.attrib.items())) + ')'
+            if len(child):
+                self._walk(child, location + [step])
+            else:
+                value = (child.text or '').split() + [f'{k}="{v}"' for k, v in sorted(child.attrib.items())]
+                self.settings.append(('/'.join(location + [child.tag]), ' '.join(value)))
+
+    @staticmethod
+    def _component(element: ET.Element, location: str) -> Component:
+        driver = element.find('driver')
+        columns, names = [], []
+        for parameters in element.findall('parameters'):
+            columns = [subarg for subarg in parameters.findall('subarg')
+                       if {arg.get('attribute') for arg in subarg.findall('arg')} >= {'name', 'type'}]
+            if columns:
+                names = column_names(columns)
+                break
+
+        entries = list(_entries(element, names or None, skip=tuple(columns)))
+        column_entries = {name: list(_entries(column, names)) for name, column in zip(names, columns)}
+        digest = _digest(entries + [('column', name) for name in names]
+                         + [('column', _digest(column_entries[name])) for name in names])
+        return Component(driver.get('id') if driver is not None else None,
+                         (driver.text or '').strip() if driver is not None else '',
+                         location, names, column_entries, entries, digest)
+
+
+def match_components(old: List[Component], new: List[Component]) -> List[Tuple[Optional[Component],
+                                                                                Optional[Component]]]:
+    """
+    Pair components by driver id; components without an id are paired by
+    driver, identical ones first and the rest in document order.
+    """
+    pairs = []
+    new_ids = {}
+    for component in new:
+        if component.driver_id:
+            new_ids.setdefault(component.driver_id, []).append(component)
+    unkeyed_old: Dict[str, List[Component]] = {}
+    for component in old:
+        candidates = new_ids.get(component.driver_id) if component.driver_id else None
+        if candidates:
+            pairs.append((component, candidates.pop(0)))
+        elif component.driver_id:
+            pairs.append((component, None))
+        else:
+            unkeyed_old.setdefault(component.driver, []).append(component)
+    for remaining in new_ids.values():
+        pairs.extend((None, component) for component in remaining)
+
+    unkeyed_new: Dict[str, List[Component]] = {}
+    for component in new:
+        if not component.driver_id:
+            unkeyed_new.setdefault(component.driver, []).append(component)
+    for driver in list(unkeyed_old) + [d for d in unkeyed_new if d not in unkeyed_old]:
+        olds, news = unkeyed_old.get(driver, []), unkeyed_new.get(driver, [])
+        by_digest: Dict[str, List[Component]] = {}
+        for component in news:
+            by_digest.setdefault(component.digest, []).append(component)
+        unmatched = []
+        for component in olds:
+            same = by_digest.get(component.digest)
+            if same:
+                twin = same.pop(0)
+                pairs.append((component, twin))
+                news = [other for other in news if other is not twin]
+            else:
+                unmatched.append(component)
+        for number in range(max(len(unmatched), len(news))):
+            pairs.append((unmatched[number] if number < len(unmatched) else None,
+                          news[number] if number < len(news) else None))
+    return pairs
+
+
+def out_of_order(sequence: List[int]) -> set:
+    """Indexes of ``sequence`` outside one longest increasing subsequence."""
+    tails, tail_index, previous = [], [], [None] * len(sequence)
+    for number, value in enumerate(sequence):
+        slot = bisect.bisect_left(tails, value)
+        if slot == len(tails):
+            tails.append(value)
+            tail_index.append(number)
+        else:
+            tails[slot] = value
+            tail_index[slot] = number
+        previous[number] = tail_index[slot - 1] if slot else None
+    kept = set()
+    number = tail_index[-1] if tail_index else None
+    while number is not None:
+        kept.add(number)
+        number = previous[number]
+    return set(range(len(sequence))) - kept
+
+
+def diff_entries(old: List[Entry], new: List[Entry], label: str, prefix: str = '',
+                 old_names: Optional[List[str]] = None, new_names: Optional[List[str]] = None,
+                 level: str = 'arg') -> List[Change]:
+    """Changes between two entry lists, aligning the values of each path."""
+    def grouped(entries):
+        paths: Dict[str, List[str]] = {}
+        for path, value in entries:
+            paths.setdefault(path, []).append(value)
+        return paths
+
+    def shown(value, names):
+        return render_value(value, names) if names else value
+
+    old_paths, new_paths = grouped(old), grouped(new)
+    changes = []
+    for path in list(old_paths) + [path for path in new_paths if path not in old_paths]:
+        before, after = old_paths.get(path, []), new_paths.get(path, [])
+        if before == after:
+            continue
+        subject = f"{prefix}{path}"
+        matcher = difflib.SequenceMatcher(None, before, after, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                continue
+            paired = min(i2 - i1, j2 - j1) if tag == 'replace' else 0
+            for offset in range(paired):
+                changes.append(Change('changed', level, label, subject,
+                                      shown(before[i1 + offset], new_names or old_names),
+                                      shown(after[j1 + offset], new_names)))
+            for value in before[i1 + paired:i2]:
+                changes.append(Change('removed', level, label, subject, shown(value, old_names), None))
+            for value in after[j1 + paired:j2]:
+                changes.append(Change('added', level, label, subject, None, shown(value, new_names)))
+    return changes
+
+
+def _label(component: Component) -> str:
+    return component.driver_id or component.driver.rsplit('.', 1)[-1] or 'component'
+
+
+def diff_components(old: Component, new: Component) -> List[Change]:
+    label = _label(new)
+    changes = []
+    if old.location != new.location:
+        changes.append(Change('moved', 'component', label, new.driver, old.location, new.location))
+    if old.digest == new.digest:
+        return changes
+
+    changes.extend(diff_entries(old.entries, new.entries, label,
+                                old_names=old.names, new_names=new.names))
+    if not (old.is_table or new.is_table):
+        return changes
+
+    old_positions = {name: position for position, name in enumerate(old.names)}
+    new_positions = {name: position for position, name in enumerate(new.names)}
+    for name in old.names:
+        if name not in new_positions:
+            changes.append(Change('removed', 'column', label, name, column_letter(old_positions[name]), None))
+    common = [name for name in new.names if name in old_positions]
+    moved = out_of_order([old_positions[name] for name in common])
+    for number, name in enumerate(common):
+        if number in moved:
+            changes.append(Change('moved', 'column', label, name, column_letter(old_positions[name]),
+                                  column_letter(new_positions[name])))
+    for name in new.names:
+        if name not in old_positions:
+            changes.append(Change('added', 'column', label, name, None, column_letter(new_positions[name])))
+    for name in common:
+        if old.columns[name] != new.columns[name]:
+            changes.extend(diff_entries(old.columns[name], new.columns[name], label, f"column {name}/",
+                                        old.names, new.names))
+    return changes
+
+
+def semantic_diff(old: PerfilVersion, new: PerfilVersion) -> List[Change]:
+    """All semantic changes from ``old`` to ``new``."""
+    changes = diff_entries(old.settings, new.settings, '', level='setting')
+    old_order = {id(component): number for number, component in enumerate(old.components)}
+    new_order = {id(component): number for number, component in enumerate(new.components)}
+    pairs = sorted(match_components(old.components, new.components),
+                   key=lambda pair: new_order[id(pair[1])] if pair[1] else old_order[id(pair[0])] - 0.5)
+    for before, after in pairs:
+        if before is None:
+            changes.append(Change('added', 'component', _label(after), after.driver, None, after.location))
+        elif after is None:
+            changes.append(Change('removed', 'component', _label(before), before.driver, before.location, None))
+        else:
+            changes.extend(diff_components(before, after))
+    return changes
+
+
+def summarize(changes: List[Change]) -> str:
+    """One line such as "added column Disponible; no formula semantics changed"."""
+    groups: Dict[Tuple[str, str], List[str]] = {}
+    for change in changes:
+        if change.level == 'column':
+            groups.setdefault((change.kind, 'column'), []).append(change.subject)
+        elif change.level == 'component' and change.kind != 'moved':
+            groups.setdefault((change.kind, 'component'), []).append(change.component)
+    parts = []
+    for (kind, level), names in groups.items():
+        if len(names) <= 3:
+            parts.append(f"{kind} {level} {', '.join(names)}")
+        else:
+            parts.append(f"{kind} {len(names)} {level}s")
+    structural = bool(parts)
+    formulas = sum(1 for change in changes if change.formula)
+    others = sum(1 for change in changes
+                 if not change.formula and change.level not in ('column', 'component'))
+    moved = sum(1 for change in changes if change.level == 'component' and change.kind == 'moved')
+    if formulas:
+        parts.append(f"{formulas} formula change{'s' if formulas != 1 else ''}")
+    elif structural:
+        parts.append("no formula semantics changed")
+    if moved:
+        parts.append(f"{moved} component{'s' if moved != 1 else ''} moved")
+    if others:
+        parts.append(f"{others} other change{'s' if others != 1 else ''}")
+    return '; '.join(parts) or "no semantic changes"
+
+
+def print_diff(title: str, changes: List[Change]):
+    icons = {'added': '➕', 'removed': '➖', 'moved': '🔀', 'changed': '✏️ '}
+    print(f"🔍 {title}")
+    current = None
+    for change in changes:
+        if change.level in ('arg', 'column') and change.component != current:
+            current = change.component
+            print(f"   📦 {current}")
+        indent = '      ' if change.level in ('arg', 'column') else '   '
+        icon = icons[change.kind]
+        if change.level == 'component':
+            current = None
+            where = change.new if change.kind != 'removed' else change.old
+            if change.kind == 'moved':
+                print(f"{indent}{icon} component {change.component}: {change.old or 'FORM'} → {change.new or 'FORM'}")
+            else:
+                print(f"{indent}{icon} component {change.component} ({change.subject}) in {where or 'FORM'}")
+        elif change.level == 'column':
+            letters = f"{change.old} → {change.new}" if change.kind == 'moved' else (change.new or change.old)
+            print(f"{indent}{icon} column {change.subject} ({letters})")
+        else:
+            if change.level == 'setting':
+                current = None
+            label = f"{change.subject}{' (formula)' if change.formula else ''}"
+            if change.kind == 'changed':
+                print(f"{indent}{icon} {label}: {change.old} → {change.new}")
+            else:
+                print(f"{indent}{icon} {label}: {change.new if change.kind == 'added' else change.old}")
+    print(f"📊 {summarize(changes)}")
+
+
+def read_revision(path, revision: str) -> bytes:
+    """Contents of ``path`` at a git revision (``git show REV:./path``)."""
+    path = Path(path)
+    result = subprocess.run(['git', 'show', f"{revision}:./{path.name}"], cwd=path.parent or '.',
+                            capture_output=True)
+    if result.returncode != 0:
+        raise ValueError(result.stderr.decode('utf-8', 'replace').strip() or f"{path} not found at {revision}")
+    return result.stdout
+
+
+def main():
+    """Main function for command line usage."""
+    parser = argparse.ArgumentParser(
+        description="Semantic diff of two perfil versions (columns aligned by name)")
+    parser.add_argument('old', help='Old perfil XML file (or the file to compare with --rev/--database)')
+    parser.add_argument('new', nargs='?', help='New perfil XML file')
+    parser.add_argument('--rev', help='Compare the file with its version at this git revision')
+    parser.add_argument('--database', action='store_true', help='Compare the file with the perfil stored in the database')
+    parser.add_argument('--codigo', '-c', help='Database codigo (default: from the file name)')
+    parser.add_argument('--config', help='Config file path (default: db_config.json)')
+    parser.add_argument('--summary', action='store_true', help='Only print the summary line')
+    args = parser.parse_args()
+
+    sources = sum(bool(source) for source in (args.new, args.rev, args.database))
+    if sources != 1:
+        parser.error("give either a NEW file, --rev REV or --database")
+
+    try:
+        if args.new:
+            title = f"{args.old} → {args.new}"
+            old, new = PerfilVersion.from_file(args.old), PerfilVersion.from_file(args.new)
+        elif args.rev:
+            title = f"{args.old}: {args.rev} → working tree"
+            old, new = PerfilVersion(read_revision(args.old, args.rev)), PerfilVersion.from_file(args.old)
+        else:
+            from xml_db_sync import XMLDatabaseSync
+            sync_tool = XMLDatabaseSync(args.config or "db_config.json")
+            from repo_artifacts import codigo_from_path
+            codigo = args.codigo or codigo_from_path(args.old, sync_tool.config.get('file_mappings'))
+            stored = sync_tool.fetch_perfil(codigo)
+            if stored is None:
+                sys.exit(2)
+            title = f"{args.old}: database → file"
+            old, new = PerfilVersion(stored.encode('utf-8')), PerfilVersion.from_file(args.old)
+    except (OSError, ValueError, ET.ParseError) as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+
+    changes = semantic_diff(old, new)
+    if args.summary:
+        print(f"📊 {summarize(changes)}")
+    else:
+        print_diff(title, changes)
+    sys.exit(1 if changes else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Event Query Batcher
+Finds components that fire several sqlCodeWT (or sqlCode) lookups for the same
+key and combines their SQL sentences into one query answered in a single round
+trip. Rewriting the component to use it is experimental: the client has not
+been verified to route the combined result to each listener.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from repo_artifacts import PERFIL, SQL, iter_artifacts, read_sql_sentences
+from sql_utils import count_placeholders, executable, is_single_select, replace_placeholders, strip_sql
+from xml_patch_engine import ArgSpan, SpanEdit, XMLOffsetIndex, apply_edits, atomic_write
+
+# Arg attributes that run one SQL sentence per event with the component key
+BATCHED_ATTRIBUTES = ('sqlCodeWT', 'sqlCode')
+
+# CTE holding the shared placeholders, named to stay clear of the sentences' own aliases
+KEY_CTE = 'batch_key'
+
+
+class QueryGroup(NamedTuple):
+    """Args of one component that run a query each for the same event."""
+    attribute: str
+    driver: str
+    driver_id: Optional[str]
+    args: List[ArgSpan]
+    codes: List[str]
+    line: int
+
+
+class CombinedQuery(NamedTuple):
+    codes: List[str]
+    parameters: int          # placeholders of each sentence, bound once
+    sql: str
+
+
+def combine_queries(sentences: Dict[str, str], mode: str = 'json',
+                    key_type: str = 'text') -> CombinedQuery:
+    """
+    Combine single-SELECT sentences that take the same placeholders into one query.
+
+    The placeholders are bound once, in the ``batch_key`` CTE, and every sentence reads
+    them from there. In ``json`` mode each sentence becomes a column holding
+    its rows as a JSON array, so sentences returning any number of rows can be
+    mixed; in ``lateral`` mode their columns are joined side by side, which is
+    only correct when each sentence returns at most one row.
+    """
+    codes = list(sentences)
+    counts = {code: count_placeholders(sql) for code, sql in sentences.items()}
+    if len(set(counts.values())) != 1:
+        raise ValueError("sentences take different parameters: "
+                         + ', '.join(f"{code} ({count})" for code, count in counts.items()))
+    for code, sql in sentences.items():
+        if not is_single_select(sql):
+            raise ValueError(f"{code} is not a single SELECT statement")
+
+    parameters = counts[codes[0]]
+    names = [f"p{number}" for number in range(1, parameters + 1)]
+    key = ', '.join(f"'?'::{key_type} AS {name}" for name in names)
+    bodies = {code: replace_placeholders(strip_sql(sql), [f"{KEY_CTE}.{name}" for name in names])
+              for code, sql in sentences.items()}
+
+    def indent(text, prefix):
+        return '\n'.join(prefix + line if line.strip() else line for line in text.splitlines())
+
+    lines = [f"-- Combined lookup: {', '.join(codes)}"]
+    if parameters:
+        lines.append(f"WITH {KEY_CTE} AS (SELECT {key})")
+    if mode == 'json':
+        columns = [f"    (SELECT json_agg(q) FROM (\n{indent(bodies[code], '        ')}\n    ) q) AS \"{code}\""
+                   for code in codes]
+        lines.append("SELECT\n" + ',\n'.join(columns))
+        if parameters:
+            lines.append(f"FROM {KEY_CTE}")
+    elif mode == 'lateral':
+        lines.append("SELECT " + ', '.join(f'"{code}".*' for code in codes))
+        lines.append(f"FROM {KEY_CTE}" if parameters else f"FROM (SELECT 1) {KEY_CTE}")
+        for code in codes:
+            lines.append(f"LEFT JOIN LATERAL (\n{indent(bodies[code], '    ')}\n) AS \"{code}\" ON true")
+    else:
+        raise ValueError(f"unknown mode: {mode}")
+    return CombinedQuery(codes, parameters, '\n'.join(lines) + ';\n')
+
+
+def find_query_groups(index: XMLOffsetIndex) -> List[QueryGroup]:
+    """
+    sqlCodeWT/sqlCode args that share their component, attribute and enclosing
+    ``<parameters>`` or ``<subarg>``, so they run for the same event and key.
+    """
+    data = index.data
+    members: Dict[tuple, List[ArgSpan]] = {}
+    owners = {}
+    for arg in index.args_with(*BATCHED_ATTRIBUTES):
+        component = index.component_of(arg.element.start)
+        if component is None:
+            continue
+        key = (component.element.start, arg.attribute, index.parent_of(arg))
+        members.setdefault(key, []).append(arg)
+        owners[key] = component
+
+    groups = []
+    for key, args in members.items():
+        if len(args) > 1:
+            owner = owners[key]
+            groups.append(QueryGroup(args[0].attribute, owner.driver, owner.driver_id, args,
+                                     [index.text(arg.value).strip() for arg in args],
+                                     data.count(b'\n', 0, args[0].element.start) + 1))
+    return sorted(groups, key=lambda group: group.args[0].element.start)
+
+
+def _line_of(data: bytes, arg: ArgSpan, number: int):
+    """Start, end and indentation of the line holding ``arg``, which must be the only element on it."""
+    start = data.rfind(b'\n', 0, arg.element.start) + 1
+    end = data.find(b'\n', arg.element.end)
+    end = len(data) if end < 0 else end + 1
+    indent = data[start:arg.element.start]
+    if indent.strip():
+        raise ValueError(f"line {number}: {data[arg.element.start:arg.element.end].decode('utf-8')} "
+                         f"does not start its own line")
+    return start, end, indent
+
+
+def plan_rewrite(index: XMLOffsetIndex, group: QueryGroup, code: str) -> List[SpanEdit]:
+    """
+    Replace the line of the first arg of a group with one arg running the
+    combined sentence and drop the lines of the others (experimental).
+    """
+    data = index.data
+    lines = [_line_of(data, arg, data.count(b'\n', 0, arg.element.start) + 1) for arg in group.args]
+    start, end, indent = lines[0]
+    line = (f'<arg attribute="{group.attribute}">{code}</arg>'
+            f'            <!-- combina {", ".join(group.codes)} -->\n')
+    return ([SpanEdit(start, end, indent + line.encode('utf-8'))]
+            + [SpanEdit(start, end, b'') for start, end, _ in lines[1:]])
+
+
+class QueryBatcher:
+    def __init__(self, root='.', config_file: Optional[str] = None):
+        self.root = Path(root)
+        self.config_file = config_file
+        self._sync = None
+        self._local = {artifact.codigo: artifact.path for artifact in iter_artifacts(self.root, kinds=(SQL,))}
+
+    @property
+    def sync(self):
+        """Database access, only set up when a sentence or a benchmark needs it."""
+        if self._sync is None:
+            from xml_db_sync import XMLDatabaseSync
+            self._sync = XMLDatabaseSync(self.config_file or 'db_config.json')
+        return self._sync
+
+    def load_sentences(self, codes: List[str], use_database: bool = False) -> Dict[str, str]:
+        """SQL text of each code from sentencias_sql/, then from the database if allowed."""
+        sentences = read_sql_sentences(codes, self.root)
+        missing = [code for code in codes if code not in sentences]
+        if missing and use_database:
+            sentences.update(self.sync.fetch_sql_sentences(missing))
+        return sentences
+
+    def sql_path_for(self, code: str, near: List[str]) -> Path:
+        """Where a new sentence goes: next to the first local sentence it replaces."""
+        for other in near:
+            if other in self._local:
+                return self._local[other].with_name(f"{code}.sql")
+        return self.root / 'sentencias_sql' / f"{code}.sql"
+
+    def benchmark(self, sentences: Dict[str, str], combined: CombinedQuery, key: List[str],
+                  repeat: int = 20) -> Optional[Dict[str, float]]:
+        """
+        Median milliseconds of running the sentences one by one versus the
+        combined query, inside a read-only transaction that is rolled back.
+        """
+        conn = self.sync._get_connection()
+        if not conn:
+            return None
+
+        if len(key) != combined.parameters:
+            print(f"❌ The sentences take {combined.parameters} parameters, {len(key)} keys given")
+            conn.close()
+            return None
+        separate = [executable(sql) for sql in sentences.values()]
+        together = executable(combined.sql)
+        timings = {'separate': [], 'combined': []}
+        rows = {}
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SET TRANSACTION READ ONLY")
+            for _ in range(repeat):
+                started = time.perf_counter()
+                for sql, code in zip(separate, sentences):
+                    cursor.execute(sql, key)
+                    rows[code] = len(cursor.fetchall())
+                timings['separate'].append(time.perf_counter() - started)
+
+                started = time.perf_counter()
+                cursor.execute(together, key)
+                cursor.fetchall()
+                timings['combined'].append(time.perf_counter() - started)
+        except Exception as e:
+            print(f"❌ Benchmark failed: {e}")
+            return None
+        finally:
+            conn.rollback()
+            conn.close()
+
+        multi_row = [code for code, count in rows.items() if count > 1]
+        if multi_row:
+            print(f"   ⚠️  {', '.join(multi_row)} returned several rows for this key: "
+                  f"only the json mode keeps them apart")
+        return {name: statistics.median(values) * 1000 for name, values in timings.items()}
+
+
+def main():
+    """Main function for command line usage."""
+    parser = argparse.ArgumentParser(
+        description="Combine the sqlCodeWT/sqlCode lookups a component fires together into one query")
+    parser.add_argument('forms', nargs='*', help='Perfil files to analyze (default: every perfil)')
+    parser.add_argument('--root', default='.', help='Repository root (default: .)')
+    parser.add_argument('--config', help='Config file path (default: db_config.json)')
+    parser.add_argument('--database', action='store_true',
+                        help='Load sentences missing from sentencias_sql/ from the database')
+    parser.add_argument('--mode', choices=['json', 'lateral'], default='json',
+                        help='json: one JSON array column per sentence; '
+                             'lateral: columns side by side, single-row sentences only')
+    parser.add_argument('--key-type', default='text', help='SQL type of the shared key (default: text)')
+    parser.add_argument('--show-sql', action='store_true', help='Print the combined queries')
+    parser.add_argument('--group', type=int,
+                        help='With --code, number of the group (as listed) to rewrite')
+    parser.add_argument('--code', help='Codigo of the combined sentence to write and use')
+    parser.add_argument('--experimental-rewrite', action='store_true',
+                        help='Allow --code to rewrite the perfil (the client routing of the result is unverified)')
+    parser.add_argument('--dry-run', action='store_true', help='With --code, only show the changes')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Time separate vs combined queries against the database')
+    parser.add_argument('--key', action='append', default=[],
+                        help='Key value used by --benchmark (repeat for several placeholders)')
+    parser.add_argument('--repeat', type=int, default=20, help='Benchmark repetitions (default: 20)')
+    parser.add_argument('--rtt-ms', type=float, default=0.0,
+                        help='Network round trip added per query to the benchmark (default: 0)')
+    args = parser.parse_args()
+
+    if args.code and (args.group is None or len(args.forms) != 1):
+        print("❌ --code needs --group and a single perfil file")
+        sys.exit(1)
+    if args.code and not args.experimental_rewrite:
+        print("❌ --code rewrites the perfil and needs --experimental-rewrite")
+        sys.exit(1)
+    if args.code:
+        print("⚠️  Experimental: the combined sentence returns one column per code and it is not "
+              "verified that the client routes it to the components listening to each code")
+    if args.benchmark and not args.key:
+        print("❌ --benchmark needs --key")
+        sys.exit(1)
+
+    batcher = QueryBatcher(args.root, args.config)
+    forms = args.forms or [artifact.path for artifact in iter_artifacts(args.root, kinds=(PERFIL,))]
+    success = True
+    rewritten = False
+    number = 0
+    for form in forms:
+        index = XMLOffsetIndex.from_file(form)
+        groups = find_query_groups(index)
+        if not groups:
+            continue
+        print(f"📄 {form}")
+        for group in groups:
+            number += 1
+            print(f"   [{number}] line {group.line} {group.driver_id or group.driver}: "
+                  f"{len(group.codes)} {group.attribute} → {', '.join(group.codes)}")
+            sentences = batcher.load_sentences(group.codes, args.database)
+            missing = [code for code in group.codes if code not in sentences]
+            if missing:
+                print(f"      ⚠️  SQL not available: {', '.join(missing)}")
+                continue
+            try:
+                combined = combine_queries(sentences, args.mode, args.key_type)
+            except ValueError as e:
+                print(f"      ❌ Cannot combine: {e}")
+                continue
+            print(f"      ✅ {len(group.codes)} round trips → 1")
+            if args.show_sql:
+                print(combined.sql)
+
+            if args.benchmark:
+                result = batcher.benchmark(sentences, combined, args.key, args.repeat)
+                if result is None:
+                    success = False
+                else:
+                    separate = result['separate'] + args.rtt_ms * len(group.codes)
+                    together = result['combined'] + args.rtt_ms
+                    print(f"      📊 separate {separate:.2f} ms, combined {together:.2f} ms "
+                          f"({separate / together if together else 0:.1f}x)")
+
+            if args.code and number == args.group:
+                sql_path = batcher.sql_path_for(args.code, group.codes)
+                # Both files are prepared before either is written
+                try:
+                    rewritten_form = apply_edits(index.data, plan_rewrite(index, group, args.code))
+                except ValueError as e:
+                    print(f"      ❌ Cannot rewrite {form}: {e}")
+                    success = False
+                    continue
+                if sql_path.exists():
+                    print(f"      ❌ {sql_path} already exists")
+                    success = False
+                    continue
+                rewritten = True
+                if args.dry_run:
+                    print(f"💡 Dry run: would write {sql_path} and rewrite {form}")
+                    continue
+                sql_path.parent.mkdir(parents=True, exist_ok=True)
+                atomic_write(sql_path, combined.sql)
+                atomic_write(Path(form), rewritten_form)
+                print(f"✅ Wrote {sql_path} and rewrote {form}")
+
+    if args.code and not rewritten and success:
+        print(f"❌ Group {args.group} was not found or cannot be combined")
+        success = False
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
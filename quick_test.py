@@ -3,7 +3,10 @@
 Quick usage example for the new workflow
 """
 
+import json
+
 from column_reorganizer import ColumnReorganizer
+from xml_patch_engine import EditPlan
 
 def example_your_workflow():
     """
@@ -58,9 +61,13 @@ def example_your_workflow():
         for shift in preview['shifted_columns'][:8]:
             print(f"   Position {shift['new_position']}: {shift['old_letter']} -> {shift['new_letter']}")
     
+        print(f"\n💾 The preview already holds the {len(preview['plan'].edits)} exact edits "
+              f"(sha256 {preview['plan'].sha256[:12]}...)")
+    
     print(f"\n💡 To apply these changes after manually adding your column:")
     print(f"   python column_reorganizer.py {xml_file} {inserted_position}")
-    print(f"   python column_reorganizer.py {xml_file} {inserted_position} preview  # to preview first")
+    print(f"   python column_reorganizer.py {xml_file} {inserted_position} preview plan.json  # to preview first")
+    print(f"   python column_reorganizer.py apply plan.json  # applies the previewed edits as they are")
 
 def quick_test():
     """Quick test to make sure the script works"""
@@ -81,6 +88,12 @@ def quick_test():
         shifted = reorganizer._shift_column_letters(test_formula, 2)
         print(f"✅ Formula shifting works: {test_formula} -> {shifted}")
         
+        # Test plan serialization (nothing is written to the XML file)
+        plan, _ = reorganizer.plan_shift(2)
+        restored = EditPlan.from_dict(json.loads(json.dumps(plan.to_dict())))
+        assert restored == plan
+        print(f"✅ Plan serialization works: {len(plan.edits)} edits round-trip through JSON")
+        
         print("✅ All tests passed - script is ready to use!")
         
     except Exception as e:
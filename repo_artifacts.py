@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Repository Artifact Discovery
+Locates perfiles, args_drivers, SQL sentences and printer templates in the repo.
+"""
+
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+# Artifact kinds, in the order they are provisioned
+PERFIL = 'perfil'
+ARGS_DRIVER = 'args_driver'
+SQL = 'sql'
+TEMPLATE = 'template'
+
+ARTIFACT_KINDS = (PERFIL, ARGS_DRIVER, SQL, TEMPLATE)
+
+
+class Artifact(NamedTuple):
+    """A single file of the repository that is stored in the database."""
+    kind: str
+    codigo: str
+    path: Path
+
+
+def codigo_from_path(path, file_mappings: Optional[Dict[str, str]] = None) -> str:
+    """
+    Derive the database codigo for an artifact file.
+
+    Explicit entries in ``file_mappings`` (as found in db_config.json) win;
+    otherwise the ``_perfil`` / ``_args_driver`` suffix is removed from the stem.
+    """
+    path = Path(path)
+    if file_mappings and path.name in file_mappings:
+        return file_mappings[path.name]
+
+    stem = path.stem
+    for suffix in ('_perfil', '_args_driver'):
+        if stem.endswith(suffix):
+            return stem[:-len(suffix)]
+    return stem
+
+
+def _sorted_files(base: Path, pattern: str) -> List[Path]:
+    if not base.is_dir():
+        return []
+    return sorted(p for p in base.glob(pattern) if p.is_file())
+
+
+def iter_artifacts(root='.', kinds=ARTIFACT_KINDS,
+                   file_mappings: Optional[Dict[str, str]] = None) -> Iterator[Artifact]:
+    """
+    Yield every artifact of the requested kinds found under ``root``.
+
+    Layout:
+        transacciones/**/<CODIGO>_perfil.xml
+        transacciones/**/<CODIGO>_args_driver.xml
+        sentencias_sql/**/<CODIGO>.sql
+        templates/*.xml and transacciones/**/printer-templates/*.xml
+    """
+    root = Path(root)
+    transacciones = root / 'transacciones'
+
+    if PERFIL in kinds:
+        for path in _sorted_files(transacciones, '**/*_perfil.xml'):
+            yield Artifact(PERFIL, codigo_from_path(path, file_mappings), path)
+
+    if ARGS_DRIVER in kinds:
+        for path in _sorted_files(transacciones, '**/*_args_driver.xml'):
+            yield Artifact(ARGS_DRIVER, codigo_from_path(path, file_mappings), path)
+
+    if SQL in kinds:
+        for path in _sorted_files(root / 'sentencias_sql', '**/*.sql'):
+            yield Artifact(SQL, path.stem, path)
+
+    if TEMPLATE in kinds:
+        paths = _sorted_files(root / 'templates', '*.xml')
+        paths += _sorted_files(transacciones, '**/printer-templates/*.xml')
+        for path in paths:
+            yield Artifact(TEMPLATE, path.stem, path)
+
+
+def discover_artifacts(root='.', kinds=ARTIFACT_KINDS,
+                       file_mappings: Optional[Dict[str, str]] = None) -> List[Artifact]:
+    """Return all artifacts under ``root`` as a list (see ``iter_artifacts``)."""
+    return list(iter_artifacts(root, kinds, file_mappings))
+
+
+def read_sql_sentences(codes, root='.') -> Dict[str, str]:
+    """Text of the SQL sentences kept under ``sentencias_sql/`` among ``codes``."""
+    wanted = set(codes)
+    return {artifact.codigo: artifact.path.read_text(encoding='utf-8')
+            for artifact in iter_artifacts(root, kinds=(SQL,)) if artifact.codigo in wanted}
+
+
+def find_template(reference: str, root='.', near=None) -> Optional[Path]:
+    """
+    Resolve a printerTemplate reference such as ``/graphics/TNFacturaPos.xml``
+    to a template file of the repository.
+
+    Copies under a ``printer-templates`` directory next to (or above) the file
+    ``near`` win over the shared ``templates/`` directory.
+    """
+    root = Path(root)
+    filename = Path(reference).name
+
+    if near is not None:
+        directory = Path(near).parent
+        while True:
+            candidate = directory / 'printer-templates' / filename
+            if candidate.is_file():
+                return candidate
+            if directory == root or directory == directory.parent:
+                break
+            directory = directory.parent
+
+    candidate = root / 'templates' / filename
+    if candidate.is_file():
+        return candidate
+    for artifact in iter_artifacts(root, kinds=(TEMPLATE,)):
+        if artifact.path.name == filename:
+            return artifact.path
+    return None
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Save Pipeline Replay Benchmark
+Interprets an args_driver file, replays the statements a save implies for a
+synthetic document of N item lines against a local PostgreSQL (inside a
+transaction that is always rolled back) and reports how the statement count
+and latency grow with N, row by row and batched.
+"""
+
+import argparse
+import csv
+import io
+import re
+import statistics
+import sys
+import time
+import xml.etree.ElementTree as ET
+from typing import Dict, List, NamedTuple, Optional
+
+from repo_artifacts import read_sql_sentences
+from sql_utils import count_placeholders, executable, sample_values
+
+DEFAULT_LINES = [1, 10, 50, 100, 300]
+
+# "INSERT INTO t (a, b) VALUES (?, '?'::INT)" -> table, columns, values
+_INSERT = re.compile(r'^\s*INSERT\s+INTO\s+([\w.]+)\s*\(([^)]*)\)\s*VALUES\s*\((.*)\)\s*;?\s*$', re.I | re.S)
+_PLAIN_VALUE = re.compile(r"^\s*(?:\?|'\?')\s*(?:::\s*[\w ]+(?:\(\d+(?:,\s*\d+)?\))?)?\s*$")
+
+
+class Step(NamedTuple):
+    """One element of the args_driver pipeline."""
+    kind: str                # statement, lines, key, document or server
+    code: Optional[str]      # SQL code run by the step
+    description: str
+    per_line: bool
+
+
+def read_pipeline(path) -> List[Step]:
+    """Steps of an args_driver file, in the order the server runs them."""
+    steps = []
+
+    def data_step(element):
+        driver = (element.findtext('driver') or '').strip()
+        method = (element.findtext('method') or '').strip()
+        parameters = {}
+        for arg in element.iter('arg'):
+            parameters.setdefault(arg.get('attribute'), []).append((arg.text or '').strip())
+        if driver == 'LNSelectedField' and parameters.get('sql'):
+            detail = f"fields {parameters.get('fields', [''])[0]}"
+            if parameters.get('conditional'):
+                detail += f" if {parameters['conditional'][0]}"
+            return Step('lines', parameters['sql'][0], f"{driver}.{method} ({detail})", True)
+        # Other drivers (LNInventarios, LNContabilidad...) run Java logic on the server
+        return Step('server', None, f"{driver}.{method}", True)
+
+    for element in ET.parse(path).getroot():
+        if element.tag == 'arg':
+            attribute = element.get('attribute')
+            if attribute:
+                steps.append(Step('key', None, f"{attribute} {(element.text or '').strip()}".strip(), False))
+            elif element.text and element.text.strip():
+                steps.append(Step('statement', element.text.strip(), 'once per document', False))
+        elif element.tag == 'LNData':
+            steps.append(data_step(element))
+        elif element.tag == 'subarg':
+            action = element.find("arg[@attribute='actionDocument']")
+            if action is not None:
+                flags = [arg.get('attribute') for arg in element.findall('arg') if arg.get('attribute') != 'actionDocument']
+                steps.append(Step('document', None, f"{(action.text or '').strip()} ({', '.join(flags)})", False))
+                continue
+            for child in element:
+                if child.tag == 'LNData':
+                    steps.append(data_step(child))
+                elif child.tag == 'arg' and child.get('attribute'):
+                    steps.append(Step('key', None, f"{child.get('attribute')} {(child.text or '').strip()}".strip(),
+                                      False))
+    return steps
+
+
+def copy_statement(sql: str) -> Optional[str]:
+    """COPY equivalent of a plain ``INSERT ... VALUES (placeholders)``, if there is one."""
+    match = _INSERT.match(sql)
+    if not match:
+        return None
+    values = re.split(r",(?![^(]*\))", match.group(3))
+    if len(values) != count_placeholders(sql) or not all(_PLAIN_VALUE.match(value) for value in values):
+        return None
+    return f"COPY {match.group(1)} ({match.group(2).strip()}) FROM STDIN WITH (FORMAT csv)"
+
+
+class SaveReplay:
+    """Replays the SQL steps of a pipeline for documents of a given number of lines."""
+
+    def __init__(self, steps: List[Step], sentences: Dict[str, str],
+                 values: Optional[Dict[str, List[str]]] = None):
+        self.steps = steps
+        self.sentences = sentences
+        self.values = values or {}
+
+    @property
+    def document_codes(self) -> List[str]:
+        return [step.code for step in self.steps if step.kind == 'statement']
+
+    @property
+    def line_codes(self) -> List[str]:
+        return [step.code for step in self.steps if step.kind == 'lines']
+
+    def statements_per_save(self, lines: int) -> int:
+        return len(self.document_codes) + lines * len(self.line_codes)
+
+    def _parameters(self, code: str, line: int = 1) -> List[str]:
+        return sample_values(self.sentences[code], self.values.get(code), line)
+
+    def run(self, cursor, lines: int, strategy: str = 'row') -> float:
+        """Seconds taken by one save; the caller rolls the transaction back."""
+        from psycopg2.extras import execute_batch
+
+        started = time.perf_counter()
+        for code in self.document_codes:
+            cursor.execute(executable(self.sentences[code]), self._parameters(code))
+        for code in self.line_codes:
+            sql = self.sentences[code]
+            rows = [self._parameters(code, line) for line in range(1, lines + 1)]
+            copy = copy_statement(sql) if strategy == 'copy' else None
+            if copy:
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(rows)
+                buffer.seek(0)
+                cursor.copy_expert(copy, buffer)
+            elif strategy in ('batch', 'copy'):
+                execute_batch(cursor, executable(sql), rows, page_size=100)
+            else:
+                statement = executable(sql)
+                for row in rows:
+                    cursor.execute(statement, row)
+        return time.perf_counter() - started
+
+    def benchmark(self, conn, line_counts: List[int], strategies: List[str],
+                  repeat: int = 5) -> Dict[int, Dict[str, float]]:
+        """Median milliseconds per save for each line count and strategy."""
+        results: Dict[int, Dict[str, float]] = {}
+        cursor = conn.cursor()
+        for lines in line_counts:
+            results[lines] = {}
+            for strategy in strategies:
+                timings = []
+                for _ in range(repeat):
+                    try:
+                        timings.append(self.run(cursor, lines, strategy))
+                    finally:
+                        conn.rollback()
+                results[lines][strategy] = statistics.median(timings) * 1000
+        return results
+
+
+def print_pipeline(path, steps: List[Step], sentences: Dict[str, str]):
+    print(f"📄 {path}")
+    for number, step in enumerate(steps):
+        if step.kind in ('statement', 'lines'):
+            state = '✅' if step.code in sentences else '⚠️ '
+            batching = ''
+            if step.kind == 'lines' and step.code in sentences:
+                batching = ', COPY' if copy_statement(sentences[step.code]) else ', no COPY (expressions in VALUES)'
+            print(f"   {number:2} {state} {step.code} {step.description}"
+                  f"{' × N lines' if step.per_line else ''}{batching}")
+        elif step.kind == 'server':
+            print(f"   {number:2} 💡 {step.description} × N lines (server logic, not replayed)")
+        else:
+            print(f"   {number:2}    {step.kind}: {step.description}")
+
+
+def main():
+    """Main function for command line usage."""
+    parser = argparse.ArgumentParser(
+        description="Replay the statements of an args_driver save for documents of N lines")
+    parser.add_argument('args_driver', help='args_driver XML file')
+    parser.add_argument('--root', default='.', help='Repository root (default: .)')
+    parser.add_argument('--config', help='Config file path (default: db_config.json)')
+    parser.add_argument('--lines', type=int, action='append',
+                        help=f'Item lines per document (repeatable, default: {DEFAULT_LINES})')
+    parser.add_argument('--repeat', type=int, default=5, help='Saves timed per measurement (default: 5)')
+    parser.add_argument('--values', action='append', default=[], metavar='CODE=v1,v2,...',
+                        help='Parameter values for a sentence, {line} is replaced by the item line number '
+                             '(repeatable, default: the line number, 1 for the document, or a date)')
+    parser.add_argument('--plan-only', action='store_true', help='Only show the interpreted pipeline')
+    args = parser.parse_args()
+
+    steps = read_pipeline(args.args_driver)
+    codes = [step.code for step in steps if step.code]
+    sentences = read_sql_sentences(codes, args.root)
+
+    sync_tool = None
+    if not args.plan_only:
+        from xml_db_sync import XMLDatabaseSync
+        sync_tool = XMLDatabaseSync(args.config or "db_config.json")
+        missing = [code for code in codes if code not in sentences]
+        if missing:
+            sentences.update(sync_tool.fetch_sql_sentences(missing))
+
+    print_pipeline(args.args_driver, steps, sentences)
+    values = {}
+    for option in args.values:
+        code, _, listed = option.partition('=')
+        values[code] = listed.split(',') if listed else []
+    replay = SaveReplay(steps, sentences, values)
+    line_counts = args.lines or DEFAULT_LINES
+    print("   📊 Statements per save: " + ', '.join(
+        f"N={lines}: {replay.statements_per_save(lines)}" for lines in line_counts))
+    if args.plan_only:
+        return
+
+    missing = [code for code in codes if code not in sentences]
+    if missing:
+        print(f"❌ SQL not found in sentencias_sql/ or the database: {', '.join(missing)}")
+        sys.exit(1)
+    conn = sync_tool._get_connection()
+    if not conn:
+        sys.exit(1)
+
+    strategies = ['row', 'batch', 'copy']
+    try:
+        results = replay.benchmark(conn, line_counts, strategies, args.repeat)
+    except Exception as e:
+        print(f"❌ Replay failed: {e}")
+        print("💡 Give the values of the failing sentence with --values CODE=v1,v2,... "
+              "(use {line} where each item line needs its own value)")
+        sys.exit(1)
+    finally:
+        conn.rollback()
+        conn.close()
+
+    print(f"   {'N':>5} {'row by row':>12} {'execute_batch':>14} {'COPY':>10}")
+    for lines, timings in results.items():
+        print(f"   {lines:>5} {timings['row']:>10.1f}ms {timings['batch']:>12.1f}ms {timings['copy']:>8.1f}ms")
+    largest = results[line_counts[-1]]
+    best = min(('batch', 'copy'), key=lambda name: largest[name])
+    print(f"📊 N={line_counts[-1]}: {largest['row']:.1f} ms row by row, {largest[best]:.1f} ms with "
+          f"{'COPY' if best == 'copy' else 'execute_batch'} ({largest['row'] / largest[best]:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
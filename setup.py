@@ -13,6 +13,26 @@ setup(
     long_description_content_type="text/markdown",
     url="https://github.com/yourusername/parametrizacion_emaku_jbe",
     packages=find_packages(exclude=["tests*"]),
+    py_modules=[
+        "column_reorganizer",
+        "dataflow_checker",
+        "emaku_cli",
+        "escpos_compiler",
+        "form_open_cost",
+        "formula_analyzer",
+        "identifier_renamer",
+        "logo_cache",
+        "perfil_minifier",
+        "perfil_semantic_diff",
+        "query_batcher",
+        "repo_artifacts",
+        "save_replay_bench",
+        "sql_fingerprint",
+        "sql_utils",
+        "totals_pruner",
+        "xml_db_sync",
+        "xml_patch_engine",
+    ],
     package_data={
         "": ["*.xml", "*.sql"],
     },
@@ -37,6 +57,7 @@ setup(
         "test": [
             "pytest>=6.2.5",
             "pytest-cov>=2.12.1",
+            "pytest-xdist>=2.5.0",
         ],
         "docs": [
             "sphinx>=4.2.0",
@@ -45,8 +66,7 @@ setup(
     },
     entry_points={
         "console_scripts": [
-            # Add any command-line tools here
-            # 'command-name = module:function',
+            "emaku = emaku_cli:main",
         ],
     },
 )
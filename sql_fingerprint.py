@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+SQL Sentence Fingerprinting
+Tokenizes the SQL sentences used by the forms, normalizes formatting,
+literals, aliases and comma-join vs JOIN syntax, and groups sentences whose
+normalized text hashes the same, listing the forms that use each variant so
+duplicates can be collapsed into one shared statement.
+"""
+
+import argparse
+import hashlib
+import re
+import xml.etree.ElementTree as ET
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from repo_artifacts import ARGS_DRIVER, PERFIL, SQL, iter_artifacts
+
+# Values that look like SQL sentence codes: SEL0157, LCSEL0103, JBSEL0PEND, LCINS0211, JBUPD0001...
+SQL_CODE_PATTERN = re.compile(r'^[A-Z]{0,4}(?:SEL|INS|UPD|DEL)[0-9A-Z]*[0-9][0-9A-Z]*$')
+
+# Normalization levels, each one including the previous
+FORMATTING = 1   # whitespace, comments, keyword case and '?' vs ? placeholders
+LITERALS = 2     # string and number literals
+STRUCTURE = 3    # aliases, comma joins vs inner JOIN ... ON, order of AND-ed conditions
+
+LEVEL_DESCRIPTIONS = {
+    FORMATTING: 'identical apart from formatting',
+    LITERALS: 'differ only in literals',
+    STRUCTURE: 'differ in aliases, join syntax or condition order',
+}
+
+_TOKEN = re.compile(r"""
+    (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<placeholder>'\?'|\?)
+  | (?P<string>[Ee]?'(?:[^']|'')*')
+  | (?P<dollar>\$(?P<tag>\w*)\$.*?\$(?P=tag)\$)
+  | (?P<number>\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+  | (?P<quoted>"(?:[^"]|"")*")
+  | (?P<word>[A-Za-z_][\w$]*)
+  | (?P<op>::|<>|!=|<=|>=|\|\||[^\s\w])
+  | (?P<space>\s+)
+""", re.S | re.X)
+
+# Words that end a table reference in FROM instead of being its alias
+_CLAUSE_WORDS = {
+    'where', 'join', 'inner', 'left', 'right', 'full', 'cross', 'natural', 'lateral', 'on',
+    'using', 'group', 'order', 'limit', 'offset', 'having', 'union', 'except', 'intersect',
+    'window', 'for', 'returning', 'fetch', 'outer',
+}
+_SELECT_CLAUSES = ('from', 'where', 'group', 'having', 'window', 'order', 'limit', 'offset', 'for')
+_OUTER_JOIN_WORDS = {'left', 'right', 'full', 'cross', 'natural', 'lateral', 'using', 'outer'}
+_JOIN_WORDS = {'join', 'inner'} | _OUTER_JOIN_WORDS - {'using'}
+
+Token = Tuple[str, str]             # (kind, text)
+Item = Union[Token, 'Group']
+
+
+class Group(NamedTuple):
+    """A parenthesized run of items."""
+    items: List[Item]
+
+
+class Fingerprint(NamedTuple):
+    code: str
+    digests: Dict[int, str]         # level -> digest of the normalized text
+    canonical: str                  # text at the STRUCTURE level
+    literals: List[str]
+
+
+class Usage(NamedTuple):
+    codigo: str
+    attribute: str
+
+
+def tokenize(sql: str) -> List[Token]:
+    """Significant tokens of ``sql``: comments and whitespace are dropped."""
+    tokens = []
+    for match in _TOKEN.finditer(sql):
+        kind = match.lastgroup if match.lastgroup != 'tag' else 'dollar'
+        if kind in ('comment', 'space'):
+            continue
+        text = match.group(kind)
+        if kind == 'word':
+            text = text.lower()
+        elif kind == 'placeholder':
+            text = '?'
+        tokens.append((kind, text))
+    return tokens
+
+
+def _nest(tokens: List[Token]) -> List[Item]:
+    stack: List[List[Item]] = [[]]
+    for token in tokens:
+        if token == ('op', '('):
+            stack.append([])
+        elif token == ('op', ')') and len(stack) > 1:
+            items = stack.pop()
+            stack[-1].append(Group(items))
+        else:
+            stack[-1].append(token)
+    while len(stack) > 1:  # unbalanced: close what is open
+        items = stack.pop()
+        stack[-1].append(Group(items))
+    return stack[0]
+
+
+def render(items: List[Item]) -> str:
+    parts = []
+    for item in items:
+        parts.append(f"({render(item.items)})" if isinstance(item, Group) else item[1])
+    return ' '.join(parts)
+
+
+def _is_word(item: Item, *words: str) -> bool:
+    return not isinstance(item, Group) and item[0] == 'word' and (not words or item[1] in words)
+
+
+def _split(items: List[Item], *separators: Token) -> List[List[Item]]:
+    parts: List[List[Item]] = [[]]
+    for item in items:
+        if not isinstance(item, Group) and item in separators:
+            parts.append([])
+        else:
+            parts[-1].append(item)
+    return parts
+
+
+def _replace_literals(items: List[Item], found: List[str]) -> List[Item]:
+    result = []
+    for item in items:
+        if isinstance(item, Group):
+            result.append(Group(_replace_literals(item.items, found)))
+        elif item[0] in ('string', 'dollar', 'number'):
+            found.append(item[1])
+            result.append(('literal', '$'))
+        else:
+            result.append(item)
+    return result
+
+
+def _rename(items: List[Item], aliases: Dict[str, str]) -> List[Item]:
+    """Replace ``alias.`` qualifiers (also inside subqueries) by their canonical name."""
+    result = []
+    for number, item in enumerate(items):
+        if isinstance(item, Group):
+            result.append(Group(_rename(item.items, aliases)))
+        elif (item[0] == 'word' and item[1] in aliases and number + 1 < len(items)
+              and items[number + 1] == ('op', '.')):
+            result.append(('word', aliases[item[1]]))
+        else:
+            result.append(item)
+    return result
+
+
+def _conjuncts(items: List[Item]) -> List[List[Item]]:
+    """AND-ed conditions, or the whole condition if it has a top-level OR."""
+    if any(_is_word(item, 'or') for item in items):
+        return [items]
+    parts: List[List[Item]] = [[]]
+    between = False
+    for item in items:
+        if _is_word(item, 'and') and not between:
+            parts.append([])
+            continue
+        if _is_word(item, 'and', 'between'):
+            # The AND of "x BETWEEN a AND b" belongs to the range, not the conjunction
+            between = not between
+        parts[-1].append(item)
+    return [part for part in parts if part]
+
+
+def _bare_words(items: List[Item]) -> set:
+    """Words not qualified by, nor qualifying, another name: ``x`` but not ``t.x``."""
+    return {item[1] for number, item in enumerate(items)
+            if _is_word(item) and ('op', '.') not in items[max(number - 1, 0):number] + items[number + 1:number + 2]}
+
+
+def _orient(condition: List[Item]) -> List[Item]:
+    """``b.y = a.x`` and ``a.x = b.y`` render the same."""
+    sides = _split(condition, ('op', '='))
+    if len(sides) != 2:
+        return condition
+    left, right = sorted(sides, key=render)
+    return left + [('op', '=')] + right
+
+
+def _table_refs(from_items: List[Item]) -> List[Tuple[List[Item], Optional[str], List[Item]]]:
+    """(table, alias, ON condition) for each table of a FROM clause."""
+    refs = []
+    current: List[Item] = []
+    condition: Optional[List[Item]] = None
+
+    def close():
+        if current:
+            table, alias = list(current), None
+            if len(table) >= 2 and _is_word(table[-1]) and table[-1][1] not in _CLAUSE_WORDS:
+                alias = table.pop()[1]
+                if table and _is_word(table[-1], 'as'):
+                    table.pop()
+            refs.append((table, alias, condition or []))
+
+    for item in from_items:
+        if item == ('op', ',') or _is_word(item, *_JOIN_WORDS):
+            if current:
+                close()
+            current, condition = [], None
+        elif _is_word(item, 'on', 'using'):
+            condition = []
+        elif condition is not None:
+            condition.append(item)
+        else:
+            current.append(item)
+    close()
+    return refs
+
+
+def _normalize_select(items: List[Item]) -> List[Item]:
+    """Canonical form of one SELECT block (items start at the SELECT keyword)."""
+    clauses: List[Tuple[str, List[Item]]] = [('select', [])]
+    for item in items[1:]:
+        if _is_word(item, *_SELECT_CLAUSES) and not (_is_word(item, 'for') and clauses[-1][0] == 'for'):
+            clauses.append((item[1], []))
+        else:
+            clauses[-1][1].append(item)
+    parts = dict(clauses)
+
+    # Output column aliases do not change what is computed, unless ORDER BY or GROUP BY refer to them
+    referenced = _bare_words(parts.get('order', []) + parts.get('group', []))
+    columns = []
+    for expression in _split(parts['select'], ('op', ',')):
+        if len(expression) >= 3 and _is_word(expression[-2], 'as') and expression[-1][1] not in referenced:
+            expression = expression[:-2]
+        columns.append(expression)
+    parts['select'] = [token for number, expression in enumerate(columns)
+                       for token in ([('op', ',')] if number else []) + expression]
+
+    renamed = set()
+    if 'from' in parts:
+        refs = _table_refs(parts['from'])
+        names = [render(table) for table, _, _ in refs]
+        aliases, subqueries = {}, 0
+        for table, alias, _ in refs:
+            if alias is None:
+                continue
+            if len(table) == 1 and isinstance(table[0], Group):
+                subqueries += 1
+                aliases[alias] = f"subquery{subqueries}"
+            elif names.count(render(table)) == 1:
+                aliases[alias] = render(table).split(' . ')[-1]
+        # Aliases replaced by the table name itself: their declarations go away
+        table_aliases = {alias for alias, name in aliases.items() if not name.startswith('subquery')}
+
+        if not any(_is_word(item, *_OUTER_JOIN_WORDS) for item in parts['from']):
+            # Inner joins only: FROM a, b WHERE ... and FROM a JOIN b ON ... are the same query
+            tables, conditions = [], []
+            for table, alias, condition in refs:
+                if alias and alias not in table_aliases:
+                    table = table + [('word', aliases.get(alias, alias))]
+                tables.append(_rename(table, aliases))
+                if condition:
+                    conditions.append(condition)
+            if 'where' in parts:
+                conditions.append(parts['where'])
+            tables.sort(key=render)
+            parts['from'] = [token for number, table in enumerate(tables)
+                             for token in ([('op', ',')] if number else []) + table]
+            conjuncts = sorted((_orient(conjunct) for condition in conditions
+                                for conjunct in _conjuncts(_rename(condition, aliases))), key=render)
+            if conjuncts:
+                if 'where' not in parts:
+                    clauses.insert([name for name, _ in clauses].index('from') + 1, ('where', []))
+                parts['where'] = [token for number, conjunct in enumerate(conjuncts)
+                                  for token in ([('word', 'and')] if number else []) + conjunct]
+            renamed = {'from', 'where'}
+        else:
+            # Outer joins keep their written order; only aliases are normalized
+            parts['from'] = _rename(_drop_alias_declarations(parts['from'], table_aliases), aliases)
+            renamed = {'from'}
+
+        for name in parts:
+            if name not in renamed:
+                parts[name] = _rename(parts[name], aliases)
+
+    result: List[Item] = []
+    for name, _ in clauses:
+        result.append(('word', name))
+        result.extend(parts[name])
+    return result
+
+
+def _drop_alias_declarations(items: List[Item], aliases: set) -> List[Item]:
+    """Remove the ``[AS] alias`` declarations of ``aliases`` (not their ``alias.`` uses)."""
+    result = []
+    for number, item in enumerate(items):
+        following = items[number + 1] if number + 1 < len(items) else None
+        if (_is_word(item) and item[1] in aliases and following != ('op', '.')
+                and not (result and result[-1] == ('op', '.'))):
+            if result and _is_word(result[-1], 'as'):
+                result.pop()
+            continue
+        result.append(item)
+    return result
+
+
+def _normalize_statement(items: List[Item]) -> List[Item]:
+    """Structure-level normalization of one statement, subqueries first."""
+    items = [Group(_normalize_statement(item.items)) if isinstance(item, Group) else item for item in items]
+    blocks = _split(items, ('word', 'union'), ('word', 'except'), ('word', 'intersect'))
+    separators = [item for item in items if _is_word(item, 'union', 'except', 'intersect')]
+    result: List[Item] = []
+    for number, block in enumerate(blocks):
+        if number:
+            result.append(separators[number - 1])
+        start = next((index for index, item in enumerate(block) if _is_word(item, 'select')), None)
+        if start is None:
+            result.extend(block)
+        else:
+            result.extend(block[:start] + _normalize_select(block[start:]))
+    return result
+
+
+def normalize(sql: str, level: int = STRUCTURE, literals: Optional[List[str]] = None) -> str:
+    """Canonical text of a sentence at the given normalization level."""
+    items = _nest(tokenize(sql))
+    if level >= LITERALS:
+        items = _replace_literals(items, literals if literals is not None else [])
+    statements = [statement for statement in _split(items, ('op', ';')) if statement]
+    if level >= STRUCTURE:
+        statements = [_normalize_statement(statement) for statement in statements]
+    return ' ; '.join(render(statement) for statement in statements)
+
+
+def fingerprint(code: str, sql: str) -> Fingerprint:
+    digests = {}
+    literals: List[str] = []
+    canonical = ''
+    for level in (FORMATTING, LITERALS, STRUCTURE):
+        text = normalize(sql, level, literals if level == LITERALS else None)
+        digests[level] = hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]
+        canonical = text
+    return Fingerprint(code, digests, canonical, literals)
+
+
+def find_usages(root='.', file_mappings=None) -> Dict[str, List[Usage]]:
+    """SQL code -> forms (perfiles and args_drivers) whose elements reference it."""
+    usages: Dict[str, List[Usage]] = {}
+    for artifact in iter_artifacts(root, kinds=(PERFIL, ARGS_DRIVER), file_mappings=file_mappings):
+        try:
+            tree = ET.parse(artifact.path)
+        except ET.ParseError:
+            continue
+        for element in tree.iter():
+            text = (element.text or '').strip()
+            if text and SQL_CODE_PATTERN.match(text):
+                attribute = element.get('attribute') or element.tag
+                if artifact.kind == ARGS_DRIVER:
+                    attribute = f"args_driver {attribute}"
+                usage = Usage(artifact.codigo, attribute)
+                if usage not in usages.setdefault(text, []):
+                    usages[text].append(usage)
+    return usages
+
+
+class DuplicateGroup(NamedTuple):
+    digest: str
+    level: int                      # lowest level at which all variants agree
+    members: List[Fingerprint]
+
+
+def group_fingerprints(fingerprints: List[Fingerprint]) -> List[DuplicateGroup]:
+    """Sentences sharing a structure-level fingerprint, largest groups first."""
+    by_digest: Dict[str, List[Fingerprint]] = {}
+    for item in fingerprints:
+        by_digest.setdefault(item.digests[STRUCTURE], []).append(item)
+    groups = []
+    for digest, members in by_digest.items():
+        if len(members) < 2:
+            continue
+        level = next(level for level in (FORMATTING, LITERALS, STRUCTURE)
+                     if len({member.digests[level] for member in members}) == 1)
+        groups.append(DuplicateGroup(digest, level, sorted(members, key=lambda member: member.code)))
+    return sorted(groups, key=lambda group: (-len(group.members), group.level, group.digest))
+
+
+def load_sentences(root='.', codes: Optional[List[str]] = None, use_database: bool = False,
+                   config_file: Optional[str] = None) -> Dict[str, str]:
+    """Sentences under ``sentencias_sql/`` plus, with ``use_database``, the referenced ones missing there."""
+    sentences = {artifact.codigo: artifact.path.read_text(encoding='utf-8')
+                 for artifact in iter_artifacts(root, kinds=(SQL,))}
+    if use_database and codes:
+        missing = [code for code in codes if code not in sentences]
+        if missing:
+            from xml_db_sync import XMLDatabaseSync
+            sentences.update(XMLDatabaseSync(config_file or "db_config.json").fetch_sql_sentences(missing))
+    return sentences
+
+
+def print_report(groups: List[DuplicateGroup], fingerprints: List[Fingerprint],
+                 usages: Dict[str, List[Usage]], verbose: bool = False):
+    print(f"🔎 {len(fingerprints)} sentences, "
+          f"{len({item.digests[STRUCTURE] for item in fingerprints})} distinct fingerprints")
+    for group in groups:
+        print(f"   🧬 {group.digest}: {len(group.members)} sentences {LEVEL_DESCRIPTIONS[group.level]}")
+        for member in group.members:
+            used = ', '.join(f"{usage.codigo} ({usage.attribute})" for usage in usages.get(member.code, []))
+            literals = f"  literals: {', '.join(member.literals)}" if group.level == LITERALS else ''
+            print(f"      {member.code:<12} variant {member.digests[FORMATTING]}  "
+                  f"used by {used or 'no form'}{literals}")
+        if verbose:
+            print(f"      canonical: {group.members[0].canonical}")
+    if groups:
+        redundant = sum(len(group.members) - 1 for group in groups)
+        print(f"📊 {redundant} sentences could collapse into {len(groups)} shared statements")
+    else:
+        print("📊 No duplicate sentences found")
+
+
+def main():
+    """Main function for command line usage."""
+    parser = argparse.ArgumentParser(
+        description="Group SQL sentences that are the same query after normalization")
+    parser.add_argument('codes', nargs='*', help='Only these SQL codes (default: every sentence found)')
+    parser.add_argument('--root', default='.', help='Repository root (default: .)')
+    parser.add_argument('--database', action='store_true',
+                        help='Fetch the referenced sentences missing from sentencias_sql/ from the database')
+    parser.add_argument('--config', help='Config file path (default: db_config.json)')
+    parser.add_argument('--verbose', '-v', action='store_true', help='Show the canonical text of each group')
+    args = parser.parse_args()
+
+    usages = find_usages(args.root)
+    wanted = args.codes or sorted(usages)
+    sentences = load_sentences(args.root, wanted, args.database, args.config)
+    if args.codes:
+        sentences = {code: sql for code, sql in sentences.items() if code in args.codes}
+
+    referenced = [code for code in usages if code not in sentences]
+    if referenced and not args.database and not args.codes:
+        print(f"💡 {len(referenced)} referenced codes have no file in sentencias_sql/; "
+              f"use --database to include them")
+
+    fingerprints = [fingerprint(code, sql) for code, sql in sorted(sentences.items())]
+    print_report(group_fingerprints(fingerprints), fingerprints, usages, args.verbose)
+
+
+if __name__ == "__main__":
+    main()
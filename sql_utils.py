@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+SQL Sentence Helpers
+Placeholder handling shared by the tools that run EMAKU sentences: counting and
+replacing the ``?`` / ``'?'`` placeholders, turning a sentence into a psycopg2
+statement and picking sample values for it.
+"""
+
+import re
+from typing import List, Optional
+
+# Comments, the quoted '?' placeholder, other string literals and the bare ? placeholder
+_SQL_TOKEN = re.compile(r"--[^\n]*|/\*.*?\*/|'\?'|'(?:[^']|'')*'|\?", re.S)
+_DATE_CAST = re.compile(r"(?:\?|'\?')\s*::\s*(date|timestamp)", re.I)
+
+
+def strip_sql(sql: str) -> str:
+    """Sentence without its trailing semicolon and blank lines."""
+    return sql.strip().rstrip(';').rstrip()
+
+
+def count_placeholders(sql: str) -> int:
+    return sum(1 for token in _SQL_TOKEN.findall(sql) if token in ('?', "'?'"))
+
+
+def is_single_select(sql: str) -> bool:
+    """True for one SELECT (or WITH ... SELECT) statement, which can run as a subquery."""
+    code = _SQL_TOKEN.sub(lambda m: "''" if m.group(0).startswith("'") else ' ', strip_sql(sql))
+    words = code.split()
+    return bool(words) and words[0].upper() in ('SELECT', 'WITH') and ';' not in code
+
+
+def replace_placeholders(sql: str, replacements: List[str]) -> str:
+    """Replace the n-th placeholder (quoted or bare) with ``replacements[n]``."""
+    position = iter(range(len(replacements)))
+
+    def substitute(match):
+        token = match.group(0)
+        if token not in ('?', "'?'"):
+            return token
+        return replacements[next(position)]
+
+    return _SQL_TOKEN.sub(substitute, sql)
+
+
+def executable(sql: str) -> str:
+    """EMAKU sentence with its placeholders turned into psycopg2 parameters."""
+    return replace_placeholders(strip_sql(sql).replace('%', '%%'), ['%s'] * count_placeholders(sql))
+
+
+def sample_values(sql: str, overrides: Optional[List[str]] = None, line: int = 1) -> List[str]:
+    """
+    One value per placeholder for item line ``line``: the overrides first, with
+    ``{line}`` replaced by the line number, then the line number (or a date
+    after a date cast), so unique keys on detail rows do not collide.
+    """
+    values = [value.replace('{line}', str(line)) for value in overrides or []]
+    # Placeholders found the way count_placeholders finds them, skipping comments and literals
+    placeholders = [match.start() for match in _SQL_TOKEN.finditer(sql) if match.group(0) in ('?', "'?'")]
+    for position in placeholders[len(values):]:
+        values.append('2024-01-15' if _DATE_CAST.match(sql, position) else str(line))
+    return values[:len(placeholders)]
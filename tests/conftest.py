@@ -0,0 +1,88 @@
+"""
+Shared pytest fixtures.
+
+Every perfil, args_driver, SQL sentence and printer template of the repository
+is discovered at collection time and offered to tests through the ``perfil``,
+``args_driver``, ``sql_sentence`` and ``template`` parameters, so new files are
+covered without touching the tests. Files are read and parsed at most once per
+session (per worker when running under ``pytest -n auto``).
+"""
+
+import sys
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from repo_artifacts import ARGS_DRIVER, PERFIL, SQL, TEMPLATE, iter_artifacts  # noqa: E402
+from xml_patch_engine import XMLOffsetIndex  # noqa: E402
+
+# Test parameter name -> artifact kind
+ARTIFACT_PARAMETERS = {
+    'perfil': PERFIL,
+    'args_driver': ARGS_DRIVER,
+    'sql_sentence': SQL,
+    'template': TEMPLATE,
+}
+
+
+class ParsedArtifact:
+    """Raw bytes of a file plus its text, ElementTree root and offset index, built on demand."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.data = path.read_bytes()
+        self._root = None
+        self._index = None
+
+    @property
+    def text(self) -> str:
+        return self.data.decode('utf-8')
+
+    @property
+    def root(self) -> ET.Element:
+        if self._root is None:
+            self._root = ET.fromstring(self.data)
+        return self._root
+
+    @property
+    def index(self) -> XMLOffsetIndex:
+        if self._index is None:
+            self._index = XMLOffsetIndex(self.data)
+        return self._index
+
+
+class ArtifactCache:
+    """Session-wide cache of parsed repository files, keyed by path."""
+
+    def __init__(self):
+        self._parsed: Dict[Path, ParsedArtifact] = {}
+
+    def __getitem__(self, path) -> ParsedArtifact:
+        path = Path(path)
+        if path not in self._parsed:
+            self._parsed[path] = ParsedArtifact(path)
+        return self._parsed[path]
+
+
+def pytest_generate_tests(metafunc):
+    for parameter, kind in ARTIFACT_PARAMETERS.items():
+        if parameter in metafunc.fixturenames:
+            artifacts = list(iter_artifacts(REPO_ROOT, kinds=(kind,)))
+            metafunc.parametrize(parameter, artifacts,
+                                 ids=[str(a.path.relative_to(REPO_ROOT)) for a in artifacts])
+
+
+@pytest.fixture(scope='session')
+def repo_root() -> Path:
+    return REPO_ROOT
+
+
+@pytest.fixture(scope='session')
+def parsed() -> ArtifactCache:
+    return ArtifactCache()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from dataflow_checker import DataFlowChecker, FormFlow, TemplateFlow
+
+PERFIL = """<FORM>
+  <component>
+    <driver>common.gui.components.GenericData</driver>
+    <parameters>
+      <arg attribute="exportValue">cliente</arg>
+      <arg attribute="importValue">bodega</arg>
+      <arg attribute="calculateExportValue">subtotal + iva * 2</arg>
+      <!-- <arg attribute="exportValue">comentado</arg> -->
+    </parameters>
+  </component>
+  <component>
+    <driver>client.gui.components.VTable</driver>
+    <parameters>
+      <arg attribute="exportTotalCol">d,subtotal</arg>
+      <arg attribute="exportTotalCol">e,sinuso</arg>
+    </parameters>
+  </component>
+  <printerTemplate>/graphics/TSPrueba.xml</printerTemplate>
+  <printerTemplate>/graphics/TSNoExiste.xml</printerTemplate>
+</FORM>
+"""
+
+TEMPLATE = """<template>
+  <field importValue="true">cliente</field>
+  <field importValue="true">clinete</field>
+  <field importValue="true">detime</field>
+  <field importValue="true">userLogin</field>
+  <field>fijo</field>
+</template>
+"""
+
+
+class TestDataFlowChecker(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        os.makedirs(self.root / 'transacciones' / 'ventas')
+        os.makedirs(self.root / 'templates')
+        self.form = self.root / 'transacciones' / 'ventas' / 'TR99999_perfil.xml'
+        self.form.write_text(PERFIL, encoding='utf-8')
+        (self.root / 'templates' / 'TSPrueba.xml').write_text(TEMPLATE, encoding='utf-8')
+
+    def test_form_producers_and_consumers(self):
+        flow = FormFlow(self.form)
+        self.assertEqual(sorted(flow.producers), ['cliente', 'sinuso', 'subtotal'])
+        self.assertEqual(sorted(flow.consumers), ['bodega', 'iva', 'subtotal'])
+        self.assertEqual([location.via for location in flow.producers['subtotal']], ['exportTotalCol'])
+        self.assertEqual([reference for reference, _ in flow.templates],
+                         ['/graphics/TSPrueba.xml', '/graphics/TSNoExiste.xml'])
+
+    def test_template_imports(self):
+        flow = TemplateFlow(self.root / 'templates' / 'TSPrueba.xml')
+        self.assertEqual(sorted(flow.imports), ['cliente', 'clinete', 'detime', 'userLogin'])
+
+    def test_check_form(self):
+        report = DataFlowChecker(self.root).check_form(self.form)
+        found, missing = report.pairs
+        self.assertEqual(found.template_path, self.root / 'templates' / 'TSPrueba.xml')
+        # Built-in names (detime, userLogin) need no producer
+        self.assertEqual(sorted(found.unresolved_imports), ['clinete'])
+        self.assertIsNone(missing.template_path)
+        self.assertEqual(sorted(report.unconsumed_exports), ['sinuso'])
+        self.assertTrue(report.has_problems)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import io
+import subprocess
+import sys
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+
+import emaku_cli
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+class TestEmakuCli(unittest.TestCase):
+    def test_help_imports_no_tool(self):
+        # Neither the tools nor importlib.metadata, whose entry point scan alone
+        # takes tens of milliseconds, are loaded to print the command list
+        for argv in ([], ['--help']):
+            with self.subTest(argv=argv):
+                code = (f"import sys, emaku_cli; emaku_cli.main({argv!r}); "
+                        "print(sorted(m for m in ('xml_db_sync', 'psycopg2', 'lxml', 'argparse', "
+                        "'importlib.metadata') if m in sys.modules))")
+                output = subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT,
+                                        capture_output=True, text=True, check=True).stdout
+                self.assertIn('usage: emaku', output)
+                self.assertTrue(output.rstrip().endswith('[]'))
+
+    def test_unknown_command(self):
+        with redirect_stdout(io.StringIO()) as out:
+            self.assertEqual(emaku_cli.main(['no-such-command']), 2)
+        self.assertIn('Unknown command', out.getvalue())
+
+    def test_dispatches_with_tool_argv(self):
+        form = next((REPO_ROOT / 'transacciones').glob('**/*_perfil.xml'))
+        with redirect_stdout(io.StringIO()) as out:
+            self.assertEqual(emaku_cli.main(['validate', '--file', str(form)]), 0)
+        self.assertIn('valid', out.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
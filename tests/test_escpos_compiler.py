@@ -0,0 +1,127 @@
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from escpos_compiler import (ESC_CUT, ESC_INIT, _ps_imagemask, code128_widths, compile_template, format_date,
+                             format_number, is_receipt, main)
+from logo_cache import Bitmap, LogoCache, _png_file
+
+TEMPLATE = """<emaku_template type="POSTSCRIPT" nativeprinter="true" printer="EPSON_TM-T20">
+  <settings width="220" height="10000" />
+  <metadata>
+    <image row="1" col="10" width="50" height="50">/icons/logo.png</image>
+    <font row="0" col="0" name="Sans" size="8" />
+    <field row="90" col="10" type="STRING">Marcas &amp; Tendencias</field>
+    <field row="100" col="5" type="STRING">Numero:</field>
+    <line row="110" col="2" row2="110" col2="200" />
+    <roundedRectangle row="1" col="1" width="10" height="10" />
+  </metadata>
+  <package>
+    <field row="100" col="110" width="10" type="NUMERIC" mask="0000000000" />
+  </package>
+  <package>
+    <subpackage rowInit="120" rowAcum="10">
+      <field col="15" incrementRow="true" type="STRING" />
+      <field col="100" width="13" type="NUMERIC" mask="#,###,###.##" />
+    </subpackage>
+  </package>
+  <package>
+    <field textLine="TOTAL" rowAcum="20" textCol="5" fontSize="16" fontStyle="1" row="last" col="190"
+           width="13" type="NUMERIC" mask="#,###,###.##" />
+  </package>
+  <package validate="true">
+    <field row="last" rowAcum="10" col="15" type="STRING" />
+  </package>
+  <package>
+    <generateBarCodeImage row="last" rowAcum="30" col="10" width="10" type="NUMERIC" mask="0000000000" />
+  </package>
+</emaku_template>
+"""
+
+
+class TestEscPosCompiler(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        root = Path(self.directory.name)
+        images = root / 'resources' / 'images'
+        images.mkdir(parents=True)
+        rows = b''.join(b'\x00' + b'\x00\x00\x00\xff' * 8 for _ in range(4))  # 8x4 black RGBA
+        (images / 'logo.png').write_bytes(_png_file(8, 4, 8, 6, rows))
+        self.template = root / 'TSRecibo.xml'
+        self.template.write_text(TEMPLATE, encoding='utf-8')
+        self.layout = compile_template(self.template, root, cache=LogoCache(root / 'cache'))
+        self.packages = [['4447'], [['CAMISA', '35900'], ['PANTALON', '1234567.5']], ['1269467.5'], [''],
+                         ['50001']]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_formatting(self):
+        self.assertEqual(format_number('1234567.5', '#,###,###.##'), '1,234,567.5')
+        self.assertEqual(format_number('35900', '#,###,##0.00'), '35,900.00')
+        self.assertEqual(format_number('4447', '0000000000'), '0000004447')
+        self.assertEqual(format_number('abc', '###'), 'abc')
+        self.assertEqual(format_date('2024-05-17 10:30:00', 'EEEEEE dd MMMM yyyy'), 'viernes 17 mayo 2024')
+        self.assertEqual(format_date('2024-05-17', "dd/MM/yy 'a las' HH"), '17/05/24 a las 00')
+
+    def test_unsupported_logo_is_skipped(self):
+        root = Path(self.directory.name)
+        (root / 'resources' / 'images' / 'logo.png').write_bytes(_png_file(4, 2, 4, 0, b'\x00\xf0\x0f' * 2))
+        template = root / 'TSReciboGris.xml'
+        template.write_text(TEMPLATE + '<!-- gris -->\n', encoding='utf-8')
+        layout = compile_template(template, root, cache=LogoCache(root / 'other'))
+        self.assertIn('bit depth 4', layout.unreadable_images['/icons/logo.png'])
+        self.assertNotIn((1, 'raster'), [(item.row, item.kind) for item in layout.render(self.packages, {})])
+
+    def test_repeat_must_be_positive(self):
+        with mock.patch('sys.argv', ['escpos_compiler.py', str(self.template), '--repeat', '0']), \
+                redirect_stderr(StringIO()), self.assertRaises(SystemExit) as exit:
+            main()
+        self.assertEqual(exit.exception.code, 2)
+
+    def test_layout_is_compiled_once(self):
+        self.assertIs(compile_template(self.template, self.directory.name, cache=None), self.layout)
+        self.assertTrue(is_receipt(self.template))
+        self.assertEqual(self.layout.ignored['roundedRectangle'], 1)
+
+    def test_render_positions(self):
+        items = self.layout.render(self.packages, {})
+        text = [(item.row, item.text) for item in items if item.kind == 'text']
+        self.assertEqual(text, [
+            (90, 'Marcas & Tendencias'), (100, 'Numero:'), (100, '0000004447'),
+            (120, 'CAMISA'), (130, '35,900'), (140, 'PANTALON'), (150, '1,234,567.5'),
+            (170, 'TOTAL'), (170, '1,269,467.5')])
+        total = [item for item in items if item.text == '1,269,467.5'][0]
+        self.assertEqual(total.col + len(total.text) * total.font.char_width, round(190 * 576 / 220))
+        self.assertEqual([(item.row, item.kind) for item in items if item.kind != 'text'],
+                         [(1, 'raster'), (110, 'raster'), (200, 'barcode')])
+
+    def test_escpos_stream(self):
+        stream = self.layout.escpos(self.packages, {})
+        self.assertTrue(stream.startswith(ESC_INIT))
+        self.assertTrue(stream.endswith(ESC_CUT))
+        self.assertIn(b'\x1dv0\x00', stream)                    # logo and rule rasters
+        self.assertIn(b'\x1dkI\x0c{B0000050001', stream)         # CODE128 barcode
+        self.assertIn(b'\x1b!\x38TOTAL', stream)                 # bold, double size
+        self.assertLess(len(stream), len(self.layout.postscript(self.packages, {})))
+
+    def test_postscript_stand_in(self):
+        widths = code128_widths('0000050001')
+        self.assertEqual(len(widths), 6 * 12 + 7)                # start, 10 characters, check, stop
+        self.assertEqual(sum(widths), 11 * 12 + 13)
+        self.assertEqual(widths[:6], [2, 1, 1, 2, 1, 4])         # start B
+        self.assertEqual(widths[-7:], [2, 3, 3, 1, 1, 1, 2])     # stop
+
+        postscript = self.layout.postscript(self.packages, {}).decode('latin-1')
+        self.assertNotIn('colorimage', postscript)
+        mask = _ps_imagemask(Bitmap(9, 1, b'\xff\x80'), 0, 10, 1, 1)
+        self.assertIn('9 1 true [9 0 0 -1 0 1] currentfile /ASCIIHexDecode filter imagemask\nff80>', mask)
+        self.assertEqual(postscript.count('rectfill'), len(widths[::2]))
+
+
+if __name__ == '__main__':
+    unittest.main()
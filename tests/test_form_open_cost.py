@@ -0,0 +1,126 @@
+import os
+import tempfile
+import unittest
+
+from form_open_cost import CostModel, Estimate, rank_candidates, read_components
+
+PERFIL = """<FORM>
+  <component>
+    <driver id="prefijo">common.gui.components.GenericData</driver>
+    <parameters>
+      <subarg>
+        <arg attribute="sqlInit">SEL0001</arg>
+        <arg attribute="queryOnInit">true</arg>
+        <arg attribute="exportValue">prefix</arg>
+      </subarg>
+    </parameters>
+  </component>
+  <component>
+    <driver id="pie">common.gui.components.GenericData</driver>
+    <parameters>
+      <subarg>
+        <arg attribute="sqlInit">SEL0002</arg>
+        <arg attribute="queryOnInit">true</arg>
+        <arg attribute="importValue">prefix</arg>
+      </subarg>
+      <subarg>
+        <arg attribute="sqlInit">SEL0003</arg>
+      </subarg>
+    </parameters>
+  </component>
+  <tab locate="Center">
+    <panel name="Datos">
+      <component>
+        <driver>client.gui.components.VTable</driver>
+        <parameters>
+          <subarg>
+            <arg attribute="name">Bodega</arg>
+            <arg attribute="sqlCombo">SEL0004</arg>
+          </subarg>
+        </parameters>
+      </component>
+    </panel>
+    <panel name="Notas">
+      <component>
+        <driver id="notas">common.gui.components.XMLComboBox</driver>
+        <parameters>
+          <arg attribute="sqlCombo">SEL0005</arg>
+        </parameters>
+      </component>
+      <!-- <component><driver id="viejo">x</driver><parameters><arg attribute="sqlCombo">SEL0006</arg></parameters></component> -->
+    </panel>
+  </tab>
+</FORM>
+"""
+
+NESTED = """<FORM>
+  <component>
+    <driver id="cliente">common.gui.components.GenericData</driver>
+    <parameters><arg attribute="sqlCombo">SEL0010</arg></parameters>
+  </component>
+  <FORM>
+    <preferences><name>PAYMENTFORM</name></preferences>
+    <panel name="Pagos">
+      <component>
+        <driver id="tpagos">client.gui.components.TableFindData</driver>
+        <parameters>
+          <subarg><arg attribute="sqlCombo">SEL0011</arg></subarg>
+          <subarg><arg attribute="sqlCombo">SEL0012</arg></subarg>
+        </parameters>
+      </component>
+    </panel>
+  </FORM>
+</FORM>
+"""
+
+
+class TestFormOpenCost(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'JBTR99999_perfil.xml')
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(PERFIL)
+
+    def test_open_queries(self):
+        components = read_components(self.path)
+        self.assertEqual([(c.label, c.location, c.visible, [(q.attribute, q.code) for q in c.queries])
+                          for c in components], [
+            ('prefijo', 'form', True, [('sqlInit', 'SEL0001')]),
+            ('pie', 'form', True, [('sqlInit', 'SEL0002')]),
+            ('VTable #3', 'tab Datos', True, [('sqlCombo', 'SEL0004')]),
+            ('notas', 'tab Notas', False, [('sqlCombo', 'SEL0005')]),
+        ])
+        self.assertEqual(components[1].queries[0].imports, ['prefix'])
+
+    def test_nested_forms(self):
+        path = os.path.join(os.path.dirname(self.path), 'JBTR99998_perfil.xml')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(NESTED)
+        components = read_components(path)
+        self.assertEqual([(c.label, c.location, c.visible, [q.code for q in c.queries]) for c in components], [
+            ('cliente', 'form', True, ['SEL0010']),
+            ('tpagos', 'subform PAYMENTFORM › Pagos', False, ['SEL0011', 'SEL0012']),
+        ])
+        ranked = rank_candidates(components, CostModel())
+        self.assertEqual(ranked[0].reason, "subform: load when the subform is shown")
+
+    def test_estimates_and_ranking(self):
+        components = read_components(self.path)
+        model = CostModel(round_trip_ms=10, row_ms=0.1)
+        self.assertEqual(model.estimate(components[0].queries[0]), Estimate(1, 10.1, 'assumed'))
+        self.assertEqual(model.estimate(components[3].queries[0]), Estimate(25, 12.5, 'assumed'))
+        model.explained['SEL0004'] = Estimate(400, 50.0, 'plan')
+
+        ranked = rank_candidates(components, model, consumed={'prefix'})
+        self.assertEqual([(c.component.label, c.reason.split(':')[0]) for c in ranked], [
+            ('VTable #3', 'combo'),
+            ('notas', 'hidden tab page'),
+            ('pie', 'no other component imports its values'),
+            ('prefijo', 'feeds prefix'),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
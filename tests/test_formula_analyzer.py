@@ -0,0 +1,119 @@
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from formula_analyzer import FormulaAnalyzer, canonical_keys, parse_formula, tree_cost
+from xml_patch_engine import XMLOffsetIndex
+
+SAMPLE = """<FORM>
+  <component>
+    <driver id="principal">client.gui.components.TableFindData</driver>
+    <parameters>
+      <arg attribute="beanshell">d=(a*b)/(1+(c/100.0))</arg>
+      <arg attribute="beanshell">e=a&gt;0?(b*a)/(1+(c/100.0)):0</arg>
+        <!-- 1 (a) -->
+        <subarg>
+        <arg attribute="name">CANTIDAD</arg>
+        <arg attribute="type">INTEGER</arg>
+        </subarg>
+        <!-- 2 (b) -->
+        <subarg>
+        <arg attribute="name">VALOR</arg>
+        <arg attribute="type">DECIMAL</arg>
+        </subarg>
+        <!-- 3 (c) -->
+        <subarg>
+        <arg attribute="name">IVA</arg>
+        <arg attribute="type">DECIMAL</arg>
+        </subarg>
+        <!-- 4 (d) -->
+        <subarg>
+        <arg attribute="name">SUBTOTAL</arg>
+        <arg attribute="type">DECIMAL</arg>
+        </subarg>
+        <!-- 5 (e) -->
+        <subarg>
+        <arg attribute="name">NETO</arg>
+        <arg attribute="type">DECIMAL</arg>
+        </subarg>
+    </parameters>
+  </component>
+</FORM>
+"""
+
+
+def key_of(text):
+    _, tree = parse_formula(text)
+    keys = {}
+    return canonical_keys(tree, keys)
+
+
+class TestParser(unittest.TestCase):
+    def test_parses_escaped_beanshell(self):
+        target, tree = parse_formula('h=&quot;28312&quot;.equals(n)||am&gt;0?0:h')
+        self.assertEqual(target, 'h')
+        self.assertEqual(tree.kind, 'cond')
+        self.assertEqual(tree.children[0].value, '||')
+        self.assertEqual(tree_cost(tree), 8 + 1 + 1 + 1)
+
+    def test_normalization(self):
+        self.assertEqual(key_of('c*d'), key_of('(d * c)'))
+        self.assertEqual(key_of('a+b+c'), key_of('c+(a+b)'))
+        self.assertNotEqual(key_of('a-b'), key_of('b-a'))
+        self.assertNotEqual(key_of('f/100'), key_of('f/100.0'))
+        self.assertEqual(key_of('f/100.00'), key_of('f/100.0'))
+
+
+class TestFormulaAnalyzer(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.xml')
+        with os.fdopen(handle, 'w', encoding='utf-8') as f:
+            f.write(SAMPLE)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_reports_shared_subexpressions(self):
+        scope = FormulaAnalyzer(self.path).analyze()[0]
+        texts = [candidate.text for candidate in scope.candidates]
+        # (1+(c/100.0)) only appears inside the larger shared value
+        self.assertEqual(texts, ['(a*b)/(1+(c/100.0))'])
+        best = scope.candidates[0]
+        self.assertEqual(len(best.occurrences), 2)
+        self.assertTrue(best.numeric and best.safe)
+
+    def test_generates_helper_column(self):
+        with redirect_stdout(StringIO()):
+            added = FormulaAnalyzer(self.path).generate_helpers()
+        self.assertEqual(added, 1)
+
+        index = XMLOffsetIndex.from_file(self.path)
+        table = index.find_table('principal')
+        self.assertEqual([c.name for c in table.columns][-1], 'CSE_F')
+        formulas = [index.text(arg.value) for arg in index.args_with('beanshell')]
+        self.assertEqual(formulas, ['f=(a*b)/(1+(c/100.0))', 'd=f', 'e=a&gt;0?f:0'])
+
+    def rewrite(self, old, new):
+        with open(self.path, encoding='utf-8') as f:
+            content = f.read()
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(content.replace(old, new))
+
+    def test_mixed_attribute_kinds_get_no_helper(self):
+        self.rewrite('<arg attribute="beanshell">d=', '<arg attribute="formula">d=')
+        scope = FormulaAnalyzer(self.path).analyze()[0]
+        self.assertIsNone(scope.candidates[0].attribute)
+        with redirect_stdout(StringIO()):
+            self.assertEqual(FormulaAnalyzer(self.path).generate_helpers(), 0)
+
+    def test_string_columns_are_not_numeric(self):
+        self.rewrite('<arg attribute="name">VALOR</arg>\n        <arg attribute="type">DECIMAL</arg>',
+                     '<arg attribute="name">VALOR</arg>\n        <arg attribute="type">STRING</arg>')
+        scope = FormulaAnalyzer(self.path).analyze()[0]
+        self.assertFalse(scope.candidates[0].numeric)
+
+
+if __name__ == '__main__':
+    unittest.main()
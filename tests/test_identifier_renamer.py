@@ -0,0 +1,58 @@
+import unittest
+
+from identifier_renamer import AhoCorasick, _MarkupOffsets, find_replacements
+
+SAMPLE = """<FORM>
+  <preferences>
+    <notCleanExportValue>stotal</notCleanExportValue>
+    <exportValue>stotal,0</exportValue>
+  </preferences>
+  <!-- stotal se calcula con LCSEL0478 -->
+  <arg attribute="sqlCodeWT">LCSEL0478</arg>
+  <arg attribute="exportTotalCol">i,stotal</arg>
+  <arg attribute="calculateExportValue">stotal+stotalcinco</arg>
+  <arg attribute="text">stotal</arg>
+  <arg>LCSEL0478</arg>
+  <field row="1" col="2" importValue="true">stotal</field>
+  <field row="1" col="2" type="STRING">stotal</field>
+</FORM>
+"""
+
+
+class TestAhoCorasick(unittest.TestCase):
+    def test_finds_overlapping_keywords(self):
+        automaton = AhoCorasick(['he', 'she', 'his', 'hers'])
+        found = sorted((start, keyword) for start, _, keyword in automaton.iter_matches('ushers'))
+        self.assertEqual(found, [(1, 'she'), (2, 'he'), (2, 'hers')])
+
+
+class TestFindReplacements(unittest.TestCase):
+    def setUp(self):
+        self.mapping = {'stotal': 'subtotal', 'LCSEL0478': 'JBSEL0010'}
+        self.found = find_replacements(SAMPLE, AhoCorasick(self.mapping), self.mapping)
+
+    def test_only_identifier_contexts_are_renamed(self):
+        contexts = [(r.line, r.old, r.context) for _, _, r in self.found]
+        self.assertEqual(contexts, [
+            (3, 'stotal', 'notCleanExportValue'),
+            (4, 'stotal', 'exportValue'),
+            (7, 'LCSEL0478', 'arg[sqlCodeWT]'),
+            (8, 'stotal', 'arg[exportTotalCol]'),
+            (9, 'stotal', 'arg[calculateExportValue]'),
+            (11, 'LCSEL0478', 'arg'),
+            (12, 'stotal', 'field[importValue]'),
+        ])
+
+    def test_whole_identifiers_only(self):
+        for start, end, _ in self.found:
+            self.assertNotEqual(SAMPLE[end:end + 5], 'cinco')
+
+    def test_markup_offsets_match_rfind(self):
+        markup = _MarkupOffsets(SAMPLE)
+        for delimiter in ('<', '>', '<!--', '-->'):
+            for end in range(len(SAMPLE) + 1):
+                self.assertEqual(markup.last(delimiter, end), SAMPLE.rfind(delimiter, 0, end))
+
+
+if __name__ == '__main__':
+    unittest.main()
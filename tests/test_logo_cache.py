@@ -0,0 +1,96 @@
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from logo_cache import (Bitmap, LogoCache, _png_file, decode_png, dither, image_uses, main, read_pbm,
+                        resize)
+
+TEMPLATE = """<emaku_template type="POSTSCRIPT" nativeprinter="true" printer="EPSON_TM-T20">
+  <settings width="220" height="10000" />
+  <metadata>
+    <image row="1" col="10" width="50" height="50">/icons/logo.png</image>
+    <image row="1" col="10" width="400" height="100">/icons/logo.png</image>
+    <image row="1" col="10" width="50" height="50">/icons/missing.png</image>
+  </metadata>
+</emaku_template>
+"""
+
+
+def rgba_png(width, height, pixel):
+    """PNG whose rows use the Sub filter, to exercise the unfiltering."""
+    rows = b''
+    for y in range(height):
+        row = [pixel(x, y) for x in range(width)]
+        filtered = bytearray()
+        previous = (0, 0, 0, 0)
+        for rgba in row:
+            filtered.extend((value - before) & 0xff for value, before in zip(rgba, previous))
+            previous = rgba
+        rows += b'\x01' + bytes(filtered)
+    return _png_file(width, height, 8, 6, rows)
+
+
+class TestLogoCache(unittest.TestCase):
+
+    def test_decode_composites_over_white(self):
+        data = rgba_png(4, 2, lambda x, y: (0, 0, 0, 255) if x < 2 else (0, 0, 0, 0))
+        self.assertEqual(decode_png(data), (4, 2, [0, 0, 255, 255] * 2))
+
+    def test_resize_and_dither(self):
+        self.assertEqual(resize(4, 2, [0, 0, 255, 255] * 2, 2, 1), [0, 255])
+        gray = dither(8, 8, [128 - 1] * 64)
+        black = sum(bin(byte).count('1') for byte in gray.data)
+        self.assertTrue(24 <= black <= 40, black)  # mid gray is about half the dots
+        self.assertEqual(dither(9, 1, [0] * 9).data, b'\xff\x80')
+
+    def test_bitmap_output(self):
+        bitmap = Bitmap(9, 1, b'\xff\x80')
+        self.assertEqual(bitmap.escpos(), b'\x1dv0\x00\x02\x00\x01\x00\xff\x80')
+        self.assertEqual(bitmap.png()[16:26], b'\x00\x00\x00\x09\x00\x00\x00\x01\x01\x00')  # 9x1, 1 bit, gray
+
+    def test_cache_and_template_sizes(self):
+        with tempfile.TemporaryDirectory() as root:
+            images = Path(root) / 'resources' / 'images'
+            images.mkdir(parents=True)
+            (images / 'logo.png').write_bytes(rgba_png(400, 200, lambda x, y: (x % 256, y, 0, 255)))
+            template = Path(root) / 'TSFactura.xml'
+            template.write_text(TEMPLATE, encoding='utf-8')
+
+            uses = image_uses(template, root, sources={})
+            self.assertEqual([(u.width, u.height) for u in uses], [(200, 100), (400, 200), (0, 0)])
+            self.assertIsNone(uses[2].source)
+            stretched = image_uses(template, root, sources={}, keep_aspect=False)
+            self.assertEqual((stretched[1].width, stretched[1].height), (576, 72))
+            points = image_uses(template, root, sources={}, units='points')
+            self.assertEqual((points[0].width, points[0].height), (140, 70))
+
+            cache = LogoCache(Path(root) / 'cache')
+            bitmap, cached = cache.get(uses[0].source, 200, 100)
+            self.assertFalse(cached)
+            again, cached = cache.get(uses[0].source, 200, 100)
+            self.assertTrue(cached)
+            self.assertEqual(again, bitmap)
+            self.assertEqual(len(list((Path(root) / 'cache').glob('*_200x100.pbm'))), 1)
+            self.assertEqual(read_pbm(b'P4\n9 1\n\xff\x80'), Bitmap(9, 1, b'\xff\x80'))
+
+    def test_unsupported_png_is_reported(self):
+        with tempfile.TemporaryDirectory() as root:
+            images = Path(root) / 'resources' / 'images'
+            images.mkdir(parents=True)
+            (images / 'logo.png').write_bytes(_png_file(4, 2, 4, 0, b'\x00\xf0\x0f' * 2))  # 4-bit gray
+            template = Path(root) / 'TSFactura.xml'
+            template.write_text(TEMPLATE, encoding='utf-8')
+            argv = ['logo_cache.py', str(template), '--root', root, '--cache-dir', str(Path(root) / 'cache')]
+            with mock.patch('sys.argv', argv), redirect_stdout(StringIO()) as out, \
+                    self.assertRaises(SystemExit) as exit:
+                main()
+        self.assertEqual(exit.exception.code, 1)
+        self.assertIn('❌ /icons/logo.png', out.getvalue())
+        self.assertIn('bit depth 4', out.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
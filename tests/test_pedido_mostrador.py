@@ -11,8 +11,10 @@ class TestPedidoMostrador(unittest.TestCase):
         test_dir = Path(__file__).parent
         # Go up one level to the project root
         project_root = test_dir.parent
-        # Path to the XML file in the transacciones directory
-        xml_path = project_root / 'transacciones' / 'pedido_mostrador.xml'
+        # Pedido mostrador form and the tirilla printing fragment pasted into it
+        pedidos_dir = project_root / 'transacciones' / 'ventas' / 'pedidos'
+        xml_path = pedidos_dir / 'JBTR00001_perfil.xml'
+        cls.tirilla_path = pedidos_dir / 'fragmento_xml_impresion_pedidos_tirilla.xml'
         
         if not xml_path.exists():
             raise FileNotFoundError(f"Could not find XML file at: {xml_path}")
@@ -32,10 +34,10 @@ class TestPedidoMostrador(unittest.TestCase):
         printer_templates = self.root.findall('.//printerTemplate')
         self.assertGreater(len(printer_templates), 0, "No printer templates found in XML")
         
-        # Check if any of the printer templates contain the tirilla template
-        tirilla_found = any('TNPedidoMostradorTirilla.xml' in (tpl.text or '') 
-                           for tpl in printer_templates)
-        self.assertTrue(tirilla_found, "TNPedidoMostradorTirilla.xml template not found")
+        # Check if any of the printer templates contain the carta template
+        carta_found = any('TNPedidoMostradorCarta.xml' in (tpl.text or '') 
+                          for tpl in printer_templates)
+        self.assertTrue(carta_found, "TNPedidoMostradorCarta.xml template not found")
     
     def test_required_components_exist(self):
         """Test that all required components are present"""
@@ -55,18 +57,25 @@ class TestPedidoMostrador(unittest.TestCase):
     
     def test_printer_actions_exist(self):
         """Test that printer actions are properly defined"""
-        printer_actions = self.root.findall(".//action[@type='printer']")
+        printer_actions = [action for action in self.root.iter('action')
+                           if (action.findtext('type') or '').strip() == 'printer']
         self.assertGreater(len(printer_actions), 0, "No printer actions found")
         
-        # Check for the specific tirilla template
-        tirilla_action = None
+        # Check for the specific carta template
+        carta_action = None
         for action in printer_actions:
             template = action.find("printerTemplate")
-            if template is not None and 'TNPedidoMostradorTirilla.xml' in template.text:
-                tirilla_action = action
+            if template is not None and 'TNPedidoMostradorCarta.xml' in template.text:
+                carta_action = action
                 break
                 
-        self.assertIsNotNone(tirilla_action, "Tirilla printer action not found")
+        self.assertIsNotNone(carta_action, "Carta printer action not found")
+    
+    def test_tirilla_fragment_prints_tirilla(self):
+        """Test that the tirilla fragment defines the tirilla printer action"""
+        fragment = ET.parse(self.tirilla_path).getroot()
+        templates = [tpl.text for tpl in fragment.iter('printerTemplate')]
+        self.assertIn('/graphics/TNPedidoMostradorTirilla.xml', templates)
 
     def test_form_validation(self):
         """Test that required fields have validation"""
@@ -0,0 +1,58 @@
+import unittest
+from pathlib import Path
+
+from perfil_minifier import minify, minify_repository, same_tree
+from perfil_semantic_diff import PerfilVersion, semantic_diff
+
+PERFIL = """<!-- Encabezado
+de varias lineas -->
+<FORM>
+  <preferences>
+    <name>Pedido  Mostrador</name>
+    <iconificable/>
+  </preferences>
+  <component>
+    <driver id="productos">client.gui.components.VTable</driver>
+    <parameters>
+      <!-- 1 (a) -->
+      <subarg>
+        <arg attribute="name">Codigo</arg>
+        <arg attribute="type">STRING</arg>
+      </subarg>
+      <arg attribute="beanshell">b=a&gt;0&amp;&amp;a&lt;10?1:0</arg>
+      <arg attribute="text"> </arg>
+      <!-- <arg attribute="sqlCode">SEL0001</arg> -->
+    </parameters>
+  </component>
+</FORM>
+"""
+
+ROOT = Path(__file__).parent.parent
+
+
+class TestPerfilMinifier(unittest.TestCase):
+
+    def test_minify(self):
+        result = minify(PERFIL)
+        self.assertTrue(result.content.startswith('<FORM><preferences><name>Pedido  Mostrador</name>'
+                                                  '<iconificable/></preferences>'))
+        self.assertNotIn('<!--', result.content)
+        self.assertNotIn('SEL0001', result.content)
+        self.assertIn('<arg attribute="beanshell">b=a&gt;0&amp;&amp;a&lt;10?1:0</arg>', result.content)
+        self.assertIn('<arg attribute="text"> </arg>', result.content)
+        self.assertEqual(result.original_bytes, len(PERFIL.encode('utf-8')))
+        self.assertEqual(result.saved, result.original_bytes - len(result.content.encode('utf-8')))
+        self.assertTrue(same_tree(PERFIL.encode('utf-8'), result.content.encode('utf-8')))
+
+    def test_text_changes_are_not_equivalent(self):
+        self.assertFalse(same_tree('<FORM><name>a b</name></FORM>', '<FORM><name>a  b</name></FORM>'))
+        self.assertTrue(same_tree('<FORM>\n  <name>a b</name>\n</FORM>', '<FORM><name>a b</name></FORM>'))
+
+    def test_repository_perfiles(self):
+        for path, result in minify_repository(ROOT):
+            self.assertLess(result.minified_bytes, result.original_bytes, path)
+            self.assertEqual(semantic_diff(PerfilVersion.from_file(path), PerfilVersion(result.content)), [], path)
+
+
+if __name__ == '__main__':
+    unittest.main()
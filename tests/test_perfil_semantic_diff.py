@@ -0,0 +1,110 @@
+import os
+import tempfile
+import unittest
+
+from column_reorganizer import ColumnReorganizer
+from perfil_semantic_diff import (PerfilVersion, column_letter, letter_index, normalize_value, out_of_order,
+                                  semantic_diff, summarize)
+
+PERFIL = """<FORM>
+  <preferences>
+    <name>Pedido</name>
+  </preferences>
+  <component>
+    <driver id="productos">client.gui.components.VTable</driver>
+    <parameters>
+      <!-- 1 (a) -->
+      <subarg>
+        <arg attribute="name">Codigo</arg>
+        <arg attribute="type">STRING</arg>
+      </subarg>
+      <!-- 2 (b) -->
+      <subarg>
+        <arg attribute="name">Cantidad</arg>
+        <arg attribute="type">DECIMAL</arg>
+      </subarg>
+      <!-- 3 (c) -->
+      <subarg>
+        <arg attribute="name">Precio</arg>
+        <arg attribute="type">DECIMAL</arg>
+      </subarg>
+      <!-- 4 (d) -->
+      <subarg>
+        <arg attribute="name">Total</arg>
+        <arg attribute="type">DECIMAL</arg>
+      </subarg>
+      <arg attribute="formula">d=b*c</arg>
+      <arg attribute="totales">b,d</arg>
+      <arg attribute="exportTotalCol">d,total</arg>
+    </parameters>
+  </component>
+  <panel locate="South" type="FlowLayout">
+    <component>
+      <driver>common.gui.components.XMLLabel</driver>
+      <parameters><arg attribute="text">Cliente</arg></parameters>
+    </component>
+    <component>
+      <driver>common.gui.components.XMLLabel</driver>
+      <parameters><arg attribute="text">Fecha</arg></parameters>
+    </component>
+  </panel>
+</FORM>
+"""
+
+
+class TestPerfilSemanticDiff(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'JBTR99999_perfil.xml')
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(PERFIL)
+        self.old = PerfilVersion(PERFIL)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_letters(self):
+        self.assertEqual([letter_index(letter) for letter in ('a', 'z', 'aa', 'bc')], [0, 25, 26, 54])
+        self.assertEqual([column_letter(position) for position in (0, 25, 26, 54)], ['a', 'z', 'aa', 'bc'])
+        names = ['Cantidad', 'Precio']
+        self.assertEqual(normalize_value('formula', ' c = a *\n b ', names),
+                         '\x01+0\x02 = \x01Cantidad\x02 * \x01Precio\x02')
+        self.assertEqual(normalize_value('exportTotalCol', 'b,total', names), '\x01Precio\x02,total')
+        self.assertEqual(normalize_value('label', 'a b', names), 'a b')
+        self.assertEqual(out_of_order([0, 3, 1, 2]), {1})
+
+    def test_identical_versions(self):
+        self.assertEqual(semantic_diff(self.old, PerfilVersion(PERFIL.replace('  ', '\t'))), [])
+
+    def test_column_insertion_keeps_formula_semantics(self):
+        config = {'name': 'Disponible', 'length': '10', 'type': 'DECIMAL', 'enabled': 'false'}
+        ColumnReorganizer(self.path).insert_column(1, config, 'productos')
+        changes = semantic_diff(self.old, PerfilVersion.from_file(self.path))
+        self.assertEqual([(c.kind, c.level, c.subject, c.new) for c in changes],
+                         [('added', 'column', 'Disponible', 'b')])
+        self.assertEqual(summarize(changes), "added column Disponible; no formula semantics changed")
+
+    def test_formula_and_column_changes(self):
+        changed = (PERFIL.replace('d=b*c', 'd=b*c*1.19')
+                   .replace('<arg attribute="name">Precio</arg>', '<arg attribute="name">Valor</arg>'))
+        changes = semantic_diff(self.old, PerfilVersion(changed))
+        formulas = [change for change in changes if change.formula]
+        self.assertEqual([(c.old, c.new) for c in formulas], [('d=b*{Precio}', 'd=b*c*1.19')])
+        self.assertIn(('removed', 'Precio'), [(c.kind, c.subject) for c in changes if c.level == 'column'])
+        self.assertIn(('added', 'Valor'), [(c.kind, c.subject) for c in changes if c.level == 'column'])
+
+    def test_components_matched_by_id_and_driver(self):
+        labels = ('<component>\n      <driver>common.gui.components.XMLLabel</driver>\n'
+                  '      <parameters><arg attribute="text">Cliente</arg></parameters>\n    </component>')
+        swapped = PERFIL.replace(labels, '').replace('</panel>', labels + '\n  </panel>')
+        self.assertEqual(semantic_diff(self.old, PerfilVersion(swapped)), [])
+
+        moved = PERFIL.replace('<panel locate="South"', '<panel locate="North"')
+        changes = semantic_diff(self.old, PerfilVersion(moved))
+        self.assertEqual({(c.kind, c.level) for c in changes}, {('moved', 'component')})
+        self.assertEqual(summarize(changes), "2 components moved")
+
+
+if __name__ == '__main__':
+    unittest.main()
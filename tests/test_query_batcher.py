@@ -0,0 +1,156 @@
+import io
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest import mock
+
+from query_batcher import QueryBatcher, combine_queries, find_query_groups, main, plan_rewrite
+from sql_utils import count_placeholders, is_single_select
+from xml_patch_engine import XMLOffsetIndex, apply_edits
+
+FORM = b"""<FORM>
+  <component locate="Center">
+    <driver>client.gui.components.FindThird</driver>
+    <parameters>
+      <arg attribute="keySQL">SEL0157</arg>
+      <arg attribute="sqlCodeWT">LCSEL0200</arg>            <!-- rete fuente -->
+      <arg attribute="sqlCodeWT">LCSEL0382</arg>            <!-- email -->
+      <arg attribute="exportValue">email</arg>
+      <arg attribute="sqlCodeWT">LCSEL0986</arg>            <!-- empleado -->
+      <arg attribute="sqlInit">LCSEL0103</arg>
+    </parameters>
+  </component>
+  <component>
+    <driver id="nrogenerador">client.gui.components.TableDataFields</driver>
+    <parameters>
+      <subarg>
+        <arg attribute="sqlCode">SEL0119</arg>
+        <arg attribute="sqlCode">SEL0157</arg>
+      </subarg>
+      <subarg>
+        <arg attribute="sqlCode">SEL0120</arg>
+      </subarg>
+      <arg attribute="sqlCode">SEL0121</arg>
+    </parameters>
+  </component>
+</FORM>
+"""
+
+SENTENCES = {
+    'LCSEL0200': "SELECT r.porcentaje FROM retefuente r WHERE r.id_tercero = ?;\n",
+    'LCSEL0382': "-- email del tercero?\nSELECT email FROM general WHERE id = '?'::INT;",
+    'LCSEL0986': "SELECT CASE WHEN count(*) > 0 THEN 1 ELSE 0 END FROM empleados WHERE id = ?",
+}
+
+
+class TestQueryBatcher(unittest.TestCase):
+
+    def test_groups(self):
+        groups = find_query_groups(XMLOffsetIndex(FORM))
+        self.assertEqual([(g.attribute, g.codes) for g in groups],
+                         [('sqlCodeWT', ['LCSEL0200', 'LCSEL0382', 'LCSEL0986']),
+                          ('sqlCode', ['SEL0119', 'SEL0157'])])
+        self.assertEqual(groups[0].driver, 'client.gui.components.FindThird')
+        self.assertEqual(groups[1].driver_id, 'nrogenerador')
+
+    def test_groups_follow_the_owning_component(self):
+        # The driver of a nested component closes before the outer component's args
+        form = b"""<FORM>
+  <component>
+    <driver id="outer">client.gui.components.FindThird</driver>
+    <parameters>
+      <arg attribute="sqlCodeWT">A</arg>
+      <subarg>
+        <component>
+          <driver id="inner">client.gui.components.TableDataFields</driver>
+          <parameters><arg attribute="sqlCodeWT">B</arg></parameters>
+        </component>
+      </subarg>
+      <arg attribute="sqlCodeWT">C</arg>
+    </parameters>
+  </component>
+</FORM>
+"""
+        groups = find_query_groups(XMLOffsetIndex(form))
+        self.assertEqual([(g.driver_id, g.codes) for g in groups], [('outer', ['A', 'C'])])
+
+    def test_placeholders(self):
+        self.assertEqual(count_placeholders(SENTENCES['LCSEL0382']), 1)
+        self.assertEqual(count_placeholders("SELECT '¿?', ? FROM t /* ? */"), 1)
+        self.assertTrue(is_single_select(SENTENCES['LCSEL0200']))
+        self.assertFalse(is_single_select("DROP TABLE x; SELECT 1"))
+        self.assertFalse(is_single_select("UPDATE t SET a = ?"))
+
+    def test_combine_binds_key_once(self):
+        combined = combine_queries(SENTENCES)
+        self.assertEqual(combined.parameters, 1)
+        self.assertEqual(count_placeholders(combined.sql), 1)
+        self.assertIn("WITH batch_key AS (SELECT '?'::text AS p1)", combined.sql)
+        self.assertIn("r.id_tercero = batch_key.p1", combined.sql)
+        self.assertIn("id = batch_key.p1::INT", combined.sql)
+        self.assertIn('AS "LCSEL0986"', combined.sql)
+
+        lateral = combine_queries(SENTENCES, mode='lateral', key_type='integer')
+        self.assertIn('LEFT JOIN LATERAL', lateral.sql)
+        self.assertIn("'?'::integer", lateral.sql)
+
+    def test_combine_rejects_mismatched_sentences(self):
+        with self.assertRaises(ValueError):
+            combine_queries({'A': "SELECT 1 FROM t WHERE a = ?", 'B': "SELECT 1 FROM t WHERE a = ? AND b = ?"})
+        with self.assertRaises(ValueError):
+            combine_queries({'A': "SELECT 1 FROM t WHERE a = ?", 'B': "DELETE FROM t WHERE a = ?"})
+
+    def test_rewrite_and_sentence_lookup(self):
+        index = XMLOffsetIndex(FORM)
+        group = find_query_groups(index)[0]
+        result = apply_edits(FORM, plan_rewrite(index, group, 'LCSEL1000'))
+        self.assertIn(b'      <arg attribute="sqlCodeWT">LCSEL1000</arg>'
+                      b'            <!-- combina LCSEL0200, LCSEL0382, LCSEL0986 -->\n'
+                      b'      <arg attribute="exportValue">email</arg>\n'
+                      b'      <arg attribute="sqlInit">', result)
+        self.assertNotIn(b'LCSEL0200</arg>', result)
+        XMLOffsetIndex(result)  # still well formed
+
+        with tempfile.TemporaryDirectory() as root:
+            folder = Path(root) / 'sentencias_sql' / 'ventas'
+            folder.mkdir(parents=True)
+            for code, sql in SENTENCES.items():
+                (folder / f"{code}.sql").write_text(sql, encoding='utf-8')
+            batcher = QueryBatcher(root)
+            self.assertEqual(batcher.load_sentences(['LCSEL0200', 'SEL0119']),
+                             {'LCSEL0200': SENTENCES['LCSEL0200']})
+            self.assertEqual(batcher.sql_path_for('LCSEL1000', group.codes), folder / 'LCSEL1000.sql')
+
+    def test_failed_rewrite_writes_nothing(self):
+        # Two args on one line cannot be rewritten line by line
+        form_data = FORM.replace(b'LCSEL0200</arg>            <!-- rete fuente -->\n      ',
+                                 b'LCSEL0200</arg> ')
+        with tempfile.TemporaryDirectory() as root:
+            folder = Path(root) / 'sentencias_sql'
+            folder.mkdir()
+            for code, sql in SENTENCES.items():
+                (folder / f"{code}.sql").write_text(sql, encoding='utf-8')
+            form = Path(root) / 'perfil.xml'
+            form.write_bytes(form_data)
+            argv = ['query_batcher.py', str(form), '--root', root, '--group', '1',
+                    '--code', 'LCSEL1000', '--experimental-rewrite']
+            with mock.patch('sys.argv', argv), redirect_stdout(io.StringIO()) as out:
+                with self.assertRaises(SystemExit) as exit_code:
+                    main()
+            self.assertEqual(exit_code.exception.code, 1)
+            self.assertIn('does not start its own line', out.getvalue())
+            self.assertFalse((folder / 'LCSEL1000.sql').exists())
+            self.assertEqual(form.read_bytes(), form_data)
+
+            form.write_bytes(FORM)
+            with mock.patch('sys.argv', argv), redirect_stdout(io.StringIO()):
+                with self.assertRaises(SystemExit) as exit_code:
+                    main()
+            self.assertEqual(exit_code.exception.code, 0)
+            self.assertTrue((folder / 'LCSEL1000.sql').exists())
+            self.assertNotIn(b'LCSEL0200</arg>', form.read_bytes())
+
+
+if __name__ == '__main__':
+    unittest.main()
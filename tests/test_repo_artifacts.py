@@ -0,0 +1,41 @@
+import unittest
+from pathlib import Path
+
+from repo_artifacts import (ARGS_DRIVER, PERFIL, SQL, TEMPLATE,
+                            codigo_from_path, discover_artifacts)
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+class TestRepoArtifacts(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.artifacts = discover_artifacts(PROJECT_ROOT)
+
+    def test_codigo_from_path(self):
+        self.assertEqual(codigo_from_path('x/JBTR00001_perfil.xml'), 'JBTR00001')
+        self.assertEqual(codigo_from_path('x/JBTR00001_args_driver.xml'), 'JBTR00001')
+        self.assertEqual(codigo_from_path('x/LCSEL0103.sql'), 'LCSEL0103')
+        self.assertEqual(
+            codigo_from_path('JBTR00001_perfil.xml', {'JBTR00001_perfil.xml': 'OTRO'}),
+            'OTRO'
+        )
+
+    def test_discovers_every_kind(self):
+        kinds = {artifact.kind for artifact in self.artifacts}
+        self.assertEqual(kinds, {PERFIL, ARGS_DRIVER, SQL, TEMPLATE})
+
+    def test_fragments_are_not_forms(self):
+        for artifact in self.artifacts:
+            with self.subTest(path=artifact.path):
+                self.assertFalse(artifact.path.name.startswith('fragmento_'))
+
+    def test_known_form_is_found(self):
+        found = {(a.kind, a.codigo) for a in self.artifacts}
+        self.assertIn((PERFIL, 'JBTR00001'), found)
+        self.assertIn((ARGS_DRIVER, 'JBTR00001'), found)
+        self.assertIn((SQL, 'LCSEL0103'), found)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+from pathlib import Path
+
+from save_replay_bench import SaveReplay, copy_statement, read_pipeline
+from sql_utils import executable, sample_values
+
+ARGS_DRIVER = Path(__file__).parent.parent / 'transacciones' / 'ventas' / 'pedidos' / 'JBTR00001_args_driver.xml'
+
+
+class TestSaveReplayBench(unittest.TestCase):
+
+    def test_pipeline_of_pedidos(self):
+        steps = read_pipeline(ARGS_DRIVER)
+        self.assertEqual([(step.kind, step.code) for step in steps], [
+            ('document', None),
+            ('statement', 'JBUPD0001'), ('statement', 'INS0037'), ('statement', 'INS0048'),
+            ('statement', 'JBINS0001'),
+            ('key', None), ('key', None),
+            ('lines', 'LCINS0211'),
+            ('server', None),
+        ])
+        self.assertIn('fields 0,1,2,3,4,10,11,12', steps[7].description)
+        self.assertEqual(steps[8].description, 'LNInventarios.traslados')
+
+        replay = SaveReplay(steps, {})
+        self.assertEqual(replay.statements_per_save(1), 5)
+        self.assertEqual(replay.statements_per_save(300), 304)
+
+    def test_statements(self):
+        sql = "INSERT INTO detalle (codigo, cantidad, fecha) VALUES ('?', ?::INT, '?'::DATE);\n"
+        self.assertEqual(executable(sql), "INSERT INTO detalle (codigo, cantidad, fecha) VALUES (%s, %s::INT, %s::DATE)")
+        self.assertEqual(executable("SELECT '10%' WHERE a = ?"), "SELECT '10%%' WHERE a = %s")
+        self.assertEqual(sample_values(sql), ['1', '1', '2024-01-15'])
+        self.assertEqual(sample_values(sql, ['X']), ['X', '1', '2024-01-15'])
+        self.assertEqual(sample_values(sql, line=7), ['7', '7', '2024-01-15'])
+        self.assertEqual(sample_values(sql, ['REF{line}'], line=3), ['REF3', '3', '2024-01-15'])
+        commented = "-- valor?\nINSERT INTO t (a, b) VALUES (?, ?::date) /* ? */ RETURNING '¿?'"
+        self.assertEqual(sample_values(commented), ['1', '2024-01-15'])
+
+        self.assertEqual(copy_statement(sql),
+                         "COPY detalle (codigo, cantidad, fecha) FROM STDIN WITH (FORMAT csv)")
+        self.assertEqual(copy_statement("INSERT INTO t (a) VALUES (?::NUMERIC(12,2))"),
+                         "COPY t (a) FROM STDIN WITH (FORMAT csv)")
+        self.assertIsNone(copy_statement("INSERT INTO t (a, b) VALUES (?, now())"))
+        self.assertIsNone(copy_statement("INSERT INTO t (a) SELECT id FROM x WHERE y = ?"))
+        self.assertIsNone(copy_statement("UPDATE t SET a = ?"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+
+from sql_fingerprint import (FORMATTING, LITERALS, STRUCTURE, Usage, find_usages, fingerprint, group_fingerprints,
+                             load_sentences, normalize)
+
+COMMA_JOIN = """SELECT g.id, g.nombre AS nombre
+FROM general g, perfiles p  -- clientes
+WHERE g.id = p.id AND p.tipo = '002'"""
+
+INNER_JOIN = "select general.id, general.nombre from perfiles p inner join general on p.id=general.id where p.tipo='003';"
+
+
+class TestSqlFingerprint(unittest.TestCase):
+
+    def test_levels(self):
+        self.assertEqual(normalize("SELECT  a\nFROM t WHERE b = '?' -- x", FORMATTING),
+                         normalize("select a from t where b = ?", FORMATTING))
+        self.assertNotEqual(normalize("select a from t where b = 1", FORMATTING),
+                            normalize("select a from t where b = 2", FORMATTING))
+        literals = []
+        self.assertEqual(normalize("select a from t where b = 'x' and c = 2", LITERALS, literals),
+                         "select a from t where b = $ and c = $")
+        self.assertEqual(literals, ["'x'", '2'])
+
+    def test_join_syntax_and_aliases(self):
+        expected = ("select general . id , general . nombre from general , perfiles "
+                    "where $ = perfiles . tipo and general . id = perfiles . id")
+        self.assertEqual(normalize(COMMA_JOIN), expected)
+        self.assertEqual(normalize(INNER_JOIN), expected)
+
+        outer = normalize("select g.id from general g left join perfiles p on p.id = g.id")
+        self.assertEqual(outer, "select general . id from general left join perfiles on perfiles . id = general . id")
+        self.assertEqual(normalize("select x.a from (select a from t) x"),
+                         "select subquery1 . a from (select a from t) subquery1")
+
+    def test_between_is_one_condition(self):
+        self.assertNotEqual(normalize("select a from t where activo and fecha between desde and hasta"),
+                            normalize("select a from t where hasta and fecha between desde and activo"))
+        self.assertEqual(normalize("select a from t where b = 1 and fecha between desde and hasta"),
+                         normalize("select a from t where fecha between desde and hasta and b = 1"))
+
+    def test_output_aliases(self):
+        self.assertEqual(normalize("select nombre as n from general"), normalize("select nombre from general"))
+        self.assertEqual(normalize("select g.nombre as n, count(*) as total from general g group by n order by total"),
+                         "select general . nombre as n , count (*) as total from general group by n order by total")
+
+    def test_groups(self):
+        fingerprints = [fingerprint('SEL0001', COMMA_JOIN), fingerprint('SEL0002', INNER_JOIN),
+                        fingerprint('SEL0003', "select nombre from general"),
+                        fingerprint('SEL0004', "SELECT nombre FROM general;")]
+        groups = group_fingerprints(fingerprints)
+        self.assertEqual([([member.code for member in group.members], group.level) for group in groups],
+                         [(['SEL0003', 'SEL0004'], FORMATTING), (['SEL0001', 'SEL0002'], STRUCTURE)])
+        self.assertNotEqual(fingerprints[0].digests[LITERALS], fingerprints[1].digests[LITERALS])
+
+    def test_usages_and_sentences(self):
+        usages = find_usages(os.path.join(os.path.dirname(__file__), '..'))
+        self.assertIn(Usage('JBTR00001', 'keySQL'), usages['SEL0157'])
+        self.assertIn(Usage('JBTR00001', 'args_driver sql'), usages['LCINS0211'])
+
+        with tempfile.TemporaryDirectory() as root:
+            os.makedirs(os.path.join(root, 'sentencias_sql', 'ventas'))
+            with open(os.path.join(root, 'sentencias_sql', 'ventas', 'SEL0001.sql'), 'w', encoding='utf-8') as f:
+                f.write(COMMA_JOIN)
+            self.assertEqual(load_sentences(root, ['SEL0001', 'SEL0002']), {'SEL0001': COMMA_JOIN})
+
+
+if __name__ == '__main__':
+    unittest.main()
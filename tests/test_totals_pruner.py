@@ -0,0 +1,119 @@
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+from totals_pruner import TotalsAnalyzer, parse_keep
+
+FORM = """<FORM>
+  <component>
+    <driver id="principal">client.gui.components.TableFindData</driver>
+    <parameters>
+      <arg attribute="rows">100</arg>
+      <arg attribute="totales">a,b,c,d</arg>
+      <arg attribute="exportTotalCol">a,cantidad</arg>
+      <arg attribute="exportTotalCol">b,subtotal</arg>
+      <arg attribute="exportTotalCol">c,iva</arg>
+        <subarg>
+        <arg attribute="name">CANTIDAD</arg>
+        <arg attribute="type">INTEGER</arg>
+        </subarg>
+        <subarg>
+        <arg attribute="name">SUBTOTAL</arg>
+        <arg attribute="type">DECIMAL</arg>
+        </subarg>
+        <subarg>
+        <arg attribute="name">IVA</arg>
+        <arg attribute="type">DECIMAL</arg>
+        </subarg>
+        <subarg>
+        <arg attribute="name">TOTAL</arg>
+        <arg attribute="type">DECIMAL</arg>
+        </subarg>
+    </parameters>
+  </component>
+  <component>
+    <driver id="totales">client.gui.components.TableDataFields</driver>
+    <parameters>
+      <arg attribute="linkTable">principal</arg>
+      <subarg>
+        <arg attribute="label">TOTAL</arg>
+        <arg attribute="totalCol">d</arg>
+      </subarg>
+      <subarg>
+        <arg attribute="label">CANT</arg>
+        <arg attribute="calculateExportValue">cantidad*2</arg>
+      </subarg>
+    </parameters>
+  </component>
+  <action>
+    <type>printer</type>
+    <printerTemplate>/graphics/TNPrueba.xml</printerTemplate>
+  </action>
+</FORM>
+"""
+
+TEMPLATE = """<emaku_template>
+  <field row="1" col="1" importValue="true">subtotal</field>
+</emaku_template>
+"""
+
+
+class TestTotalsAnalyzer(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = Path(self.directory.name)
+        (self.root / 'templates').mkdir()
+        (self.root / 'templates' / 'TNPrueba.xml').write_text(TEMPLATE, encoding='utf-8')
+        self.form = self.root / 'PRUEBA_perfil.xml'
+        self.form.write_text(FORM, encoding='utf-8')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_traces_consumers(self):
+        totals = TotalsAnalyzer(self.form, self.root).analyze()[0]
+        self.assertEqual(totals.rows, 100)
+        self.assertEqual(totals.live, ['a', 'b', 'd'])
+        self.assertEqual(totals.dead, ['c'])
+        self.assertIn('TNPrueba.xml', totals.consumers['b'][0])
+
+    def test_prune_rewrites_totales(self):
+        with redirect_stdout(StringIO()):
+            self.assertTrue(TotalsAnalyzer(self.form, self.root).prune(ignore_packages=True))
+        text = self.form.read_text(encoding='utf-8')
+        self.assertIn('<arg attribute="totales">a,b,d</arg>', text)
+        self.assertNotIn('c,iva', text)
+        self.assertIn('      <arg attribute="exportTotalCol">b,subtotal</arg>\n        <subarg>', text)
+
+    def test_keep_applies_to_the_named_table(self):
+        self.assertEqual(parse_keep('principal:c'), ('principal', 'c'))
+        with redirect_stdout(StringIO()):
+            analyzer = TotalsAnalyzer(self.form, self.root)
+            self.assertEqual(analyzer.plan_prune(analyzer.analyze(), {('principal', 'c')}), [])
+            self.assertTrue(analyzer.prune({('otra', 'c')}, ignore_packages=True))
+        self.assertIn('<arg attribute="totales">a,b,d</arg>', self.form.read_text(encoding='utf-8'))
+
+    def test_missing_template_blocks_prune(self):
+        (self.root / 'templates' / 'TNPrueba.xml').unlink()
+        with redirect_stdout(StringIO()):
+            self.assertFalse(TotalsAnalyzer(self.form, self.root).prune(ignore_packages=True))
+        self.assertEqual(self.form.read_text(encoding='utf-8'), FORM)
+
+    def test_prune_needs_package_override(self):
+        with redirect_stdout(StringIO()) as out:
+            self.assertFalse(TotalsAnalyzer(self.form, self.root).prune())
+        self.assertIn('--ignore-packages', out.getvalue())
+        self.assertEqual(self.form.read_text(encoding='utf-8'), FORM)
+
+    def test_args_driver_keys_are_consumers(self):
+        (self.root / 'PRUEBA_args_driver.xml').write_text(
+            '<container>\n  <arg attribute="conditional">iva&gt;0</arg>\n</container>\n', encoding='utf-8')
+        totals = TotalsAnalyzer(self.form, self.root).analyze()[0]
+        self.assertEqual(totals.dead, [])
+        self.assertIn('PRUEBA_args_driver.xml conditional', totals.consumers['c'][0])
+
+
+if __name__ == '__main__':
+    unittest.main()
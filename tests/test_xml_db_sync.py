@@ -0,0 +1,160 @@
+import json
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+from xml_db_sync import XMLDatabaseSync, _CopyStream, _format_size, like_pattern, merge_sql, staging_table_sql
+
+ROWS = [['JBTR00001', 'a "quoted", value\nsecond line', None],
+        ['JBTR00002', '\\N', '']]
+
+
+class TestCopyStream(unittest.TestCase):
+
+    def test_csv_escaping(self):
+        stream = _CopyStream(ROWS)
+        self.assertEqual(stream.read(), '"JBTR00001","a ""quoted"", value\nsecond line",\\N\n'
+                                        '"JBTR00002","\\N",""\n')
+        self.assertEqual(stream.read(), '')
+        self.assertEqual(stream.bytes_sent, len(_CopyStream(ROWS).read().encode('utf-8')))
+
+    def test_chunked_reads_match_a_single_read(self):
+        stream = _CopyStream(ROWS)
+        chunks = []
+        while True:
+            chunk = stream.read(7)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        self.assertEqual(''.join(chunks), _CopyStream(ROWS).read())
+
+    def test_nul_is_rejected(self):
+        with self.assertRaises(ValueError):
+            _CopyStream([['X', 'a\x00b']]).read()
+
+
+class TestProvisionSql(unittest.TestCase):
+
+    def test_staging_table(self):
+        self.assertEqual(staging_table_sql('provision_transacciones', 'codigo', ['perfil', 'args_driver']),
+                         "CREATE TEMP TABLE provision_transacciones (codigo text PRIMARY KEY, "
+                         "perfil text, args_driver text) ON COMMIT DROP")
+
+    def test_merge_keeps_stored_values_for_missing_files(self):
+        self.assertEqual(merge_sql('transacciones', 'provision_transacciones', 'codigo', ['perfil', 'args_driver']),
+                         "INSERT INTO transacciones (codigo, perfil, args_driver) "
+                         "SELECT codigo, perfil, args_driver FROM provision_transacciones "
+                         "ON CONFLICT (codigo) DO UPDATE SET "
+                         "perfil = COALESCE(EXCLUDED.perfil, transacciones.perfil), "
+                         "args_driver = COALESCE(EXCLUDED.args_driver, transacciones.args_driver)")
+
+
+PERFIL = """<FORM>
+  <!-- cabecera -->
+  <preferences>
+    <name>Pedido</name>
+  </preferences>
+</FORM>
+"""
+
+
+class TestPullRecord(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        config = self.root / 'db_config.json'
+        config.write_text(json.dumps({'table': 'transacciones', 'backup_directory': str(self.root / 'backups')}))
+        self.sync = XMLDatabaseSync(str(config))
+        self.path = self.root / 'JBTR99999_perfil.xml'
+        self.path.write_text(PERFIL, encoding='utf-8')
+
+    def pull(self, stored, force=False):
+        self.sync.fetch_perfil = lambda codigo: stored
+        with redirect_stdout(StringIO()) as out:
+            result = self.sync.pull_record('JBTR99999', self.path, force)
+        return result, out.getvalue()
+
+    def test_minified_copy_keeps_the_readable_file(self):
+        result, output = self.pull('<FORM><preferences><name>Pedido</name></preferences></FORM>')
+        self.assertTrue(result)
+        self.assertIn('only in comments and formatting', output)
+        self.assertEqual(self.path.read_text(encoding='utf-8'), PERFIL)
+
+    def test_different_perfil_needs_force_and_is_backed_up(self):
+        stored = PERFIL.replace('Pedido', 'Factura')
+        result, output = self.pull(stored)
+        self.assertFalse(result)
+        self.assertIn('--force', output)
+        self.assertEqual(self.path.read_text(encoding='utf-8'), PERFIL)
+
+        result, _ = self.pull(stored, force=True)
+        self.assertTrue(result)
+        self.assertEqual(self.path.read_text(encoding='utf-8'), stored)
+        backups = list((self.root / 'backups').glob('JBTR99999_local_*.xml'))
+        self.assertEqual([backup.read_text(encoding='utf-8') for backup in backups], [PERFIL])
+
+
+class FakeConnection:
+    """Connection whose (named) cursor yields ``rows`` or fails on execute."""
+
+    def __init__(self, rows=(), error=None):
+        self.rows, self.error, self.closed = rows, error, False
+
+    def cursor(self, name=None):
+        return self
+
+    def execute(self, query, params=()):
+        self.query, self.params = query, params
+        if self.error:
+            raise self.error
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def close(self):
+        self.closed = True
+
+
+class TestListRecords(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        config = Path(directory.name) / 'db_config.json'
+        config.write_text(json.dumps({'table': 'transacciones'}))
+        self.sync = XMLDatabaseSync(str(config))
+
+    def list_records(self, conn, pattern=None):
+        self.sync._get_connection = lambda: conn
+        with redirect_stdout(StringIO()):
+            return self.sync.list_available_records(pattern)
+
+    def test_like_pattern_escapes_sql_wildcards(self):
+        self.assertEqual(like_pattern('LCTR*'), 'LCTR%')
+        self.assertEqual(like_pattern('JBTR0000?'), 'JBTR0000_')
+        self.assertEqual(like_pattern('LC_TR*'), 'LC\\_TR%')
+        self.assertEqual(like_pattern('100%'), '100\\%')
+        self.assertEqual(like_pattern('a\\b?'), 'a\\\\b_')
+
+    def test_format_size(self):
+        self.assertEqual(_format_size(1000), '1,000 bytes')
+        self.assertEqual(_format_size(1536), '1.5 KB')
+        self.assertEqual(_format_size(3 * 1024 ** 2), '3.0 MB')
+        self.assertEqual(_format_size(2 * 1024 ** 4), '2048.0 GB')
+
+    def test_list_returns_the_count_or_none_on_error(self):
+        conn = FakeConnection([('LCTR00227',), ('LCTR00252',)])
+        self.assertEqual(self.list_records(conn, 'LC_TR*'), 2)
+        self.assertEqual(conn.params, ('LC\\_TR%',))
+        self.assertTrue(conn.closed)
+        self.assertEqual(self.list_records(FakeConnection()), 0)
+        self.assertIsNone(self.list_records(FakeConnection(error=RuntimeError('relation does not exist'))))
+        self.assertIsNone(self.list_records(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+import os
+import tempfile
+import unittest
+
+from column_reorganizer import ColumnReorganizer
+from xml_patch_engine import SpanEdit, XMLOffsetIndex, apply_edits, apply_plans, load_plans, save_plans
+
+SAMPLE = """<!-- cabecera -->
+<FORM>
+  <component>
+    <driver id="principal">client.gui.components.TableFindData</driver>
+    <parameters>
+      <arg attribute="totales">b,c</arg>
+      <arg attribute="exportTotalCol">c,total</arg>
+      <arg attribute="formula">c=a*b</arg>          <!-- total -->
+      <arg attribute="beanshell">b=a&gt;0?a:b</arg>
+        <!-- 1 (a) -->
+        <subarg>
+        <arg attribute="name">CANTIDAD</arg>
+        <arg attribute="type">INTEGER</arg>
+        </subarg>
+        <!-- 2 (b) -->
+        <subarg>
+        <arg attribute="name">VALOR</arg>
+        <arg attribute="type">DECIMAL</arg>
+        </subarg>
+        <!-- 3 (c) -->
+        <subarg>
+        <arg attribute="name">TOTAL</arg>
+        <arg attribute="type">DECIMAL</arg>
+        </subarg>
+    </parameters>
+  </component>
+</FORM>
+"""
+
+# Like LCTR00227's retention tables: w is a variable imported from another table
+IMPORTED = """<FORM>
+  <component>
+    <driver id="base">client.gui.components.TableFindData</driver>
+    <parameters>
+      <arg attribute="totales">c</arg>
+      <arg attribute="importTotalCol">w,netosinbolsa</arg>
+      <arg attribute="beanshell">c=w&gt;a?(w*b)/100:0</arg>
+      <subarg><arg attribute="name">BASE</arg><arg attribute="type">DECIMAL</arg></subarg>
+      <subarg><arg attribute="name">PORCENTAJE</arg><arg attribute="type">DECIMAL</arg></subarg>
+      <subarg><arg attribute="name">VALOR</arg><arg attribute="type">DECIMAL</arg></subarg>
+    </parameters>
+  </component>
+</FORM>
+"""
+
+
+class TestXMLOffsetIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = XMLOffsetIndex(SAMPLE.encode('utf-8'))
+
+    def test_indexes_table_columns(self):
+        table = self.index.find_table('principal')
+        self.assertIsNotNone(table)
+        self.assertEqual([c.name for c in table.columns], ['CANTIDAD', 'VALOR', 'TOTAL'])
+        for column in table.columns:
+            self.assertIsNotNone(column.comment)
+            self.assertEqual(self.index.data[column.insert_at:column.insert_at + 8], b'        ')
+
+    def test_arg_value_spans_are_raw(self):
+        beanshell = self.index.args_with('beanshell')[0]
+        self.assertEqual(self.index.text(beanshell.value), 'b=a&gt;0?a:b')
+        self.assertEqual(beanshell.table, 0)
+        self.assertIsNone(beanshell.column)
+
+        names = self.index.args_with('name')
+        self.assertEqual([arg.column for arg in names], [0, 1, 2])
+
+    def test_apply_edits_preserves_everything_else(self):
+        totales = self.index.args_with('totales')[0]
+        result = apply_edits(self.index.data, [self.index.replace_value(totales, 'c')])
+        self.assertEqual(result, SAMPLE.replace('>b,c<', '>c<').encode('utf-8'))
+
+    def test_overlapping_edits_are_rejected(self):
+        with self.assertRaises(ValueError):
+            apply_edits(b'abcdef', [SpanEdit(0, 3, b'x'), SpanEdit(2, 4, b'y')])
+
+
+class TestColumnInsertion(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.xml')
+        with os.fdopen(handle, 'w', encoding='utf-8') as f:
+            f.write(SAMPLE)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_insert_column_shifts_references(self):
+        reorganizer = ColumnReorganizer(self.path)
+        self.assertTrue(reorganizer.insert_column(1, {'name': 'NUEVA', 'type': 'STRING'}))
+
+        index = XMLOffsetIndex.from_file(self.path)
+        table = index.find_table('principal')
+        self.assertEqual([c.name for c in table.columns], ['CANTIDAD', 'NUEVA', 'VALOR', 'TOTAL'])
+        self.assertEqual(index.text(index.args_with('totales')[0].value), 'c,d')
+        self.assertEqual(index.text(index.args_with('exportTotalCol')[0].value), 'd,total')
+        self.assertEqual(index.text(index.args_with('formula')[0].value), 'd=a*c')
+        self.assertEqual(index.text(index.args_with('beanshell')[0].value), 'c=a&gt;0?a:c')
+        comments = [index.text(c.span) for c in index.column_comments()]
+        self.assertEqual(comments, ['<!-- 1 (a) -->', '<!-- 2 (b) -->', '<!-- 3 (c) -->', '<!-- 4 (d) -->'])
+        self.assertIn('<!-- total -->', index.data.decode('utf-8'))
+
+    def test_ternary_operands_are_shifted(self):
+        reorganizer = ColumnReorganizer(self.path)
+        self.assertEqual(reorganizer._shift_column_letters('d=b>c?b:c', 1), 'e=c>d?c:d')
+        self.assertEqual(reorganizer._shift_column_letters('aa=a?b :c', 1), 'ab=a?c :d')
+
+    def test_saved_plan_matches_direct_update(self):
+        reorganizer = ColumnReorganizer(self.path)
+        plan, report = reorganizer.plan_shift(1)
+        plan_path = self.path + '.plan.json'
+        self.addCleanup(os.remove, plan_path)
+        save_plans([plan], plan_path)
+        self.assertEqual(load_plans(plan_path), [plan])
+        self.assertEqual(len(report['affected_formulas']), 2)
+
+        with open(self.path, 'rb') as f:
+            original = f.read()
+        self.assertTrue(reorganizer.update_formulas_after_manual_insertion(1))
+        with open(self.path, 'rb') as f:
+            expected = f.read()
+
+        with open(self.path, 'wb') as f:
+            f.write(original)
+        self.assertEqual(apply_plans(load_plans(plan_path)), [None])
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), expected)
+
+        # The file no longer has the hash the plan was made for
+        self.assertIn('changed', apply_plans([plan])[0])
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), expected)
+
+    def test_plan_paths_do_not_depend_on_the_working_directory(self):
+        cwd = os.getcwd()
+        self.addCleanup(os.chdir, cwd)
+        os.chdir(os.path.dirname(self.path))
+        plan, _ = ColumnReorganizer(os.path.basename(self.path)).plan_shift(1)
+        self.assertEqual(plan.path, os.path.realpath(self.path))
+
+        # Plans written with a relative path resolve next to the plan file
+        plan_path = self.path + '.plan.json'
+        self.addCleanup(os.remove, plan_path)
+        save_plans([plan._replace(path=os.path.basename(self.path))], plan_path)
+        os.chdir(cwd)
+        self.assertEqual(load_plans(plan_path)[0].path, os.path.realpath(self.path))
+
+    def test_variables_past_the_last_column_keep_their_letter(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(IMPORTED)
+        reorganizer = ColumnReorganizer(self.path)
+        self.assertTrue(reorganizer.insert_column(1, {'name': 'NUEVA'}, 'base'))
+        index = XMLOffsetIndex.from_file(self.path)
+        self.assertEqual(index.text(index.args_with('beanshell')[0].value), 'd=w&gt;a?(w*c)/100:0')
+        self.assertEqual(index.text(index.args_with('importTotalCol')[0].value), 'w,netosinbolsa')
+        self.assertEqual(index.text(index.args_with('totales')[0].value), 'd')
+
+        # After the insertion the last column is d, so a variable named d would clash
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(IMPORTED.replace('w', 'd'))
+        with self.assertRaises(ValueError):
+            reorganizer.plan_shift(1, 'base')
+
+    def test_several_plans_for_one_file_are_refused(self):
+        plan, _ = ColumnReorganizer(self.path).plan_shift(1)
+        errors = apply_plans([plan, plan._replace(path=os.path.join('.', os.path.relpath(self.path)))])
+        self.assertEqual(errors, ["several plans target this file"] * 2)
+        with open(self.path, encoding='utf-8') as f:
+            self.assertEqual(f.read(), SAMPLE)
+
+
+if __name__ == '__main__':
+    unittest.main()
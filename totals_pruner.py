@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Table Totals Pruner
+Traces every column listed in a table's ``totales`` to the places that read
+its sum (exportTotalCol names read by the form, its printer templates or the
+named keys and conditions of its args_driver, and totalCol fields linked to
+the table) and removes the dead ones.
+
+The packages a save sends to the args_driver are read by position, not by
+name, so they cannot be traced; pruning needs an explicit override.
+"""
+
+import argparse
+import sys
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from dataflow_checker import BUILTIN_VALUES, FormFlow, TemplateFlow, expression_names, iter_elements
+from repo_artifacts import ARGS_DRIVER, PERFIL, codigo_from_path, find_template, iter_artifacts
+from xml_patch_engine import ArgSpan, SpanEdit, XMLOffsetIndex, apply_edits, atomic_write
+
+# Rows assumed for a large order when the table does not declare "rows"
+DEFAULT_ROWS = 600
+
+# args_driver args whose text is a value name, and those holding an expression over names
+DRIVER_NAME_ATTRIBUTES = {'importValue', 'addKey', 'discartKey', 'removeKey'}
+DRIVER_EXPRESSION_ATTRIBUTES = {'conditional'}
+
+PACKAGES_NOT_CHECKED = ("args_driver packages were not checked: a save sends form values to the "
+                        "args_driver by position, so any sum may still be stored")
+
+
+class TableTotals(NamedTuple):
+    """Consumption of the ``totales`` columns of one table."""
+    table: Optional[str]                 # driver id
+    totales: ArgSpan
+    letters: List[str]
+    consumers: Dict[str, List[str]]      # letter -> who reads its sum
+    exports: Dict[str, List[ArgSpan]]    # letter -> exportTotalCol args
+    unsummed_reads: List[str]            # totalCol letters missing from totales
+    rows: int
+
+    @property
+    def dead(self) -> List[str]:
+        return [letter for letter in self.letters if not self.consumers.get(letter)]
+
+    @property
+    def live(self) -> List[str]:
+        return [letter for letter in self.letters if self.consumers.get(letter)]
+
+
+def _pruned(totals: TableTotals, keep=()) -> List[str]:
+    """Dead letters of ``totals`` not kept by a ``(table, letter)`` pair of ``keep``."""
+    return [letter for letter in totals.dead if (totals.table or '', letter) not in keep]
+
+
+def parse_keep(text: str) -> Tuple[str, str]:
+    """``table:letter`` (driver id and column letter; empty table for an unnamed one)."""
+    table, separator, letter = text.rpartition(':')
+    if not separator or not letter:
+        raise argparse.ArgumentTypeError(f"expected TABLE:LETTER, got {text!r}")
+    return table, letter
+
+
+def _split(text: str) -> List[str]:
+    return [part.strip() for part in text.split(',')]
+
+
+def _line_span(data: bytes, start: int, end: int):
+    """Widen [start, end) to whole lines when nothing else shares them."""
+    line_start = data.rfind(b'\n', 0, start) + 1
+    line_end = data.find(b'\n', end)
+    line_end = len(data) if line_end < 0 else line_end + 1
+    if data[line_start:start].strip() or data[end:line_end].strip():
+        return start, end
+    return line_start, line_end
+
+
+class TotalsAnalyzer:
+    def __init__(self, xml_file_path, root='.', rows: Optional[int] = None):
+        self.xml_file_path = Path(xml_file_path)
+        self.root = Path(root)
+        self.rows = rows
+        self.index = XMLOffsetIndex.from_file(self.xml_file_path)
+        self.missing_templates: List[str] = []
+        self.args_driver: Optional[Path] = None
+
+    def _find_args_driver(self) -> Optional[Path]:
+        codigo = codigo_from_path(self.xml_file_path)
+        sibling = self.xml_file_path.with_name(f"{codigo}_args_driver.xml")
+        if sibling.is_file():
+            return sibling
+        return next((artifact.path for artifact in iter_artifacts(self.root, kinds=(ARGS_DRIVER,))
+                     if artifact.codigo == codigo), None)
+
+    def _driver_consumers(self, consumers: Dict[str, List[str]]):
+        """Value names the args_driver reads by name (keys, conditions, importValue)."""
+        self.args_driver = self._find_args_driver()
+        if self.args_driver is None:
+            return
+        for tag, attrs, text, line in iter_elements(self.args_driver):
+            attribute = attrs.get('attribute')
+            if tag != 'arg' or not text:
+                continue
+            if attribute in DRIVER_NAME_ATTRIBUTES:
+                names = [text]
+            elif attribute in DRIVER_EXPRESSION_ATTRIBUTES:
+                names = expression_names(text)
+            else:
+                continue
+            for name in names:
+                consumers.setdefault(name, []).append(f"{self.args_driver.name} {attribute} (line {line})")
+
+    def _name_consumers(self) -> Dict[str, List[str]]:
+        """Value name -> descriptions of everything that reads it."""
+        form = FormFlow(self.xml_file_path)
+        consumers: Dict[str, List[str]] = {name: ['built-in'] for name in BUILTIN_VALUES}
+        for name, locations in form.consumers.items():
+            for location in locations:
+                consumers.setdefault(name, []).append(f"{location.via} (line {location.line})")
+
+        seen = set()
+        for reference, _ in form.templates:
+            if reference in seen:
+                continue
+            seen.add(reference)
+            path = find_template(reference, self.root, near=self.xml_file_path)
+            if path is None:
+                self.missing_templates.append(reference)
+                continue
+            for name, locations in TemplateFlow(path).imports.items():
+                consumers.setdefault(name, []).append(f"{path.name} (line {locations[0].line})")
+        self._driver_consumers(consumers)
+        return consumers
+
+    def _linked_reads(self) -> Dict[Optional[str], Dict[str, List[str]]]:
+        """
+        linkTable -> letter -> totalCol readers. Fields without a linkTable are
+        filed under None and count as readers of every table.
+        """
+        reads: Dict[Optional[str], Dict[str, List[str]]] = {}
+        root = ET.fromstring(self.index.data)
+        for parameters in root.iter('parameters'):
+            link = None
+            for arg in parameters.findall('arg'):
+                if arg.get('attribute') == 'linkTable':
+                    link = (arg.text or '').strip()
+            for field in parameters.findall('subarg'):
+                for arg in field.findall('arg'):
+                    if arg.get('attribute') == 'totalCol' and arg.text:
+                        label = next((a.text for a in field.findall('arg')
+                                      if a.get('attribute') in ('exportValue', 'label') and a.text), '')
+                        reads.setdefault(link, {}).setdefault(arg.text.strip(), []).append(
+                            f"totalCol {label.strip()}".rstrip())
+        return reads
+
+    def analyze(self) -> List[TableTotals]:
+        names = self._name_consumers()
+        linked = self._linked_reads()
+        results = []
+        for number, table in enumerate(self.index.tables):
+            totales = self.index.args_with('totales', table=number)
+            if not totales:
+                continue
+            letters = [letter for letter in _split(self.index.text(totales[0].value)) if letter]
+
+            consumers: Dict[str, List[str]] = {}
+            exports: Dict[str, List[ArgSpan]] = {}
+            for arg in self.index.args_with('exportTotalCol', table=number):
+                parts = _split(self.index.text(arg.value))
+                if len(parts) != 2:
+                    continue
+                letter, name = parts
+                exports.setdefault(letter, []).append(arg)
+                for consumer in names.get(name, []):
+                    consumers.setdefault(letter, []).append(f"{name} -> {consumer}")
+
+            table_reads = dict(linked.get(None, {}))
+            for letter, readers in linked.get(table.driver_id, {}).items():
+                table_reads[letter] = table_reads.get(letter, []) + readers
+            for letter, readers in table_reads.items():
+                consumers.setdefault(letter, []).extend(readers)
+
+            rows = self.rows
+            if rows is None:
+                declared = self.index.args_with('rows', table=number)
+                text = self.index.text(declared[0].value).strip() if declared else ''
+                rows = int(text) if text.isdigit() else DEFAULT_ROWS
+
+            unsummed = sorted(set(linked.get(table.driver_id, {})) - set(letters))
+            results.append(TableTotals(table.driver_id, totales[0], letters, consumers,
+                                       exports, unsummed, rows))
+        return results
+
+    def plan_prune(self, tables: List[TableTotals], keep=()) -> List[SpanEdit]:
+        """
+        Rewrite ``totales`` to the live columns (removing it when none is left)
+        and drop the exportTotalCol args of the dead ones. ``keep`` holds
+        ``(table, letter)`` pairs to leave in place.
+        """
+        edits = []
+        for totals in tables:
+            dead = _pruned(totals, keep)
+            if not dead:
+                continue
+            remaining = [letter for letter in totals.letters if letter not in dead]
+            if remaining:
+                edits.append(self.index.replace_value(totals.totales, ','.join(remaining)))
+            else:
+                # An empty list would still be split into one blank column
+                start, end = _line_span(self.index.data, totals.totales.element.start,
+                                        totals.totales.element.end)
+                edits.append(SpanEdit(start, end, b''))
+            for letter in dead:
+                for arg in totals.exports.get(letter, []):
+                    start, end = _line_span(self.index.data, arg.element.start, arg.element.end)
+                    edits.append(SpanEdit(start, end, b''))
+        return edits
+
+    def prune(self, keep=(), dry_run: bool = False, ignore_packages: bool = False) -> bool:
+        """
+        Remove the dead totals. Refused unless ``ignore_packages``: the
+        args_driver packages may store any sum and are not traced.
+        """
+        tables = self.analyze()
+        if not ignore_packages and not dry_run:
+            print(f"❌ Not pruning {self.xml_file_path}: {PACKAGES_NOT_CHECKED}. "
+                  f"Check the args_driver and rerun with --ignore-packages")
+            return False
+        if self.missing_templates:
+            print(f"❌ Not pruning {self.xml_file_path}: templates not found "
+                  f"({', '.join(self.missing_templates)}), consumption is unknown")
+            return False
+        edits = self.plan_prune(tables, keep)
+        if not edits:
+            print(f"✅ {self.xml_file_path}: no dead totals")
+            return True
+        if dry_run:
+            print(f"💡 Dry run: {self.xml_file_path} was not modified")
+            return True
+        atomic_write(self.xml_file_path, apply_edits(self.index.data, edits))
+        print(f"✅ Pruned totales in {self.xml_file_path}")
+        return True
+
+
+def print_report(path, tables: List[TableTotals], missing_templates: List[str], keep=()):
+    print(f"📄 {path}")
+    if not tables:
+        print("   (no totales)")
+    for reference in missing_templates:
+        print(f"   ⚠️  {reference} not found: its imports are unknown")
+    if tables:
+        print(f"   ⚠️  {PACKAGES_NOT_CHECKED}; 'never read' means no named reader was found")
+
+    for totals in tables:
+        dead = _pruned(totals, keep)
+        live = len(totals.letters) - len(dead)
+        before = len(totals.letters) * totals.rows
+        after = live * totals.rows
+        print(f"   📋 {totals.table or '(unnamed table)'}: {len(totals.letters)} totals, {len(dead)} dead")
+        for letter in totals.letters:
+            readers = totals.consumers.get(letter)
+            if readers:
+                print(f"      ✅ {letter}: {readers[0]}"
+                      + (f" (+{len(readers) - 1} more)" if len(readers) > 1 else ""))
+            elif (totals.table or '', letter) in keep:
+                print(f"      📌 {letter}: no consumer found, kept")
+            else:
+                exported = letter in totals.exports
+                print(f"      ❌ {letter}: never read" + (" (exported but unused)" if exported else ""))
+        for letter in totals.unsummed_reads:
+            print(f"      ⚠️  {letter}: read by totalCol but not listed in totales")
+        if dead:
+            saved = 100 * (before - after) // before
+            print(f"      📊 {totals.rows} rows: {before} → {after} additions per edit (-{saved}%)")
+
+
+def main():
+    """Main function for command line usage."""
+    parser = argparse.ArgumentParser(
+        description="Find (and remove) totales columns whose sums nobody reads")
+    parser.add_argument('forms', nargs='*', help='Perfil files to analyze (default: every perfil)')
+    parser.add_argument('--root', default='.', help='Repository root (default: .)')
+    parser.add_argument('--rows', type=int,
+                        help=f'Rows of a large order (default: the table "rows" arg or {DEFAULT_ROWS})')
+    parser.add_argument('--keep', action='append', default=[], type=parse_keep, metavar='TABLE:LETTER',
+                        help='Column of a table (driver id) to keep even if unused (repeatable)')
+    parser.add_argument('--prune', action='store_true', help='Rewrite totales to the live columns')
+    parser.add_argument('--dry-run', action='store_true', help='With --prune, only show the report')
+    parser.add_argument('--ignore-packages', action='store_true',
+                        help='With --prune, accept that the args_driver packages were not checked')
+    args = parser.parse_args()
+
+    forms = args.forms or [artifact.path for artifact in iter_artifacts(args.root, kinds=(PERFIL,))]
+    keep = set(args.keep)
+    success = True
+    found = set()
+    for form in forms:
+        analyzer = TotalsAnalyzer(form, args.root, args.rows)
+        tables = analyzer.analyze()
+        found.update((totals.table or '', letter) for totals in tables for letter in totals.letters)
+        print_report(form, tables, analyzer.missing_templates, keep)
+        if args.prune:
+            success = analyzer.prune(keep, args.dry_run, args.ignore_packages) and success
+    for table, letter in sorted(keep - found):
+        print(f"⚠️  --keep {table}:{letter}: no table '{table}' sums column {letter}")
+    sys.exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
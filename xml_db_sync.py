@@ -6,11 +6,96 @@ Automatically syncs XML form definitions to the transacciones table
 
 import os
 import sys
-import psycopg2
+import time
 import argparse
 from datetime import datetime
 from pathlib import Path
 import json
+from xml.etree import ElementTree
+
+from dataflow_checker import DataFlowChecker, print_report
+from repo_artifacts import ARTIFACT_KINDS, codigo_from_path, iter_artifacts
+from xml_patch_engine import atomic_write
+
+# Where each artifact kind is stored when provisioning a database.
+# Overridable per kind through the "provision" section of db_config.json.
+DEFAULT_PROVISION_TARGETS = {
+    'perfil': {'table': None, 'key': 'codigo', 'column': 'perfil'},  # None -> config['table']
+    'args_driver': {'table': None, 'key': 'codigo', 'column': 'args_driver'},
+    'sql': {'table': 'sentencia_sql', 'key': 'codigo', 'column': 'sentencia'},
+    'template': {'table': 'plantillas', 'key': 'codigo', 'column': 'plantilla'},
+}
+
+
+class _CopyStream:
+    """File-like object feeding COPY FROM STDIN from a row generator."""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = ''
+        self._offset = 0
+        self.bytes_sent = 0
+
+    @staticmethod
+    def _csv_field(value):
+        if value is None:
+            return '\\N'
+        if '\x00' in value:
+            # PostgreSQL text cannot store NUL; fail before COPY does, naming the cause
+            raise ValueError("NUL character in artifact content")
+        # Quoted, so the NULL marker, commas and newlines inside the value stay literal
+        return '"' + value.replace('"', '""') + '"'
+
+    def read(self, size=-1):
+        # Rows are only joined while less than ``size`` is pending; a large row is
+        # then served by moving an offset, without copying the rest on every read
+        if size < 0 or len(self._buffer) - self._offset < size:
+            parts = [self._buffer[self._offset:]]
+            pending = len(parts[0])
+            while size < 0 or pending < size:
+                try:
+                    row = next(self._rows)
+                except StopIteration:
+                    break
+                parts.append(','.join(self._csv_field(v) for v in row) + '\n')
+                pending += len(parts[-1])
+            self._buffer, self._offset = ''.join(parts), 0
+
+        end = len(self._buffer) if size < 0 else self._offset + size
+        chunk = self._buffer[self._offset:end]
+        self._offset += len(chunk)
+        self.bytes_sent += len(chunk.encode('utf-8'))
+        return chunk
+
+
+def _same_elements(local, stored):
+    """True when both perfiles parse into the same elements (comments and indentation aside)."""
+    from perfil_minifier import same_tree
+    try:
+        return same_tree(local.encode('utf-8'), stored.encode('utf-8'))
+    except ElementTree.ParseError:
+        return False
+
+
+def staging_table_sql(staging, key, columns):
+    """Temporary table COPY writes into, dropped at commit."""
+    return (f"CREATE TEMP TABLE {staging} ({key} text PRIMARY KEY, "
+            + ', '.join(f"{column} text" for column in columns)
+            + ") ON COMMIT DROP")
+
+
+def merge_sql(table, staging, key, columns):
+    """
+    INSERT ... ON CONFLICT moving the staging rows into ``table``. A NULL in
+    the staging table means the repository has no file of that kind for the
+    codigo, so the stored value is kept: provisioning never clears a column.
+    """
+    column_list = ', '.join([key] + columns)
+    updates = ', '.join(f"{column} = COALESCE(EXCLUDED.{column}, {table}.{column})" for column in columns)
+    return (f"INSERT INTO {table} ({column_list}) "
+            f"SELECT {column_list} FROM {staging} "
+            f"ON CONFLICT ({key}) DO UPDATE SET {updates}")
+
 
 class XMLDatabaseSync:
     def __init__(self, config_file="db_config.json"):
@@ -49,6 +134,13 @@ class XMLDatabaseSync:
     
     def _get_connection(self):
         """Create database connection."""
+        # Imported here so actions that never touch the database start fast
+        try:
+            import psycopg2
+        except ImportError:
+            print("❌ psycopg2 is not installed: pip install psycopg2-binary")
+            return None
+        
         try:
             db_config = self.config['database']
             conn = psycopg2.connect(
@@ -81,17 +173,7 @@ class XMLDatabaseSync:
             result = cursor.fetchone()
             
             if result:
-                backup_dir = Path(self.config.get('backup_directory', './backups'))
-                backup_dir.mkdir(exist_ok=True)
-                
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                backup_file = backup_dir / f"{codigo}_backup_{timestamp}.xml"
-                
-                with open(backup_file, 'w', encoding='utf-8') as f:
-                    f.write(result[0])
-                
-                print(f"💾 Backup created: {backup_file}")
-                return str(backup_file)
+                return self._write_backup(codigo, result[0])
             
         except Exception as e:
             print(f"⚠️  Backup failed: {e}")
@@ -100,6 +182,20 @@ class XMLDatabaseSync:
         
         return None
     
+    def _write_backup(self, codigo, content, label='backup'):
+        """Save content under the backup directory; returns the backup path."""
+        backup_dir = Path(self.config.get('backup_directory', './backups'))
+        backup_dir.mkdir(parents=True, exist_ok=True)
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        backup_file = backup_dir / f"{codigo}_{label}_{timestamp}.xml"
+        
+        with open(backup_file, 'w', encoding='utf-8') as f:
+            f.write(content)
+        
+        print(f"💾 Backup created: {backup_file}")
+        return str(backup_file)
+    
     def _validate_xml_content(self, xml_content):
         """Basic validation of XML content."""
         if not xml_content.strip():
@@ -113,13 +209,68 @@ class XMLDatabaseSync:
         
         return True, "XML validation passed"
     
-    def sync_file_to_database(self, xml_file_path, codigo=None):
+    def _check_dataflow(self, xml_path):
+        """Report unresolved printer template imports (never blocks the sync)."""
+        if not self.config.get('dataflow_check', True):
+            return
+        
+        try:
+            report = DataFlowChecker(self.config.get('repository_root', '.')).check_form(xml_path)
+        except Exception as e:
+            print(f"⚠️  Data-flow check skipped: {e}")
+            return
+        
+        if report.has_problems:
+            print(f"⚠️  Data-flow check found printer template problems:")
+            print_report(report, show_unconsumed=False)
+    
+    def validate_file(self, xml_file_path):
+        """
+        Validate an XML file without touching the database.
+        
+        Checks well-formedness, the <FORM> root for perfiles and, for perfiles,
+        the export/import data flow against their printer templates.
+        """
+        xml_path = Path(xml_file_path)
+        
+        if not xml_path.exists():
+            print(f"❌ File not found: {xml_file_path}")
+            return False
+        
+        try:
+            with open(xml_path, 'rb') as f:
+                ElementTree.parse(f)
+        except ElementTree.ParseError as e:
+            print(f"❌ {xml_path}: {e}")
+            return False
+        
+        if xml_path.name.endswith('_perfil.xml'):
+            with open(xml_path, 'r', encoding='utf-8') as f:
+                is_valid, message = self._validate_xml_content(f.read())
+            if not is_valid:
+                print(f"❌ {xml_path}: {message}")
+                return False
+            self._check_dataflow(xml_path)
+        
+        print(f"✅ {xml_path}: valid")
+        return True
+    
+    def validate_repository(self, root='.'):
+        """Validate every perfil, args_driver and template of the repository."""
+        results = [self.validate_file(artifact.path)
+                   for artifact in iter_artifacts(root, kinds=('perfil', 'args_driver', 'template'))]
+        failed = results.count(False)
+        print(f"📊 {len(results)} files validated, {failed} failed")
+        return failed == 0
+    
+    def sync_file_to_database(self, xml_file_path, codigo=None, minify=False):
         """
         Sync XML file content to database.
         
         Args:
             xml_file_path: Path to the XML file
             codigo: Database codigo value (auto-detected if None)
+            minify: Upload without comments and indentation (the file is not modified)
         """
         
         xml_path = Path(xml_file_path)
@@ -146,6 +297,20 @@ class XMLDatabaseSync:
             
             print(f"✅ XML validation passed")
             
+            # Warn about printer template fields the form never exports
+            self._check_dataflow(xml_path)
+            
+            if minify:
+                from perfil_minifier import minify as minify_perfil
+                try:
+                    result = minify_perfil(xml_content)
+                except ValueError as e:
+                    print(f"❌ Minification failed: {e}")
+                    return False
+                xml_content = result.content
+                print(f"🗜️  Minified: {result.original_bytes:,} → {result.minified_bytes:,} bytes "
+                      f"(-{result.saved:,}, {result.ratio:.1%})")
+            
             # Create backup
             backup_file = self._backup_current_record(codigo)
             
@@ -154,6 +319,8 @@ class XMLDatabaseSync:
             if not conn:
                 return False
             
+            import psycopg2
+            
             try:
                 cursor = conn.cursor()
                 
@@ -202,6 +369,266 @@ class XMLDatabaseSync:
             print(f"❌ Error: {e}")
             return False
     
+    def pull_record(self, codigo, xml_file_path=None, force=False):
+        """
+        Download the perfil stored in the database into a local file.
+        
+        An existing file that differs from the stored perfil is only replaced
+        with ``force``, after a backup. A stored perfil that differs only in
+        formatting (e.g. uploaded with ``sync --minify``) never replaces the
+        readable file.
+        
+        Args:
+            codigo: Database codigo value
+            xml_file_path: Destination file (default: the repository file for codigo)
+            force: Overwrite a local file whose content differs
+        """
+        if not xml_file_path:
+            matches = [artifact.path for artifact in iter_artifacts('.', kinds=('perfil',),
+                                                                     file_mappings=self.config.get('file_mappings'))
+                       if artifact.codigo == codigo]
+            xml_file_path = matches[0] if matches else Path(f"{codigo}_perfil.xml")
+        
+        perfil = self.fetch_perfil(codigo)
+        if perfil is None:
+            return False
+        
+        xml_file_path = Path(xml_file_path)
+        if xml_file_path.exists():
+            try:
+                local = xml_file_path.read_text(encoding='utf-8')
+            except OSError as e:
+                print(f"❌ Error pulling record: {e}")
+                return False
+            if local == perfil:
+                print(f"✅ {xml_file_path} already matches the stored perfil")
+                return True
+            if _same_elements(local, perfil):
+                print(f"ℹ️  The stored perfil of {codigo} differs from {xml_file_path} only in "
+                      f"comments and formatting (uploaded with --minify?); keeping the readable file")
+                return True
+            if not force:
+                print(f"❌ {xml_file_path} differs from the stored perfil; "
+                      f"use --force to overwrite it (a backup is kept)")
+                return False
+            if self.config.get('backup_enabled', True):
+                try:
+                    self._write_backup(codigo, local, label='local')
+                except OSError as e:
+                    print(f"❌ Backup failed, file left untouched: {e}")
+                    return False
+        
+        try:
+            atomic_write(xml_file_path, perfil)
+        except OSError as e:
+            print(f"❌ Error pulling record: {e}")
+            return False
+        
+        print(f"⬇️  Pulled {codigo} into {xml_file_path}")
+        return True
+    
+    def fetch_perfil(self, codigo):
+        """Perfil stored in the database for codigo, or None if there is none."""
+        conn = self._get_connection()
+        if not conn:
+            return None
+        
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT perfil FROM {self.config['table']} WHERE codigo = %s",
+                (codigo,)
+            )
+            result = cursor.fetchone()
+            
+            if not result or result[0] is None:
+                print(f"❌ No perfil stored for codigo: {codigo}")
+                return None
+            return result[0]
+            
+        except Exception as e:
+            print(f"❌ Error pulling record: {e}")
+            return None
+        finally:
+            conn.close()
+    
+    def preview_sync(self, xml_file_path, codigo=None):
+        """
+        Show what syncing a file would change, as a semantic diff against the
+        perfil stored in the database. Nothing is written.
+        """
+        from perfil_semantic_diff import PerfilVersion, print_diff, semantic_diff
+        
+        if not codigo:
+            codigo = codigo_from_path(xml_file_path, self.config.get('file_mappings'))
+        try:
+            new = PerfilVersion.from_file(xml_file_path)
+        except (OSError, ElementTree.ParseError) as e:
+            print(f"❌ Cannot read {xml_file_path}: {e}")
+            return False
+        
+        stored = self.fetch_perfil(codigo)
+        if stored is None:
+            return False
+        try:
+            old = PerfilVersion(stored.encode('utf-8'))
+        except ElementTree.ParseError as e:
+            print(f"⚠️  Stored perfil for {codigo} is not well-formed XML: {e}")
+            return False
+        
+        print_diff(f"{codigo}: database → {xml_file_path}", semantic_diff(old, new))
+        return True
+    
+    def _provision_targets(self, kinds):
+        """Resolve the (table, key, column) target of each artifact kind."""
+        overrides = self.config.get('provision', {}).get('targets', {})
+        targets = {}
+        for kind in kinds:
+            target = dict(DEFAULT_PROVISION_TARGETS[kind])
+            if kind in overrides:
+                if overrides[kind] is None:
+                    continue  # kind explicitly disabled in config
+                target.update(overrides[kind])
+            target['table'] = target['table'] or self.config['table']
+            targets[kind] = target
+        return targets
+
+    def fetch_sql_sentences(self, codes):
+        """Return {codigo: sentence} for the given SQL codes stored in the database."""
+        target = self._provision_targets(('sql',)).get('sql')
+        if not target or not codes:
+            return {}
+
+        conn = self._get_connection()
+        if not conn:
+            return {}
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT {target['key']}, {target['column']} FROM {target['table']} "
+                f"WHERE {target['key']} = ANY(%s)",
+                (list(codes),)
+            )
+            return {codigo: sentence for codigo, sentence in cursor.fetchall() if sentence}
+        except Exception as e:
+            print(f"❌ Error reading SQL sentences: {e}")
+            return {}
+        finally:
+            conn.close()
+
+    def provision_repository(self, root='.', kinds=ARTIFACT_KINDS):
+        """
+        Bulk-load every artifact of the repository into a (fresh) database.
+
+        Artifacts are grouped by destination table, streamed into a temporary
+        staging table with COPY FROM STDIN and merged with a single
+        INSERT ... ON CONFLICT per table, all inside one transaction.
+        Destination tables need a unique constraint on their key column.
+
+        Args:
+            root: Repository root to scan
+            kinds: Artifact kinds to load (perfil, args_driver, sql, template)
+        """
+        started = time.perf_counter()
+        targets = self._provision_targets(kinds)
+
+        # table -> {'key': key column, 'columns': [...], 'rows': {codigo: {column: path}}}
+        tables = {}
+        file_mappings = self.config.get('file_mappings')
+        file_count = 0
+        for artifact in iter_artifacts(root, tuple(targets), file_mappings):
+            target = targets[artifact.kind]
+            group = tables.setdefault(target['table'], {
+                'key': target['key'], 'columns': [], 'rows': {}
+            })
+            if target['column'] not in group['columns']:
+                group['columns'].append(target['column'])
+            row = group['rows'].setdefault(artifact.codigo, {})
+            if target['column'] in row:
+                print(f"⚠️  Duplicate {artifact.kind} for {artifact.codigo}: "
+                      f"{artifact.path} overrides {row[target['column']]}")
+            row[target['column']] = artifact.path
+            file_count += 1
+
+        if not tables:
+            print(f"❌ No artifacts found under {root}")
+            return False
+
+        print(f"📦 Provisioning {file_count} files into {len(tables)} table(s)")
+
+        conn = self._get_connection()
+        if not conn:
+            return False
+
+        import psycopg2
+
+        total_rows = 0
+        total_bytes = 0
+        try:
+            cursor = conn.cursor()
+
+            for table, group in tables.items():
+                key = group['key']
+                columns = group['columns']
+                staging = f"provision_{table.replace('.', '_')}"
+                table_started = time.perf_counter()
+
+                cursor.execute(staging_table_sql(staging, key, columns))
+
+                def rows(group=group, columns=columns):
+                    for codigo, files in group['rows'].items():
+                        values = [codigo]
+                        for column in columns:
+                            path = files.get(column)
+                            values.append(path.read_text(encoding='utf-8') if path else None)
+                        yield values
+
+                stream = _CopyStream(rows())
+                column_list = ', '.join([key] + columns)
+                cursor.copy_expert(
+                    f"COPY {staging} ({column_list}) FROM STDIN "
+                    f"WITH (FORMAT csv, NULL '\\N')",
+                    stream
+                )
+
+                # Columns missing for a codigo (e.g. a perfil without args_driver)
+                # keep whatever the table already had
+                cursor.execute(merge_sql(table, staging, key, columns))
+
+                merged = cursor.rowcount
+                elapsed = time.perf_counter() - table_started
+                total_rows += merged
+                total_bytes += stream.bytes_sent
+                print(f"   ✓ {table}: {merged} rows, "
+                      f"{stream.bytes_sent / 1024:.1f} KB in {elapsed:.3f}s")
+
+            conn.commit()
+
+        except (psycopg2.Error, ValueError) as e:
+            print(f"❌ Database error: {e}")
+            conn.rollback()
+            return False
+        finally:
+            conn.close()
+
+        elapsed = time.perf_counter() - started
+        rate = total_rows / elapsed if elapsed > 0 else 0.0
+        throughput = total_bytes / (1024 * 1024) / elapsed if elapsed > 0 else 0.0
+        print(f"✅ Provisioned {total_rows} rows ({total_bytes / 1024:.1f} KB) in {elapsed:.3f}s")
+        print(f"📊 {rate:.0f} rows/s, {throughput:.2f} MB/s")
+        return True
+
+    def _relation_stats(self, cursor):
+        """Planner row estimate and on-disk sizes of the configured table, from the catalog."""
+        cursor.execute(
+            "SELECT c.reltuples::bigint, pg_total_relation_size(c.oid), pg_relation_size(c.oid), "
+            "COALESCE(pg_total_relation_size(NULLIF(c.reltoastrelid, 0)), 0), pg_indexes_size(c.oid) "
+            "FROM pg_class c WHERE c.oid = %s::regclass",
+            (self.config['table'],)
+        )
+        return cursor.fetchone()
+
     def test_connection(self):
         """Test database connection."""
         print("🔄 Testing database connection...")
@@ -214,10 +641,11 @@ class XMLDatabaseSync:
                 version = cursor.fetchone()[0]
                 print(f"✅ Connected to PostgreSQL: {version}")
                 
-                # Test table access
-                cursor.execute(f"SELECT COUNT(*) FROM {self.config['table']};")
-                count = cursor.fetchone()[0]
-                print(f"✅ Table '{self.config['table']}' accessible: {count} records")
+                # Test table access; the row count comes from the catalog, not a full scan
+                cursor.execute(f"SELECT 1 FROM {self.config['table']} LIMIT 1;")
+                estimate = self._relation_stats(cursor)[0]
+                records = f"~{estimate} records" if estimate >= 0 else "not analyzed yet"
+                print(f"✅ Table '{self.config['table']}' accessible: {records}")
                 
                 return True
             except Exception as e:
@@ -228,39 +656,111 @@ class XMLDatabaseSync:
         
         return False
     
-    def list_available_records(self):
-        """List all available records in the transacciones table."""
+    def table_stats(self, top=10):
+        """Row estimate, table/TOAST/index sizes and the largest stored perfiles."""
         conn = self._get_connection()
         if not conn:
-            return []
+            return False
         
+        table = self.config['table']
         try:
             cursor = conn.cursor()
-            cursor.execute(f"SELECT codigo FROM {self.config['table']} ORDER BY codigo;")
-            records = [row[0] for row in cursor.fetchall()]
+            estimate, total, heap, toast, indexes = self._relation_stats(cursor)
+            print(f"📊 Table '{table}': {_format_size(total)} total")
+            print(f"   Rows (estimate): {estimate if estimate >= 0 else 'unknown, run ANALYZE'}")
+            print(f"   Table: {_format_size(heap)}, TOAST: {_format_size(toast)}, "
+                  f"indexes: {_format_size(indexes)}")
             
-            print(f"📋 Available records in {self.config['table']}:")
-            for record in records:
-                print(f"   • {record}")
+            # pg_column_size reports the stored (compressed) size without detoasting the perfil
+            cursor.execute(
+                f"SELECT codigo, pg_column_size(perfil) AS stored FROM {table} "
+                f"WHERE perfil IS NOT NULL ORDER BY stored DESC LIMIT %s",
+                (top,)
+            )
+            rows = cursor.fetchall()
+            if rows:
+                print("🏋️  Largest perfiles by stored bytes:")
+                for codigo, stored in rows:
+                    print(f"   {stored:>12,}  {codigo}")
+            return True
             
-            return records
+        except Exception as e:
+            print(f"❌ Error reading table statistics: {e}")
+            return False
+        finally:
+            conn.close()
+    
+    def list_available_records(self, pattern=None, batch_size=1000):
+        """
+        Print the codigos of the table, optionally filtered by a shell-style
+        pattern (``LCTR*``). Rows are streamed through a server-side cursor.
+        Returns the number of records listed, or None if the query failed.
+        """
+        conn = self._get_connection()
+        if not conn:
+            return None
+        
+        query = f"SELECT codigo FROM {self.config['table']}"
+        params = ()
+        if pattern:
+            query += " WHERE codigo LIKE %s"
+            params = (like_pattern(pattern),)
+        
+        try:
+            cursor = conn.cursor(name='emaku_list')
+            cursor.itersize = batch_size
+            cursor.execute(query + " ORDER BY codigo", params)
+            
+            print(f"📋 Available records in {self.config['table']}"
+                  + (f" matching {pattern}:" if pattern else ":"))
+            count = 0
+            for (record,) in cursor:
+                print(f"   • {record}")
+                count += 1
+            print(f"📊 {count} records")
+            return count
             
         except Exception as e:
             print(f"❌ Error listing records: {e}")
-            return []
+            return None
         finally:
             conn.close()
 
 
+def like_pattern(pattern):
+    """SQL LIKE pattern for a shell-style one: * and ? become % and _."""
+    escaped = pattern.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped.replace('*', '%').replace('?', '_')
+
+
+def _format_size(size):
+    for unit in ('bytes', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:,} {unit}" if unit == 'bytes' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
 def main():
     """Main function for command line usage."""
     
     parser = argparse.ArgumentParser(description="Sync XML files to PostgreSQL database")
-    parser.add_argument('action', choices=['sync', 'test', 'list', 'config'], 
+    parser.add_argument('action', choices=['sync', 'test', 'list', 'stats', 'config', 'provision',
+                                           'validate', 'pull'], 
                        help='Action to perform')
     parser.add_argument('--file', '-f', help='XML file path to sync')
     parser.add_argument('--codigo', '-c', help='Database codigo value (auto-detected if not provided)')
     parser.add_argument('--config', help='Config file path (default: db_config.json)')
+    parser.add_argument('--root', default='.', help='Repository root for provision (default: .)')
+    parser.add_argument('--only', action='append', choices=ARTIFACT_KINDS,
+                       help='Artifact kind to provision (repeatable, default: all)')
+    parser.add_argument('--minify', action='store_true',
+                       help='With sync: upload without comments and indentation')
+    parser.add_argument('--preview', action='store_true',
+                       help='With sync: show the semantic diff against the stored perfil and write nothing')
+    parser.add_argument('--force', action='store_true',
+                       help='With pull: overwrite a local file that differs (a backup is kept)')
+    parser.add_argument('--pattern', '-p', help='With list: only codigos matching this pattern (e.g. LCTR*)')
+    parser.add_argument('--top', type=int, default=10, help='With stats: largest perfiles shown (default: 10)')
     
     args = parser.parse_args()
     
@@ -279,15 +779,44 @@ def main():
         sys.exit(0 if success else 1)
     
     elif args.action == 'list':
-        sync_tool.list_available_records()
-        return
+        count = sync_tool.list_available_records(args.pattern)
+        sys.exit(0 if count is not None else 1)
+    
+    elif args.action == 'stats':
+        success = sync_tool.table_stats(args.top)
+        sys.exit(0 if success else 1)
     
     elif args.action == 'sync':
         if not args.file:
             print("❌ --file parameter is required for sync action")
             sys.exit(1)
         
-        success = sync_tool.sync_file_to_database(args.file, args.codigo)
+        if args.preview:
+            success = sync_tool.preview_sync(args.file, args.codigo)
+        else:
+            success = sync_tool.sync_file_to_database(args.file, args.codigo, args.minify)
+        sys.exit(0 if success else 1)
+    
+    elif args.action == 'validate':
+        if args.file:
+            success = sync_tool.validate_file(args.file)
+        else:
+            success = sync_tool.validate_repository(args.root)
+        sys.exit(0 if success else 1)
+    
+    elif args.action == 'pull':
+        codigo = args.codigo
+        if not codigo and args.file:
+            codigo = codigo_from_path(args.file, sync_tool.config.get('file_mappings'))
+        if not codigo:
+            print("❌ --codigo (or --file) parameter is required for pull action")
+            sys.exit(1)
+        
+        success = sync_tool.pull_record(codigo, args.file, args.force)
+        sys.exit(0 if success else 1)
+    
+    elif args.action == 'provision':
+        success = sync_tool.provision_repository(args.root, tuple(args.only or ARTIFACT_KINDS))
         sys.exit(0 if success else 1)
 
 
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Format-Preserving XML Patch Engine
+Indexes the byte spans of table columns, arg values and comments in an EMAKU
+XML file so edits can be applied as span replacements in a single rebuild,
+either at once or later from a serialized plan tied to the file's sha256.
+"""
+
+import bisect
+import hashlib
+import json
+import os
+import re
+import tempfile
+import xml.parsers.expat
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Matches column comments like "<!-- 15 (o) -->" or "<!-- 15 (o) description -->"
+COLUMN_COMMENT_PATTERN = re.compile(r'<!-- (\d+) \(([a-z]{1,2})\)(.*?) -->', re.S)
+
+PLAN_VERSION = 1
+
+
+class Span(NamedTuple):
+    """Half-open byte range [start, end) in the indexed buffer."""
+    start: int
+    end: int
+
+
+class SpanEdit(NamedTuple):
+    """Replace the bytes in [start, end) with ``replacement`` (start == end inserts)."""
+    start: int
+    end: int
+    replacement: bytes
+
+
+class ArgSpan(NamedTuple):
+    """An ``<arg attribute="...">value</arg>`` element and the span of its value."""
+    attribute: str
+    element: Span
+    value: Span
+    table: Optional[int]    # index in XMLOffsetIndex.tables, if inside a table
+    column: Optional[int]   # column position, if inside a column subarg
+
+
+class CommentSpan(NamedTuple):
+    span: Span
+    text: str
+
+
+class ColumnSpan(NamedTuple):
+    """A column ``<subarg>`` of a table."""
+    position: int
+    name: str
+    element: Span
+    comment: Optional[Span]  # leading "<!-- N (x) -->" comment, if present
+    insert_at: int           # start of the line holding the comment (or subarg)
+    indent: bytes            # indentation of that line
+
+
+class TableSpan(NamedTuple):
+    """The ``<parameters>`` of a component whose subargs define table columns."""
+    driver_id: Optional[str]
+    driver: str
+    element: Span
+    columns: List[ColumnSpan]
+
+
+class ComponentSpan(NamedTuple):
+    """A ``<component>`` element and its driver."""
+    driver_id: Optional[str]
+    driver: str
+    element: Span
+
+
+class EditPlan(NamedTuple):
+    """Span edits computed against one exact version of a file, identified by its sha256."""
+    path: str
+    sha256: str
+    edits: List[SpanEdit]
+    description: str = ''
+
+    def to_dict(self) -> Dict:
+        return {
+            'path': self.path,
+            'sha256': self.sha256,
+            'description': self.description,
+            'edits': [{'start': edit.start, 'end': edit.end, 'replacement': edit.replacement.decode('utf-8')}
+                      for edit in self.edits],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'EditPlan':
+        edits = [SpanEdit(edit['start'], edit['end'], edit['replacement'].encode('utf-8'))
+                 for edit in data['edits']]
+        return cls(data['path'], data['sha256'], edits, data.get('description', ''))
+
+
+class _Node:
+    """Parse-time bookkeeping for an open element."""
+    __slots__ = ('tag', 'attrs', 'start', 'start_tag_end', 'children', 'comments')
+
+    def __init__(self, tag, attrs, start, start_tag_end):
+        self.tag = tag
+        self.attrs = attrs
+        self.start = start
+        self.start_tag_end = start_tag_end
+        self.children = []   # (node, element span, value span)
+        self.comments = []
+
+
+class XMLOffsetIndex:
+    """
+    One-time byte offset index of an XML document.
+
+    The index is built with a single expat pass over the raw bytes, so spans
+    refer to the file exactly as stored: whitespace, comments and entity
+    escapes are left untouched and edits compose as plain byte replacements.
+    """
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.args: List[ArgSpan] = []
+        self.comments: List[CommentSpan] = []
+        self.tables: List[TableSpan] = []
+        self.components: List[ComponentSpan] = []
+        self._parents: Dict[int, Span] = {}   # arg start -> span of the element holding it
+        self._build()
+
+    @classmethod
+    def from_file(cls, path) -> 'XMLOffsetIndex':
+        with open(path, 'rb') as f:
+            return cls(f.read())
+
+    # ------------------------------------------------------------------ build
+
+    def _start_tag_end(self, start: int) -> int:
+        """Return the offset after the '>' closing the tag at ``start``."""
+        data = self.data
+        quote = None
+        i = start + 1
+        while True:
+            ch = data[i]
+            if quote:
+                if ch == quote:
+                    quote = None
+            elif ch in (0x22, 0x27):  # " or '
+                quote = ch
+            elif ch == 0x3E:  # >
+                return i + 1
+            i += 1
+
+    def _line_start(self, offset: int) -> Tuple[int, bytes]:
+        """Start of the line holding ``offset`` if only indentation precedes it."""
+        line_start = self.data.rfind(b'\n', 0, offset) + 1
+        prefix = self.data[line_start:offset]
+        if prefix.strip():
+            return offset, b''
+        return line_start, prefix
+
+    def _build(self):
+        data = self.data
+        parser = xml.parsers.expat.ParserCreate()
+        stack: List[_Node] = []
+
+        def start_element(tag, attrs):
+            start = parser.CurrentByteIndex
+            stack.append(_Node(tag, attrs, start, self._start_tag_end(start)))
+
+        def end_element(tag):
+            node = stack.pop()
+            index = parser.CurrentByteIndex
+            if index < node.start_tag_end:
+                # Self-closing element: expat reports the start tag offset
+                end = node.start_tag_end
+                value = Span(end, end)
+            else:
+                end = data.index(b'>', index) + 1
+                value = Span(node.start_tag_end, index)
+            element = Span(node.start, end)
+
+            if stack:
+                stack[-1].children.append((node, element, value))
+            for child, child_element, _ in node.children:
+                if child.tag == 'arg':
+                    self._parents[child_element.start] = element
+
+            if tag == 'arg' and 'attribute' in node.attrs:
+                self.args.append(ArgSpan(node.attrs['attribute'], element, value, None, None))
+            elif tag == 'parameters':
+                columns = self._columns_of(node)
+                if columns:
+                    driver_id, driver = self._driver_of(stack[-1] if stack else None)
+                    self.tables.append(TableSpan(driver_id, driver, element, columns))
+            elif tag == 'component':
+                self.components.append(ComponentSpan(*self._driver_of(node), element))
+
+        def comment(text):
+            start = parser.CurrentByteIndex
+            end = data.index(b'-->', start) + 3
+            span = CommentSpan(Span(start, end), text)
+            self.comments.append(span)
+            if stack:
+                stack[-1].comments.append(span)
+
+        parser.StartElementHandler = start_element
+        parser.EndElementHandler = end_element
+        parser.CommentHandler = comment
+        parser.Parse(data, True)
+
+        self.tables.sort(key=lambda table: table.element.start)
+        self.components.sort(key=lambda component: component.element.start)
+        self._assign_owners()
+
+    def _driver_of(self, component: Optional[_Node]) -> Tuple[Optional[str], str]:
+        """Driver id and class of a component."""
+        if component is not None:
+            for child, _, value in component.children:
+                if child.tag == 'driver':
+                    return child.attrs.get('id'), self.text(value).strip()
+        return None, ''
+
+    def _columns_of(self, parameters: _Node) -> List[ColumnSpan]:
+        """Direct subargs that declare both a name and a type are table columns."""
+        columns = []
+        comments = parameters.comments
+        next_comment = 0
+        previous_end = parameters.start_tag_end
+        for child, element, _ in parameters.children:
+            if child.tag == 'subarg':
+                values = {}
+                for grandchild, _, value in child.children:
+                    if grandchild.tag == 'arg' and 'attribute' in grandchild.attrs:
+                        values.setdefault(grandchild.attrs['attribute'], value)
+                if 'name' in values and 'type' in values:
+                    # Leading column comment: last "<!-- N (x) -->" since the previous sibling
+                    comment = None
+                    while next_comment < len(comments) and comments[next_comment].span.end <= element.start:
+                        candidate = comments[next_comment].span
+                        if (candidate.start >= previous_end
+                                and COLUMN_COMMENT_PATTERN.fullmatch(self.text(candidate))):
+                            comment = candidate
+                        next_comment += 1
+                    anchor = comment.start if comment else element.start
+                    insert_at, indent = self._line_start(anchor)
+                    columns.append(ColumnSpan(len(columns), self.text(values['name']).strip(),
+                                              element, comment, insert_at, indent))
+            previous_end = element.end
+        return columns
+
+    def _assign_owners(self):
+        """Tag each arg with the table and column that contain it."""
+        table_starts = [table.element.start for table in self.tables]
+        column_starts = [[column.element.start for column in table.columns]
+                         for table in self.tables]
+
+        located = []
+        for arg in self.args:
+            start = arg.element.start
+            number = bisect.bisect_right(table_starts, start) - 1
+            if number >= 0 and start < self.tables[number].element.end:
+                columns = self.tables[number].columns
+                position = bisect.bisect_right(column_starts[number], start) - 1
+                if position < 0 or start >= columns[position].element.end:
+                    position = None
+                arg = arg._replace(table=number, column=position)
+            located.append(arg)
+        located.sort(key=lambda arg: arg.element.start)
+        self.args = located
+
+    # ----------------------------------------------------------------- access
+
+    def text(self, span: Span) -> str:
+        """Raw (still entity-escaped) text of a span."""
+        return self.data[span.start:span.end].decode('utf-8')
+
+    def args_with(self, *attributes: str, table: Optional[int] = None) -> List[ArgSpan]:
+        """All args whose ``attribute`` is one of ``attributes``, in document order."""
+        return [arg for arg in self.args
+                if arg.attribute in attributes and (table is None or arg.table == table)]
+
+    def column_comments(self) -> List[CommentSpan]:
+        """Comments that follow the ``<!-- N (x) -->`` column convention."""
+        return [c for c in self.comments
+                if COLUMN_COMMENT_PATTERN.fullmatch(self.text(c.span))]
+
+    def find_table(self, driver_id: Optional[str] = None) -> Optional[TableSpan]:
+        """Table by component driver id, or the first table when ``driver_id`` is None."""
+        for table in self.tables:
+            if driver_id is None or table.driver_id == driver_id:
+                return table
+        return None
+
+    def component_of(self, offset: int) -> Optional[ComponentSpan]:
+        """Innermost component containing ``offset``."""
+        starts = [component.element.start for component in self.components]
+        for number in range(bisect.bisect_right(starts, offset) - 1, -1, -1):
+            if offset < self.components[number].element.end:
+                return self.components[number]
+        return None
+
+    def parent_of(self, arg: ArgSpan) -> Optional[Span]:
+        """Span of the ``<parameters>`` or ``<subarg>`` holding an arg."""
+        return self._parents.get(arg.element.start)
+
+    def replace_value(self, arg: ArgSpan, new_text: str) -> SpanEdit:
+        return SpanEdit(arg.value.start, arg.value.end, new_text.encode('utf-8'))
+
+
+def apply_edits(data: bytes, edits: List[SpanEdit]) -> bytes:
+    """
+    Apply span edits to ``data`` in one buffer rebuild.
+
+    Edits are expressed against the original buffer; they may be given in any
+    order but must not overlap. Insertions at the same offset keep their order.
+    """
+    ordered = sorted(enumerate(edits), key=lambda item: (item[1].start, item[1].end, item[0]))
+    parts = []
+    cursor = 0
+    for _, edit in ordered:
+        if edit.start < cursor:
+            raise ValueError(f"Overlapping edit at byte {edit.start} (previous edit ends at {cursor})")
+        if edit.end < edit.start or edit.end > len(data):
+            raise ValueError(f"Invalid edit span {edit.start}-{edit.end}")
+        parts.append(data[cursor:edit.start])
+        parts.append(edit.replacement)
+        cursor = edit.end
+    parts.append(data[cursor:])
+    return b''.join(parts)
+
+
+def atomic_write(path: Path, content):
+    """
+    Write ``content`` (str or bytes) to ``path`` through a temporary file and
+    os.replace, keeping the permissions of an existing file.
+    """
+    handle, temp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        if isinstance(content, bytes):
+            with os.fdopen(handle, 'wb') as f:
+                f.write(content)
+        else:
+            with os.fdopen(handle, 'w', encoding='utf-8', newline='') as f:
+                f.write(content)
+        if path.exists():
+            mode = os.stat(path).st_mode & 0o7777
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def file_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def save_plans(plans: List[EditPlan], path):
+    """Write plans as JSON: ``{"version": 1, "plans": [...]}``."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'version': PLAN_VERSION, 'plans': [plan.to_dict() for plan in plans]},
+                  f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+
+def load_plans(path) -> List[EditPlan]:
+    """Plans saved by :func:`save_plans`; relative file paths are taken from the plan file's directory."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('version') != PLAN_VERSION:
+        raise ValueError(f"{path}: unsupported plan version {data.get('version')}")
+    base = Path(path).resolve().parent
+    plans = [EditPlan.from_dict(plan) for plan in data['plans']]
+    return [plan._replace(path=str(base / plan.path)) for plan in plans]
+
+
+def apply_plan(plan: EditPlan) -> Optional[str]:
+    """
+    Apply a plan to its file as computed, without re-deriving the edits.
+    Returns an error message (and leaves the file alone) if the file no
+    longer has the hash the plan was computed against.
+    """
+    try:
+        with open(plan.path, 'rb') as f:
+            data = f.read()
+        if file_digest(data) != plan.sha256:
+            return "file changed since the plan was made; preview again"
+        atomic_write(Path(plan.path), apply_edits(data, plan.edits))
+    except (OSError, ValueError) as e:
+        return str(e)
+    return None
+
+
+def apply_plans(plans: List[EditPlan], workers: Optional[int] = None) -> List[Optional[str]]:
+    """
+    Apply plans for many files in parallel; one error (or None) per plan.
+    Two plans for the same file are refused, since the second one would be
+    computed against a version the first has already replaced.
+    """
+    seen: Dict[str, int] = {}
+    for plan in plans:
+        key = os.path.realpath(plan.path)
+        seen[key] = seen.get(key, 0) + 1
+    duplicated = {path for path, count in seen.items() if count > 1}
+    pending = [plan for plan in plans if os.path.realpath(plan.path) not in duplicated]
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(pending) <= 1:
+        results = [apply_plan(plan) for plan in pending]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(apply_plan, pending))
+
+    errors = dict(zip((id(plan) for plan in pending), results))
+    return [errors[id(plan)] if id(plan) in errors else "several plans target this file"
+            for plan in plans]